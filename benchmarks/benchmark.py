@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Throughput benchmark for text transformations and sanitizers. Runs without Gtk.
+
+Usage (from the repository root):
+
+    python3 benchmarks/benchmark.py [--sizes 1K,1M,10M] [--corpora prose,code] [--only title,sanitize] -o results.json
+    python3 benchmarks/benchmark.py --compare baseline.json [--threshold 10] -o results.json
+
+Synthetic corpora: prose, code, cjk (built from the zh_CN translation) and whitespace (pathological runs of spaces,
+tabs, line breaks and punctuation marks). For each function, corpus and size the best time of --repeat runs is taken,
+and given as MB/s (of UTF-8 encoded input); peak memory is measured in a separate run, with tracemalloc.
+100M corpora are opt-in (--sizes 1M,100M), as running all functions on them takes about an hour and several GB
+of memory, too much for a default run.
+In compare mode, results slower than the baseline by more than --threshold percent are listed as regressions, and the
+exit code is 1.
+"""
+
+import argparse
+import functools
+import json
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from typobuster import tools
+from typobuster.sanitizer import sanitize
+from typobuster.transliteration import transliterate
+
+# Web cleanup settings (defaults)
+SETTINGS = {
+    "sanitize-add-spaces-after-punctuation": True,
+    "sanitize-eol": True,
+    "sanitize-hyphens": True,
+    "sanitize-punctuation-marks": True,
+    "sanitize-quotes": True,
+    "sanitize-spaces": True,
+    "tab-mode": "spaces",
+    "tab-width": 4,
+}
+
+FUNCTIONS = {
+    "sentence": tools.as_in_sentence,
+    "title": tools.as_in_title,
+    "lowercase": tools.to_lower_case,
+    "uppercase": tools.to_upper,
+    "camelcase": tools.to_camel_case,
+    "snakecase": tools.to_snake_case,
+    "kebabcase": tools.to_kebab_case,
+    "unordered": tools.unordered_list,
+    "ordered": tools.ordered_list,
+    "sort-asc": tools.sort_lines,
+    "sort-desc": lambda t: tools.sort_lines(t, order="desc"),
+    "remove-empty-rows": tools.remove_empty_lines,
+    "remove-non-ascii": transliterate,
+    "first-to-end": tools.move_first_word_to_end,
+    "last-to-beginning": tools.move_last_word_to_beginning,
+    "merge-rows": tools.merge_lines,
+    "sanitize-hyphens": lambda t: tools.sanitize_hyphens(t, 0, len(t)),
+    "sanitize-quotes": lambda t: tools.sanitize_quotes(t, 0, len(t)),
+    "sanitize-punctuation-marks": lambda t: tools.sanitize_punctuation_marks(t, 0, len(t)),
+    "add-spaces-after-punctuation": lambda t: tools.add_spaces_after_punctuation_marks(t, 0, len(t)),
+    "sanitize-spaces": lambda t: tools.sanitize_spaces(t, 0, len(t), True, 4),
+    "sanitize-eol": lambda t: tools.sanitize_eol(t, 0, len(t)),
+    "sanitize": lambda t: sanitize(t, SETTINGS),
+}
+
+WORDS = ("the of and to in is was for on that with as by at from his her it an were are which this be or has had "
+         "not but first one their its new after who they have two other also been all time into more some can only "
+         "many state year three most during when between would over made game city under world both school").split()
+
+CODE = """def {name}(text, start_idx, end_idx):
+    selection = text[start_idx:end_idx]
+    if not selection:  # nothing to do
+        return text
+    for idx, line in enumerate(selection.splitlines()):
+        result.append("{{}}: {{}}".format(idx, line.strip()))
+    return text[:start_idx] + "\\n".join(result) + text[end_idx:]
+
+"""
+
+
+def prose(rnd):
+    sentence = [rnd.choice(WORDS) for _ in range(rnd.randint(5, 20))]
+    sentence[0] = sentence[0].capitalize()
+    text = " ".join(sentence)
+    return text + rnd.choice([". ", ", ", "! ", "? ", ".\n", ".\n\n", " - ", " ,", ".Next "])
+
+
+def code(rnd):
+    return CODE.format(name="_".join(rnd.choice(WORDS) for _ in range(3)))
+
+
+@functools.lru_cache(maxsize=None)
+def cjk_phrases():
+    path = os.path.join(os.path.dirname(tools.__file__), "langs", "zh_CN.json")
+    with open(path, "r") as f:
+        return list(json.load(f).values())
+
+
+def cjk(rnd):
+    return rnd.choice(cjk_phrases()) + rnd.choice(["，", "。", "\n", " ", "：", "！"])
+
+
+def whitespace(rnd):
+    return rnd.choice(WORDS) + "".join(rnd.choice("  \t\t\n\n\r-.,!?;:„”–") for _ in range(rnd.randint(1, 12)))
+
+
+CORPORA = {"prose": prose, "code": code, "cjk": cjk, "whitespace": whitespace}
+
+
+def parse_size(value):
+    units = {"K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
+    value = value.strip().upper()
+    if value[-1] in units:
+        return int(float(value[:-1]) * units[value[-1]])
+    return int(value)
+
+
+def generate(corpus, size, seed=0):
+    """ Returns text of the given corpus, of (about) size bytes in UTF-8 """
+    rnd = random.Random(seed)
+    pieces = []
+    total = 0
+    while total < size:
+        piece = CORPORA[corpus](rnd)
+        pieces.append(piece)
+        total += len(piece.encode("utf-8"))
+    return "".join(pieces)
+
+
+def measure(function, text, repeat, memory):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(text)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    peak = None
+    if memory:
+        tracemalloc.start()
+        function(text)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return best, peak
+
+
+def run(names, corpora, sizes, repeat, memory):
+    results = []
+    for corpus in corpora:
+        for size in sizes:
+            text = generate(corpus, size)
+            size_mb = len(text.encode("utf-8")) / 1024 ** 2
+            for name in names:
+                seconds, peak = measure(FUNCTIONS[name], text, repeat, memory)
+                result = {
+                    "function": name,
+                    "corpus": corpus,
+                    "size": size,
+                    "seconds": seconds,
+                    "mb-per-s": size_mb / seconds if seconds else None,
+                    "peak-mb": peak / 1024 ** 2 if peak is not None else None,
+                }
+                results.append(result)
+                print_result(result)
+    return results
+
+
+def print_result(result):
+    line = "{:<30} {:<11} {:>10} {:>10.4f} s {:>10.2f} MB/s".format(
+        result["function"], result["corpus"], result["size"], result["seconds"], result["mb-per-s"] or 0)
+    if result["peak-mb"] is not None:
+        line += " {:>10.2f} MB peak".format(result["peak-mb"])
+    print(line)
+
+
+def compare(results, baseline, threshold):
+    """ Returns (result, baseline result, change in %) for results slower than baseline by more than threshold % """
+    base = {(r["function"], r["corpus"], r["size"]): r for r in baseline["results"]}
+    regressions = []
+    for result in results:
+        old = base.get((result["function"], result["corpus"], result["size"]))
+        if old and old["mb-per-s"] and result["mb-per-s"]:
+            change = (result["mb-per-s"] - old["mb-per-s"]) / old["mb-per-s"] * 100
+            if change < -threshold:
+                regressions.append((result, old, change))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Typobuster transformations benchmark")
+    parser.add_argument("--sizes", type=str, default="1K,100K,1M,10M",
+                        help="comma-separated corpus sizes, e.g. 1K,1M,100M (default: 1K,100K,1M,10M; 100M is "
+                             "opt-in: all functions take about an hour and several GB of memory on it)")
+    parser.add_argument("--corpora", type=str, default=",".join(CORPORA),
+                        help="comma-separated corpora, of: {}".format(", ".join(CORPORA)))
+    parser.add_argument("--only", type=str, default=None,
+                        help="comma-separated functions to run (default: all), of: {}".format(", ".join(FUNCTIONS)))
+    parser.add_argument("--repeat", type=int, default=3, help="runs per measurement, best one taken (default: 3)")
+    parser.add_argument("--no-memory", action="store_true", help="skip peak memory measurement")
+    parser.add_argument("-o", "--output", type=str, default=None, help="write results to this JSON file")
+    parser.add_argument("--compare", type=str, default=None, metavar="BASELINE",
+                        help="compare results with a JSON file written before")
+    parser.add_argument("--threshold", type=float, default=10,
+                        help="throughput drop (in %%) counted as a regression (default: 10)")
+    args = parser.parse_args()
+
+    names = args.only.split(",") if args.only else list(FUNCTIONS)
+    corpora = args.corpora.split(",")
+    for name in names:
+        if name not in FUNCTIONS:
+            parser.error(f"unknown function '{name}'")
+    for corpus in corpora:
+        if corpus not in CORPORA:
+            parser.error(f"unknown corpus '{corpus}'")
+    try:
+        sizes = [parse_size(s) for s in args.sizes.split(",")]
+    except ValueError:
+        parser.error(f"invalid sizes '{args.sizes}'")
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r") as f:
+            baseline = json.load(f)
+
+    results = run(names, corpora, sizes, max(args.repeat, 1), not args.no_memory)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"python": platform.python_version(), "machine": platform.machine(), "results": results}, f,
+                      indent=2)
+        print(f"Results saved to {args.output}")
+
+    if baseline:
+        regressions = compare(results, baseline, args.threshold)
+        for result, old, change in regressions:
+            print("REGRESSION {:<30} {:<11} {:>10}: {:.2f} -> {:.2f} MB/s ({:+.1f}%)".format(
+                result["function"], result["corpus"], result["size"], old["mb-per-s"], result["mb-per-s"], change))
+        print(f"{len(regressions)} regression(s) over {args.threshold}%")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -24,7 +24,7 @@ setup(
     install_requires=[],
     entry_points={
         'gui_scripts': [
-            'typobuster = typobuster.main:main'
+            'typobuster = typobuster.cli:main'
         ]
     }
 )
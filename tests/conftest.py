@@ -0,0 +1,18 @@
+import pytest
+
+from typobuster.tools import eprint, load_settings
+
+
+@pytest.fixture(autouse=True)
+def home(tmp_path, monkeypatch):
+    """ Keeps settings, rule packs and caches of each test in a temporary directory """
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.setenv("XDG_CONFIG_HOME", str(tmp_path / "config"))
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    return tmp_path
+
+
+@pytest.fixture
+def settings(home):
+    """ Default settings """
+    return load_settings(log=eprint)
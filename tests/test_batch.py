@@ -0,0 +1,79 @@
+import os
+
+import pytest
+
+from typobuster.batch import collect_files, output_collisions, process_files
+from typobuster.cli import main
+from typobuster.sanitizer import sanitize
+
+TEXT = "Some  text ,with typos\n"
+
+
+@pytest.fixture
+def tree(tmp_path):
+    for name in ["a/notes.txt", "b/notes.txt", "a/src/x.txt", "b/src/y.txt"]:
+        path = tmp_path / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(TEXT)
+    return tmp_path
+
+
+@pytest.mark.parametrize("argv", [
+    ["--sanitize"],
+    ["--sanitize", "--transform", "uppercase", "x.txt"],
+    ["--transform", "unknown", "x.txt"],
+    ["--sanitize", "-j", "0", "x.txt"],
+    # the editor opens a single file
+    ["x.txt", "y.txt"],
+])
+def test_invalid_arguments(argv, capsys):
+    with pytest.raises(SystemExit) as e:
+        main(argv)
+    assert e.value.code == 2
+    assert "error:" in capsys.readouterr().err
+
+
+def test_collect_files(tree):
+    files = collect_files([str(tree / "a"), str(tree / "b" / "notes.txt"), str(tree / "a" / "notes.txt"),
+                           str(tree / "missing")])
+    assert [(os.path.relpath(path, tree), rel_path) for path, rel_path in files] == [
+        ("a/notes.txt", "a/notes.txt"), ("a/src/x.txt", "a/src/x.txt"), ("b/notes.txt", "notes.txt")]
+
+
+def test_output_collisions(tree, capsys):
+    files = collect_files([str(tree / "a" / "notes.txt"), str(tree / "b" / "notes.txt"), str(tree / "a" / "src"),
+                           str(tree / "b" / "src")])
+    assert output_collisions(files) == {"notes.txt": [str(tree / "a" / "notes.txt"), str(tree / "b" / "notes.txt")]}
+
+    out = tree / "out"
+    assert main(["--sanitize", "-j", "1", "-o", str(out), str(tree / "a" / "notes.txt"),
+                 str(tree / "b" / "notes.txt")]) == 1
+    assert "notes.txt" in capsys.readouterr().err
+    assert not out.exists()
+    # (in place, each file is its own output)
+    assert output_collisions(collect_files([str(tree / "a"), str(tree / "b")])) == {}
+
+
+def test_output_dir(tree, settings, capsys):
+    out = tree / "out"
+    assert main(["--sanitize", "-j", "1", "-o", str(out), str(tree / "a"), str(tree / "b" / "notes.txt")]) == 0
+    assert (out / "a" / "notes.txt").read_text() == sanitize(TEXT, settings)
+    assert (out / "a" / "src" / "x.txt").read_text() == sanitize(TEXT, settings)
+    assert (out / "notes.txt").read_text() == sanitize(TEXT, settings)
+    # originals intact
+    assert (tree / "a" / "notes.txt").read_text() == TEXT
+    assert "3 file(s)" in capsys.readouterr().out
+
+
+def test_in_place(tree):
+    assert main(["--transform", "uppercase", "-j", "1", str(tree / "a")]) == 0
+    assert (tree / "a" / "notes.txt").read_text() == TEXT.upper()
+    assert (tree / "a" / "src" / "x.txt").read_text() == TEXT.upper()
+    assert (tree / "b" / "notes.txt").read_text() == TEXT
+
+
+def test_pool(tree, settings):
+    paths = [str(tree / "a"), str(tree / "b")]
+    assert process_files(paths, jobs=2, transformation="sort-desc", settings=settings) == 0
+    assert (tree / "b" / "src" / "y.txt").read_text() == TEXT.strip()
+    assert process_files([str(tree / "missing")], jobs=2, settings=settings) == 1
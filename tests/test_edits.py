@@ -0,0 +1,191 @@
+import random
+
+import pytest
+
+from typobuster.edits import MIN_DIFF_LENGTH, SavedState, apply_hunks, common_prefix_length, common_suffix_length, \
+    diff_hunks, replace_range
+
+
+class Iter:
+    def __init__(self, offset):
+        self.offset = offset
+
+    def get_offset(self):
+        return self.offset
+
+
+class Buffer:
+    """ The Gtk.TextBuffer methods edits.py uses, on a string """
+
+    def __init__(self, text):
+        self.text = text
+        self.actions = 0
+        self.edits = 0
+        self.modified = False
+        self.reads = 0
+
+    def get_iter_at_offset(self, offset):
+        return Iter(offset)
+
+    def get_start_iter(self):
+        return Iter(0)
+
+    def get_end_iter(self):
+        return Iter(len(self.text))
+
+    def get_char_count(self):
+        return len(self.text)
+
+    def get_text(self, start, end, include_hidden_chars):
+        self.reads += 1
+        return self.text[start.offset:end.offset]
+
+    def get_modified(self):
+        return self.modified
+
+    def set_modified(self, modified):
+        self.modified = modified
+
+    def delete(self, start, end):
+        self.text = self.text[:start.offset] + self.text[end.offset:]
+        self.edits += 1
+        self.modified = True
+
+    def insert(self, where, text):
+        self.text = self.text[:where.offset] + text + self.text[where.offset:]
+        self.edits += 1
+        self.modified = True
+
+    def begin_user_action(self):
+        self.actions += 1
+
+    def end_user_action(self):
+        pass
+
+
+def applied(old, hunks):
+    pieces = []
+    pos = 0
+    for start, end, replacement in hunks:
+        pieces += [old[pos:start], replacement]
+        pos = end
+    return "".join(pieces) + old[pos:]
+
+
+def lines(rnd, count):
+    return [rnd.choice(["foo", "bar", "baz", "a longer line of text", "", "x" * 100]) + f" {rnd.randint(0, 9)}\n"
+            for _ in range(count)]
+
+
+def edited(rnd, old_lines):
+    new_lines = list(old_lines)
+    for _ in range(rnd.randint(0, 10)):
+        idx = rnd.randint(0, len(new_lines))
+        operation = rnd.choice(["insert", "delete", "change"])
+        if operation == "insert" or not new_lines or idx == len(new_lines):
+            new_lines.insert(idx, rnd.choice(["new\n", "inserted line\n", "\n"]))
+        elif operation == "delete":
+            del new_lines[idx]
+        else:
+            new_lines[idx] = new_lines[idx].upper()
+    return new_lines
+
+
+def test_common_affixes():
+    assert common_prefix_length("abcd", "abxd") == 2
+    assert common_prefix_length("", "abc") == 0
+    assert common_prefix_length("abc", "abc") == 3
+    assert common_suffix_length("abcd", "xbcd") == 3
+    assert common_suffix_length("abc", "") == 0
+
+
+@pytest.mark.parametrize("count", [0, 1, 5, 50, 500])
+def test_hunks_turn_old_into_new(count):
+    rnd = random.Random(count)
+    for _ in range(50):
+        old_lines = lines(rnd, count)
+        old, new = "".join(old_lines), "".join(edited(rnd, old_lines))
+        hunks = diff_hunks(old, new)
+        assert applied(old, hunks) == new
+        # ascending, not overlapping, and not empty
+        assert all(a[1] <= b[0] for a, b in zip(hunks, hunks[1:]))
+        assert all(end > start or replacement for start, end, replacement in hunks)
+
+
+def test_minimal_hunks():
+    assert diff_hunks("same", "same") == []
+    assert diff_hunks("abc", "aXc") == [(1, 2, "X")]
+    assert diff_hunks("", "new") == [(0, 0, "new")]
+    assert diff_hunks("old", "") == [(0, 3, "")]
+
+    # changes far apart in a long text come as separate hunks, leaving the rest intact
+    old_lines = [f"line {i}\n" for i in range(1000)]
+    new_lines = list(old_lines)
+    new_lines[10] = "changed\n"
+    new_lines[900] = "also changed\n"
+    old, new = "".join(old_lines), "".join(new_lines)
+    assert len(old) > MIN_DIFF_LENGTH
+    hunks = diff_hunks(old, new)
+    assert len(hunks) == 2
+    assert applied(old, hunks) == new
+    assert sum(end - start for start, end, _ in hunks) < 20
+
+
+def test_apply_hunks():
+    rnd = random.Random(0)
+    for _ in range(50):
+        old_lines = lines(rnd, 100)
+        prefix = "unchanged prefix\n"
+        old, new = "".join(old_lines), "".join(edited(rnd, old_lines))
+        buffer = Buffer(prefix + old)
+        count = apply_hunks(buffer, len(prefix), diff_hunks(old, new))
+        assert buffer.text == prefix + new
+        assert buffer.actions == (1 if count else 0)
+
+
+def test_replace_range():
+    buffer = Buffer("first line\nsecond line\nthird line\n")
+    assert replace_range(buffer, Iter(11), Iter(23), "second LINE\n") == 1
+    assert buffer.text == "first line\nsecond LINE\nthird line\n"
+    assert buffer.edits == 2
+    assert replace_range(buffer, Iter(0), Iter(10), "first line") == 0
+
+
+def test_saved_state():
+    buffer = Buffer("")
+    state = SavedState(buffer)
+    assert not state.changed()
+
+    def edit(start, end, text):
+        replace_range(buffer, Iter(start), Iter(end), text)
+        state.edited()
+
+    buffer.text = "saved text"
+    state.set()
+    assert not state.changed() and not buffer.modified
+    edit(0, 5, "SAVED")
+
+    # same length: the hash is checked once per change
+    reads = buffer.reads
+    assert state.changed() and state.changed()
+    assert buffer.reads == reads + 1
+
+    # edited back to the saved text
+    edit(0, 5, "saved")
+    assert buffer.modified
+    assert not state.changed() and not buffer.modified
+    reads = buffer.reads
+    assert not state.changed()
+    assert buffer.reads == reads
+
+    # different length: no reading needed
+    edit(10, 10, "!")
+    reads = buffer.reads
+    assert state.changed()
+    assert buffer.reads == reads
+
+    # saved, with the text already at hand
+    state.set(buffer.text)
+    assert not state.changed()
+    edit(10, 11, "")
+    assert state.changed()
@@ -0,0 +1,49 @@
+import random
+
+import pytest
+
+from typobuster.extsort import Cancelled, sort_file
+from typobuster.tools import sort_lines
+
+
+def random_text(rnd, rows=500):
+    words = ["apple", "Apple", "APPLE", "banana", "Banana", "cherry", "", " ", "żółw", "Żółw", "zebra"]
+    separators = ["\n", "\n", "\r\n", "\r"]
+    return "".join(rnd.choice(words) + str(rnd.randint(0, 3)) * rnd.randint(0, 1) + rnd.choice(separators)
+                   for _ in range(rnd.randint(0, rows)))
+
+
+@pytest.mark.parametrize("order", ["asc", "desc"])
+@pytest.mark.parametrize("run_size", [1, 10, 1000, 1 << 20])
+def test_same_as_sort_lines(tmp_path, order, run_size):
+    rnd = random.Random(order + str(run_size))
+    for idx in range(20):
+        text = random_text(rnd)
+        path = tmp_path / f"{idx}.txt"
+        path.write_text(text, newline="")
+        output_path = tmp_path / "sorted" / f"{idx}.txt"
+        rows = sort_file(str(path), str(output_path), order, run_size=run_size, tmp_dir=str(tmp_path))
+        # (read as load_text_file reads it, with newlines translated)
+        expected = sort_lines(path.read_text(), order)
+        assert output_path.read_text() == expected
+        assert rows == len(path.read_text().splitlines())
+
+
+def test_in_place(tmp_path):
+    path = tmp_path / "rows.txt"
+    path.write_text("b\nA\na\nB\n")
+    assert sort_file(str(path), run_size=2) == 4
+    assert path.read_text() == "A\na\nb\nB"
+
+
+def test_progress_and_cancel(tmp_path):
+    path = tmp_path / "rows.txt"
+    path.write_text("row\n" * 10)
+    fractions = []
+    sort_file(str(path), str(tmp_path / "out.txt"), progress=fractions.append)
+    assert fractions[-1] == 1
+
+    with pytest.raises(Cancelled):
+        sort_file(str(path), str(tmp_path / "cancelled.txt"), cancelled=lambda: True)
+    assert not (tmp_path / "cancelled.txt").exists()
+    assert path.read_text() == "row\n" * 10
@@ -0,0 +1,67 @@
+import os
+
+from typobuster.findinfiles import MAX_MATCHES_PER_FILE, iter_files, replace_in_file, replace_in_files, search_file, \
+    search_files
+
+
+def make_tree(root):
+    files = {
+        "a.txt": "one match\nno\nmatch match\n",
+        "sub/b.txt": "żółw match\r\n",
+        "sub/none.txt": "nothing here",
+        "empty.txt": "",
+        ".hidden.txt": "match",
+        ".git/c.txt": "match",
+    }
+    for name, text in files.items():
+        path = root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(text.encode("utf-8"))
+    (root / "binary.bin").write_bytes(b"match\0match")
+    return files
+
+
+def test_iter_files(tmp_path):
+    make_tree(tmp_path)
+    names = [os.path.relpath(path, tmp_path) for path in iter_files(str(tmp_path))]
+    assert names == ["a.txt", "binary.bin", "empty.txt", "sub/b.txt", "sub/none.txt"]
+
+
+def test_search_file(tmp_path):
+    make_tree(tmp_path)
+    assert search_file(str(tmp_path / "a.txt"), "match") == [(1, 5, "one match"), (3, 1, "match match"),
+                                                             (3, 7, "match match")]
+    # columns in characters, '\r' stripped
+    assert search_file(str(tmp_path / "sub/b.txt"), "match") == [(1, 6, "żółw match")]
+    assert search_file(str(tmp_path / "binary.bin"), "match") == []
+    assert search_file(str(tmp_path / "empty.txt"), "match") == []
+    assert search_file(str(tmp_path / "missing.txt"), "match") == []
+
+
+def test_match_limit(tmp_path):
+    path = tmp_path / "many.txt"
+    path.write_text("x\n" * (MAX_MATCHES_PER_FILE + 10))
+    assert len(search_file(str(path), "x")) == MAX_MATCHES_PER_FILE
+
+
+def test_search_files(tmp_path):
+    make_tree(tmp_path)
+    found = dict(search_files(str(tmp_path), "match", jobs=2))
+    assert sorted(os.path.relpath(path, tmp_path) for path in found) == ["a.txt", "sub/b.txt"]
+    assert list(search_files(str(tmp_path), "match", cancelled=lambda: True)) == []
+
+
+def test_replace(tmp_path):
+    make_tree(tmp_path)
+    paths = [str(tmp_path / "a.txt"), str(tmp_path / "sub/b.txt"), str(tmp_path / "sub/none.txt")]
+    os.chmod(paths[0], 0o640)
+    assert replace_in_files(paths, "match", "hit") == {paths[0]: 3, paths[1]: 1, paths[2]: 0}
+    assert (tmp_path / "a.txt").read_text() == "one hit\nno\nhit hit\n"
+    # line breaks kept as they were
+    assert (tmp_path / "sub/b.txt").read_bytes() == "żółw hit\r\n".encode("utf-8")
+    assert os.stat(paths[0]).st_mode & 0o777 == 0o640
+    # not UTF-8: left intact
+    (tmp_path / "latin.txt").write_bytes(b"\xe9 match")
+    assert replace_in_file(str(tmp_path / "latin.txt"), "match", "hit") == 0
+    assert (tmp_path / "latin.txt").read_bytes() == b"\xe9 match"
+    assert not [name for name in os.listdir(tmp_path) if name.startswith(".typobuster-")]
@@ -0,0 +1,106 @@
+import random
+
+import pytest
+
+from typobuster import largefile
+from typobuster.largefile import Cancelled, MappedFile
+
+
+@pytest.fixture(autouse=True)
+def small_blocks(monkeypatch):
+    monkeypatch.setattr(largefile, "BLOCK_SIZE", 64)
+    monkeypatch.setattr(largefile, "SEARCH_BLOCK_SIZE", 32)
+
+
+@pytest.fixture
+def mapped(tmp_path):
+    rnd = random.Random(0)
+    rows = ["".join(rnd.choice("abcżx ") for _ in range(rnd.randint(0, 40))) for _ in range(300)]
+    path = tmp_path / "large.txt"
+    path.write_bytes("\n".join(rows).encode("utf-8"))
+    file = MappedFile(str(path))
+    yield file, rows
+    file.close()
+
+
+def row_offsets(rows):
+    offsets = [0]
+    for row in rows:
+        offsets.append(offsets[-1] + len(row.encode("utf-8")) + 1)
+    return offsets
+
+
+def test_row_index(mapped):
+    file, rows = mapped
+    offsets = row_offsets(rows)
+    file.build_index()
+    assert file.indexed
+    assert file.rows == len(rows)
+    # in order, in reverse, and at random (the hint must not get in the way)
+    order = list(range(len(rows)))
+    for row in order + order[::-1] + random.Random(1).sample(order, len(order)):
+        assert file.row_offset(row) == offsets[row]
+    assert file.row_offset(len(rows)) == file.size
+    assert file.read_rows(10, 5) == "".join(row + "\n" for row in rows[10:15])
+    assert file.read_rows(len(rows) - 1, 5) == rows[-1]
+
+
+def test_partly_indexed(mapped):
+    file, rows = mapped
+    offsets = row_offsets(rows)
+    # rows past the indexed part are counted from the hint, or from the last indexed block
+    for row in [0, 5, 200, 100, 299, 250]:
+        assert file.row_offset(row) == offsets[row]
+        assert file.row_at(offsets[row]) == (row, 0)
+
+
+def test_row_at(mapped):
+    file, rows = mapped
+    file.build_index()
+    offsets = row_offsets(rows)
+    for row in range(len(rows)):
+        for column in range(len(rows[row]) + 1):
+            offset = offsets[row] + len(rows[row][:column].encode("utf-8"))
+            assert file.row_at(offset) == (row, column)
+
+
+def test_progress_and_cancel(mapped):
+    file, _ = mapped
+    fractions = []
+    with pytest.raises(Cancelled):
+        file.build_index(progress=fractions.append, cancelled=lambda: len(fractions) == 3)
+    assert not file.indexed
+    file.build_index(progress=fractions.append)
+    assert file.indexed
+    assert fractions == sorted(fractions)
+    assert fractions[-1] == 1
+
+
+def expected_find(data, needle, offset):
+    found = data.find(needle, offset)
+    return found if found != -1 else data.find(needle, 0, offset + len(needle) - 1)
+
+
+def expected_rfind(data, needle, offset):
+    found = data.rfind(needle, 0, offset)
+    return found if found != -1 else data.rfind(needle, max(offset - len(needle) + 1, 0))
+
+
+def test_find(mapped):
+    file, rows = mapped
+    data = "\n".join(rows).encode("utf-8")
+    rnd = random.Random(2)
+    phrases = ["a", "ż", "zzzz", "\nab"] + [rows[rnd.randrange(len(rows))][:rnd.randint(1, 40)] for _ in range(10)]
+    for phrase in filter(None, phrases):
+        needle = phrase.encode("utf-8")
+        for offset in range(0, len(data) + 1, 13):
+            assert file.find(phrase, offset) == expected_find(data, needle, offset), (phrase, offset)
+            assert file.rfind(phrase, offset) == expected_rfind(data, needle, offset), (phrase, offset)
+
+
+def test_find_cancelled(mapped):
+    file, _ = mapped
+    with pytest.raises(Cancelled):
+        file.find("zzzz", 0, cancelled=lambda: True)
+    with pytest.raises(Cancelled):
+        file.rfind("zzzz", file.size, cancelled=lambda: True)
@@ -0,0 +1,75 @@
+import random
+
+import pytest
+
+from typobuster.parallel import PARALLEL_TRANSFORMATIONS, SANITIZE, parallel_apply, parallel_process, \
+    stream_line_blocks, stream_sanitizer_blocks, text_line_blocks, text_sanitizer_blocks, use_parallel
+from typobuster.sanitizer import sanitize
+from typobuster.transformations import transform
+
+PIECES = ["a", "word", "Żółw", "x1", " ", "  ", "\t", "\n", "\n\n", "\r\n", "-", "–", ".", ",", ",,", "„", "!"]
+
+
+def random_text(rnd, pieces=200):
+    return "".join(rnd.choice(PIECES) for _ in range(rnd.randint(0, pieces)))
+
+
+def expected(text, step, settings):
+    return sanitize(text, settings) if step == SANITIZE else transform(text, step, settings)
+
+
+def blocks(text, step, size):
+    return text_sanitizer_blocks(text, size) if step == SANITIZE else text_line_blocks(text, size)
+
+
+@pytest.mark.parametrize("size", [1, 5, 50])
+def test_blocks_cover_text(size):
+    rnd = random.Random(size)
+    for _ in range(100):
+        text = random_text(rnd)
+        assert "".join(block for _, block in text_line_blocks(text, size)) == text
+        assert all(block.endswith("\n") for _, block in list(text_line_blocks(text, size))[:-1])
+        sanitizer_blocks = list(text_sanitizer_blocks(text, size))
+        assert "".join(block for _, block in sanitizer_blocks) == text
+        # anchors: the last character of the previous block
+        assert [anchor for anchor, _ in sanitizer_blocks] == [""] + [block[-1] for _, block in sanitizer_blocks[:-1]]
+
+
+def test_stream_blocks():
+    rnd = random.Random(0)
+    for _ in range(100):
+        text = random_text(rnd)
+        chunks = [text[i:i + 7] for i in range(0, len(text), 7)]
+        assert "".join(block for _, block in stream_line_blocks(chunks)) == text
+        stream_blocks = list(stream_sanitizer_blocks(chunks))
+        assert "".join(block for _, block in stream_blocks) == text
+        assert [anchor for anchor, _ in stream_blocks] == [""] + [block[-1] for _, block in stream_blocks[:-1]]
+
+
+@pytest.mark.parametrize("step", PARALLEL_TRANSFORMATIONS)
+def test_process_blocks(settings, step):
+    # many small blocks, and a pool started once
+    text = random_text(random.Random(step), 5000)
+    counter = [0]
+    result = "".join(parallel_process(blocks(text, step, 20), step, settings, jobs=2, counter=counter))
+    assert result == expected(text, step, settings)
+    assert (counter[0] > 0) == (step == SANITIZE)
+
+
+def test_parallel_apply(settings):
+    text = random_text(random.Random(1), 20000)
+    for step in [SANITIZE, "title", "merge-rows", "remove-non-ascii"]:
+        fractions = []
+        assert parallel_apply(text, step, settings, jobs=2, progress=fractions.append) == \
+               expected(text, step, settings)
+        assert fractions[-1] == 1
+
+
+def test_use_parallel(settings):
+    settings["parallel-threshold"] = 100
+    assert use_parallel(SANITIZE, 100, settings, jobs=2)
+    assert not use_parallel(SANITIZE, 99, settings, jobs=2)
+    assert not use_parallel(SANITIZE, 100, settings, jobs=1)
+    assert not use_parallel("sort-asc", 100, settings, jobs=2)
+    settings["parallel-threshold"] = 0
+    assert not use_parallel(SANITIZE, 100, settings, jobs=2)
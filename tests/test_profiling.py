@@ -0,0 +1,100 @@
+import json
+import threading
+
+import pytest
+
+from typobuster import profiling
+from typobuster.profiling import BUCKETS, Profiler, percentile
+
+
+class Widget:
+    def __init__(self, value):
+        self.value = value
+
+    def get(self, add=0):
+        return self.value + add
+
+    def fail(self):
+        raise ValueError("failed")
+
+
+def test_percentile():
+    assert percentile([], 50) == 0.0
+    samples = list(range(100))
+    assert percentile(samples, 50) == 50
+    assert percentile(samples, 99) == 99
+    assert percentile(samples, 100) == 99
+    assert percentile([7], 95) == 7
+
+
+def test_instrument():
+    profiler = Profiler()
+    profiler.instrument(Widget, ["get", "fail"], "Widget.")
+    try:
+        widget = Widget(1)
+        # same results, names and exceptions
+        assert widget.get(add=2) == 3
+        assert Widget.get.__name__ == "get"
+        with pytest.raises(ValueError):
+            widget.fail()
+    finally:
+        Widget.get = Widget.get.__wrapped__
+        Widget.fail = Widget.fail.__wrapped__
+
+    summary = profiler.summary()
+    assert list(summary) == ["Widget.fail", "Widget.get"]
+    assert summary["Widget.get"]["count"] == 1
+    assert summary["Widget.fail"]["count"] == 1
+    assert [event["name"] for event in profiler.events] == ["Widget.get", "Widget.fail"]
+
+
+def test_summary():
+    profiler = Profiler()
+    # seconds
+    for elapsed in [0.00005, 0.0003, 0.0003, 0.002, 2.0]:
+        profiler.record("f", profiler.start, elapsed)
+    stats = profiler.summary()["f"]
+    assert stats["count"] == 5
+    assert stats["total-ms"] == pytest.approx(2002.65)
+    assert stats["mean-ms"] == pytest.approx(400.53)
+    assert stats["p50-ms"] == 0.3
+    assert stats["max-ms"] == 2000.0
+    assert stats["histogram"] == {"<=0.1ms": 1, "<=0.5ms": 2, "<=2.5ms": 1, f">{BUCKETS[-2]}ms": 1}
+
+
+def test_limits(monkeypatch):
+    monkeypatch.setattr(profiling, "MAX_SAMPLES", 10)
+    monkeypatch.setattr(profiling, "MAX_EVENTS", 15)
+    profiler = Profiler()
+
+    def record(name):
+        for _ in range(100):
+            profiler.record(name, profiler.start, 0.001)
+
+    threads = [threading.Thread(target=record, args=(name,)) for name in ["a", "b", "c"]]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    summary = profiler.summary()
+    assert [summary[name]["count"] for name in "abc"] == [100] * 3
+    assert all(len(profiler.stats[name][4]) == 10 for name in "abc")
+    assert len(profiler.events) == 15
+
+
+def test_dump(tmp_path):
+    profiler = Profiler()
+    profiler.record("f", profiler.start + 0.5, 0.001)
+    prefix = str(tmp_path / "profile")
+    profiler.dump(prefix)
+    with open(f"{prefix}.json") as file:
+        assert json.load(file) == profiler.summary()
+    with open(f"{prefix}.trace.json") as file:
+        trace = json.load(file)
+    event, = trace["traceEvents"]
+    assert event["ph"] == "X"
+    assert event["ts"] == pytest.approx(500000)
+    assert event["dur"] == pytest.approx(1000)
+
+    # an unwritable location is reported, not raised
+    profiler.dump(str(tmp_path / "no such dir" / "profile"))
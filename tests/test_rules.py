@@ -0,0 +1,52 @@
+import json
+import os
+
+from typobuster.rules import apply_rule_packs, load_rule_packs, rules_dir
+
+
+def write_pack(file_name, data, mtime=None):
+    os.makedirs(rules_dir(), exist_ok=True)
+    path = os.path.join(rules_dir(), f"{file_name}.json")
+    with open(path, "w") as file:
+        json.dump(data, file)
+    if mtime:
+        os.utime(path, ns=(mtime, mtime))
+    return path
+
+
+UNITS = {"name": "Units", "rules": [
+    {"name": "kg", "pattern": r"(\d) kg\b", "replacement": "\\1\u00a0kg"},
+    {"pattern": "colour", "replacement": "color", "ignore-case": True},
+    {"name": "broken", "pattern": "("},
+    {"name": "no pattern"},
+]}
+
+
+def test_load_rule_packs():
+    assert load_rule_packs() == []
+    write_pack("units", UNITS)
+    write_pack("other", {"rules": []})
+    write_pack("invalid", {"no rules": True})
+    packs = load_rule_packs()
+    assert [pack.id for pack in packs] == ["other", "units"]
+    assert packs[0].name == "other"
+    # invalid rules skipped, unnamed ones numbered
+    assert [rule.name for rule in packs[1].rules] == ["kg", "#2"]
+
+
+def test_recompiled_on_change():
+    path = write_pack("units", UNITS, mtime=1_000_000_000)
+    pack = load_rule_packs()[0]
+    assert load_rule_packs()[0] is pack
+    write_pack("units", {"name": "Changed", "rules": []}, mtime=2_000_000_000)
+    assert load_rule_packs()[0].name == "Changed"
+    os.remove(path)
+    assert load_rule_packs() == []
+
+
+def test_apply_rule_packs():
+    write_pack("units", UNITS)
+    text, stats = apply_rule_packs("5 kg of Colour, 6 kg", load_rule_packs())
+    assert text == "5\u00a0kg of color, 6\u00a0kg"
+    assert [(pack, rule, count) for pack, rule, count, _ in stats] == [("Units", "kg", 2), ("Units", "#2", 1)]
+
@@ -0,0 +1,124 @@
+import itertools
+import random
+
+import pytest
+
+from typobuster import tools
+from typobuster.sanitizer import compile_plan, find_typos, sanitization_flags, sanitize
+
+PIECES = ["a", "B", "word", " ", "  ", "\t", "\n", "\n\n", "-", "–", ".", ",", ",,", "„", "”", "!", "?", ";", ":",
+          "é", "1"]
+
+
+def chain(text, hyphens, quotes, punctuation_marks, add_spaces_after_punctuation, spaces, convert_tabs, tab_width,
+          eol):
+    """ The Web cleanup as a chain of sanitize_* functions, each over the whole text """
+    if hyphens:
+        text = tools.sanitize_hyphens(text, 0, len(text))
+    if quotes:
+        text = tools.sanitize_quotes(text, 0, len(text))
+    if punctuation_marks:
+        text = tools.sanitize_punctuation_marks(text, 0, len(text))
+    if add_spaces_after_punctuation:
+        text = tools.add_spaces_after_punctuation_marks(text, 0, len(text))
+    if spaces:
+        text = tools.sanitize_spaces(text, 0, len(text), convert_tabs, tab_width)
+    if eol:
+        text = tools.sanitize_eol(text, 0, len(text))
+    return text
+
+
+def random_text(rnd, pieces=40):
+    return "".join(rnd.choice(PIECES) for _ in range(rnd.randint(0, pieces)))
+
+
+def varied_text(rnd, length):
+    # words separated by ever different runs of separators
+    parts = []
+    while sum(map(len, parts)) < length:
+        parts.append(rnd.choice(["a", "word", "B"]))
+        parts.append("".join(rnd.choice(" \t\n-.,!?") for _ in range(rnd.randint(1, 8))))
+    return "".join(parts)
+
+
+ALL_FLAGS = [flags + (4,) + (eol,) for flags in itertools.product([False, True], repeat=6) for eol in [False, True]]
+
+
+@pytest.mark.parametrize("flags", ALL_FLAGS)
+def test_same_as_chain(flags):
+    rnd = random.Random(str(flags))
+    plan = compile_plan(*flags)
+    for _ in range(100):
+        text = random_text(rnd)
+        expected = chain(text, *flags)
+        assert plan.apply(text) == expected, repr(text)
+        # the whole-text path, taken if segments hardly repeat
+        assert plan.run_chain(plan.map_chars(text)) == expected, repr(text)
+
+
+@pytest.mark.parametrize("varied", [False, True])
+def test_paths_on_large_text(settings, varied):
+    rnd = random.Random(1)
+    text = varied_text(rnd, 100000) if varied else random_text(rnd, 20) * 5000
+    flags = sanitization_flags(settings)
+    plan = compile_plan(*flags)
+    assert plan.varied_segments(plan.map_chars(text)) == varied
+    assert sanitize(text, settings) == chain(text, *flags)
+
+
+@pytest.mark.parametrize("text", ["", " ", "\t", "\n", " \t \n ", "-", ",,", "a", " a ", "\ta\t", "a.b", "a . , b"])
+def test_edge_cases(settings, text):
+    assert sanitize(text, settings) == chain(text, *sanitization_flags(settings))
+
+
+def test_tab_width(settings):
+    settings["sanitize-eol"] = False
+    settings["tab-width"] = 2
+    assert sanitize("a\tb\t\tc", settings) == "a b c"
+    settings["tab-mode"] = "tabs"
+    assert sanitize("a\tb", settings) == "a\tb"
+
+
+def test_counted(settings):
+    plan = compile_plan(*sanitization_flags(settings))
+    assert plan.apply_counted("Clean text, nothing to do.") == ("Clean text, nothing to do.", 0)
+    result, changes = plan.apply_counted("Word ,word  „quoted”")
+    assert result == sanitize("Word ,word  „quoted”", settings)
+    assert changes > 0
+
+
+def test_disabled(settings):
+    for key in ["sanitize-hyphens", "sanitize-quotes", "sanitize-punctuation-marks",
+                "sanitize-add-spaces-after-punctuation", "sanitize-spaces", "sanitize-eol"]:
+        settings[key] = False
+    text = " a  –  b ,, c\n\n"
+    assert not compile_plan(*sanitization_flags(settings)).enabled
+    assert sanitize(text, settings) == text
+
+
+def test_find_typos(settings):
+    assert find_typos("Clean text, nothing to do.", settings) == []
+    assert find_typos("a – b", settings) == [(2, 3)]
+    assert find_typos("a- b -c", settings) == [(1, 2), (5, 6)]
+    assert find_typos("„quoted” x,, too", settings) == [(0, 1), (7, 8), (10, 12)]
+    assert find_typos("word .Next", settings) == [(4, 5), (5, 7)]
+    assert find_typos("a  b\tc", settings) == [(1, 3), (4, 5)]
+    settings["tab-mode"] = "tabs"
+    assert find_typos("a\tb", settings) == []
+
+
+def test_find_typos_at_range_bounds(settings):
+    # a range linted on its own starts and ends at line bounds
+    assert find_typos(" leading\nmiddle \n trailing ", settings) == [(0, 1), (15, 16), (17, 18), (26, 27)]
+
+
+def test_no_typos_nothing_to_clean(settings):
+    # with the end-of-line rule off (it changes every line break), text with no typos found is left as it is; hyphens
+    # at the text bounds are skipped, as the lint takes them for line bounds (where the cleanup adds no spaces)
+    settings["sanitize-eol"] = False
+    settings["tab-mode"] = "tabs"
+    rnd = random.Random(0)
+    for _ in range(3000):
+        text = random_text(rnd, 10)
+        if not find_typos(text, settings) and not text.startswith("-") and not text.endswith("-"):
+            assert sanitize(text, settings) == text, repr(text)
@@ -0,0 +1,132 @@
+import os
+import pickle
+import random
+
+import pytest
+
+from typobuster import search
+from typobuster.edits import apply_hunks
+from typobuster.search import SearchIndex, count_matches, find_all, find_next, find_previous, index_dir, load_index, \
+    match_number, replacement_hunks
+from tests.test_edits import Buffer
+
+
+@pytest.fixture(autouse=True)
+def small_blocks(monkeypatch):
+    monkeypatch.setattr(search, "BLOCK_SIZE", 16)
+    monkeypatch.setattr(search, "OVERLAP", 4)
+
+
+def random_text(rnd, length=400):
+    return "".join(rnd.choice("abc \n") for _ in range(length))
+
+
+def phrases(rnd, text):
+    # found ones, longer than the overlap included, and ones that may not be there
+    result = ["a", "ab", "zzz", "abc", "aaaa"]
+    for _ in range(10):
+        start = rnd.randrange(len(text))
+        result.append(text[start:start + rnd.randint(1, 12)])
+    return [p for p in result if p]
+
+
+def test_find():
+    text = "one two one two"
+    assert find_next(text, "two", 0) == (4, 7)
+    assert find_next(text, "two", 5) == (12, 15)
+    assert find_next(text, "one", 9) == (0, 3)
+    assert find_previous(text, "one", 15) == (8, 11)
+    assert find_previous(text, "one", 10) == (0, 3)
+    assert find_previous(text, "two", 3) == (12, 15)
+    assert find_next(text, "three", 0) is None
+    assert find_previous(text, "three", 0) is None
+
+
+def test_index_same_as_plain_search():
+    rnd = random.Random(0)
+    for _ in range(10):
+        text = random_text(rnd)
+        index = SearchIndex.build(text)
+        for phrase in phrases(rnd, text):
+            for pos in range(len(text) + 1):
+                assert index.find_next(text, phrase, pos) == find_next(text, phrase, pos), (phrase, pos)
+                assert index.find_previous(text, phrase, pos) == find_previous(text, phrase, pos), (phrase, pos)
+            assert count_matches(text, phrase, index.windows(phrase, len(text))) == text.count(phrase)
+            assert find_all(text, phrase, index=index) == find_all(text, phrase)
+
+
+def test_index_after_edits():
+    rnd = random.Random(1)
+    text = random_text(rnd, 2000)
+    index = SearchIndex.build(text)
+    for _ in range(20):
+        start = rnd.randrange(len(text))
+        end = min(start + rnd.randint(0, 30), len(text))
+        inserted = random_text(rnd, rnd.randint(0, 30))
+        text = text[:start] + inserted + text[end:]
+        index.replace(start, end - start, len(inserted))
+        for phrase in phrases(rnd, text):
+            for pos in range(0, len(text) + 1, 7):
+                assert index.find_next(text, phrase, pos) == find_next(text, phrase, pos), (phrase, pos)
+                assert index.find_previous(text, phrase, pos) == find_previous(text, phrase, pos), (phrase, pos)
+            assert find_all(text, phrase, index=index) == find_all(text, phrase)
+    assert index.stale()
+
+
+def test_count_matches():
+    assert count_matches("aaaa", "aa") == 2
+    assert count_matches("aaaa", "") == 0
+    assert count_matches("abab", "ab", windows=[(0, 2)]) == 1
+    # a phrase overlapping itself is counted in the whole text
+    assert count_matches("aaaa", "aa", windows=[(0, 2)]) == 2
+
+
+def test_replace():
+    rnd = random.Random(2)
+    text = random_text(rnd, 2000)
+    index = SearchIndex.build(text)
+    for phrase in phrases(rnd, text):
+        for start, end in [(0, len(text)), (10, 500), (700, 700)]:
+            for idx in [None, index]:
+                buffer = Buffer(text)
+                count = apply_hunks(buffer, 0, replacement_hunks(text, phrase, "\\1 <new>", start, end, idx))
+                assert buffer.text == text[:start] + text[start:end].replace(phrase, "\\1 <new>") + text[end:]
+                assert count == text.count(phrase, start, end)
+                assert buffer.actions == (1 if count else 0)
+
+
+def test_match_number():
+    text = "".join(random.choice(["ab", "c", "d ", "abab"]) for _ in range(5000))
+    for phrase in ["ab", "d", "aba"]:
+        starts = [start for start, end in find_all(text, phrase)] if phrase != "aba" else \
+            [i for i in range(len(text)) if text.startswith(phrase, i)]
+        total = count_matches(text, phrase)
+        previous = None
+        for start in random.sample(starts, 50) + starts[:3] + starts[-3:]:
+            expected = text.count(phrase, 0, start) + 1
+            assert match_number(text, phrase, start) == expected
+            assert match_number(text, phrase, start, previous, total) == expected
+            previous = (start, expected)
+
+
+def test_index_cache():
+    text = random_text(random.Random(2)) + "żółw 中文 😀"
+    index = load_index(text)
+    assert len(os.listdir(index_dir())) == 1
+    cached = load_index(text)
+    assert cached is not index
+    assert cached.postings == index.postings
+    assert cached.starts == index.starts
+
+
+@pytest.mark.parametrize("content", [b"", b"TBIX", b"garbage" * 100, pickle.dumps(("not", "an index"))])
+def test_index_cache_invalid(content):
+    text = random_text(random.Random(3))
+    load_index(text)
+    path = os.path.join(index_dir(), os.listdir(index_dir())[0])
+    with open(path, "wb") as file:
+        file.write(content)
+    # rebuilt, and cached again
+    assert load_index(text).postings == SearchIndex.build(text).postings
+    with open(path, "rb") as file:
+        assert file.read(4) == b"TBIX"
@@ -0,0 +1,47 @@
+import random
+
+import pytest
+
+from typobuster import stats
+from typobuster.stats import count_words, document_stats
+
+
+@pytest.mark.parametrize("size", [1, 2, 5, 1024])
+def test_count_words(monkeypatch, size):
+    monkeypatch.setattr(stats, "CHUNK_SIZE", size)
+    rnd = random.Random(size)
+    for _ in range(300):
+        text = "".join(rnd.choice(["word", "a", "żółw", " ", "  ", "\n", "\t", "　", "中"])
+                       for _ in range(rnd.randint(0, 30)))
+        assert count_words(text) == len(text.split()), repr(text)
+
+
+def test_document_stats():
+    text = "It's a well-known fact. Is it?\n\n  Yes, it is!\n \n\n一个词 no end"
+    result = document_stats(text, {})
+    assert result["characters"] == len(text)
+    assert result["non-space-characters"] == len("".join(text.split()))
+    # "It's", "well-known": one word each; CJK characters: a word each
+    assert result["words"] == 14
+    assert result["sentences"] == 4
+    assert result["paragraphs"] == 3
+    assert result["top-words"][:2] == [("is", 2), ("it", 2)]
+    assert result["unique-words"] == 12
+    assert result["average-sentence-length"] == 14 / 4
+
+    empty = document_stats("", {})
+    assert (empty["words"], empty["sentences"], empty["paragraphs"], empty["average-sentence-length"]) == (0, 0, 0, 0)
+
+
+def test_document_stats_cache():
+    rnd = random.Random(0)
+    paragraphs = [" ".join(rnd.choice(["one", "Two", "three.", "four!"]) for _ in range(rnd.randint(1, 20)))
+                  for _ in range(50)]
+    cache = {}
+    for _ in range(20):
+        idx = rnd.randrange(len(paragraphs))
+        paragraphs[idx] = paragraphs[idx] + " edited."
+        text = "\n\n".join(paragraphs)
+        # same as counted from scratch, with the cache holding paragraphs of the current text only
+        assert document_stats(text, cache) == document_stats(text, {})
+        assert len(cache) == len(set(paragraphs))
@@ -0,0 +1,128 @@
+import queue
+import random
+import threading
+import time
+
+import pytest
+
+from typobuster.sanitizer import sanitize
+from typobuster.streaming import STREAMABLE_TRANSFORMATIONS, process_file, read_ahead, sanitize_stream, \
+    transform_stream
+from typobuster.transformations import transform
+
+PIECES = ["a", "word", "Word", "żółw", "CamelCase", " ", "  ", "\t", "\n", "\n\n", "\r\n", "\r", "-", "–", ".", ",",
+          ",,", "„", "!", "  \n"]
+
+
+def random_text(rnd, pieces=60):
+    return "".join(rnd.choice(PIECES) for _ in range(rnd.randint(0, pieces)))
+
+
+def chunked(text, size):
+    return (text[i:i + size] for i in range(0, len(text), size))
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 64])
+def test_sanitize_stream(settings, size):
+    rnd = random.Random(size)
+    for _ in range(300):
+        text = random_text(rnd)
+        assert "".join(sanitize_stream(chunked(text, size), settings)) == sanitize(text, settings), repr(text)
+
+
+def test_sanitize_stream_counts(settings):
+    text = "a  b ,c\n\n\nd – e"
+    counter = [0]
+    assert "".join(sanitize_stream(chunked(text, 3), settings, counter)) == sanitize(text, settings)
+    assert counter[0] > 0
+
+
+@pytest.mark.parametrize("transformation", STREAMABLE_TRANSFORMATIONS)
+@pytest.mark.parametrize("size", [1, 3, 64])
+def test_transform_stream(settings, transformation, size):
+    rnd = random.Random(transformation + str(size))
+    for _ in range(100):
+        text = random_text(rnd)
+        assert "".join(transform_stream(chunked(text, size), transformation)) == \
+               transform(text, transformation, settings), repr(text)
+
+
+def test_transform_stream_unknown():
+    with pytest.raises(ValueError):
+        list(transform_stream(["a\nb"], "sort-asc"))
+
+
+def test_process_file(settings, tmp_path):
+    text = "Some  text ,with typos\n\n\n– and more .\n" * 1000
+    path = tmp_path / "input.txt"
+    path.write_text(text)
+
+    output_path = tmp_path / "out" / "output.txt"
+    assert process_file(str(path), str(output_path), settings=settings, chunk_size=100) > 0
+    assert output_path.read_text() == sanitize(text, settings)
+    assert path.read_text() == text
+
+    assert process_file(str(path), str(output_path), transformation="uppercase", settings=settings) is None
+    assert output_path.read_text() == text.upper()
+
+    # in place; an already clean file is left intact
+    process_file(str(path), None, settings=settings, chunk_size=100)
+    assert path.read_text() == sanitize(text, settings)
+    clean_path = tmp_path / "clean.txt"
+    clean_path.write_text("Nothing to do.")
+    mtime = clean_path.stat().st_mtime_ns
+    assert process_file(str(clean_path), None, settings=settings) == 0
+    assert clean_path.stat().st_mtime_ns == mtime
+
+
+def test_read_ahead(tmp_path):
+    path = tmp_path / "text.txt"
+    path.write_text(random_text(random.Random(0), 2000))
+    slots, cancelled = threading.Semaphore(3), threading.Event()
+    chunks = queue.Queue()
+
+    def read():
+        for chunk in read_ahead(str(path), slots, cancelled, 100):
+            chunks.put(chunk)
+        chunks.put(None)
+
+    threading.Thread(target=read, daemon=True).start()
+    received = []
+    while True:
+        # the reader waits until a chunk is consumed
+        time.sleep(0.001)
+        # (and the end mark)
+        assert chunks.qsize() <= 3 + 1
+        chunk = chunks.get()
+        if chunk is None:
+            break
+        received.append(chunk)
+        slots.release()
+    # (line breaks translated as in read_chunks)
+    assert "".join(received) == path.read_text()
+    assert all(len(chunk) == 100 for chunk in received[:-1])
+
+
+def test_read_ahead_cancelled(tmp_path):
+    path = tmp_path / "text.txt"
+    path.write_text("a" * 1000)
+    slots, cancelled = threading.Semaphore(2), threading.Event()
+    chunks = []
+
+    def read():
+        for chunk in read_ahead(str(path), slots, cancelled, 100):
+            chunks.append(chunk)
+
+    reader = threading.Thread(target=read, daemon=True)
+    reader.start()
+    # no chunk consumed: the reader waits for a slot until cancelled
+    time.sleep(0.3)
+    assert len(chunks) == 2 and reader.is_alive()
+    cancelled.set()
+    reader.join(1)
+    assert not reader.is_alive()
+    assert chunks == ["a" * 100] * 2
+
+    # cancelled before reading
+    assert list(read_ahead(str(path), threading.Semaphore(2), cancelled, 100)) == []
+
@@ -0,0 +1,86 @@
+import random
+from collections import Counter
+
+import pytest
+
+from typobuster import tools
+from typobuster.tools import count_lines, iter_lines, line_blocks, remove_duplicate_lines, unique_lines
+
+PIECES = ["a", "A", "b", " a", "a ", "a  b", "a b", "", " ", "\t"]
+
+
+def random_text(rnd, rows=30):
+    separators = ["\n", "\n", "\r\n", "\r", "\x0b", " "]
+    return "".join(rnd.choice(PIECES) + rnd.choice(separators) for _ in range(rnd.randint(0, rows)))
+
+
+def keys(text, ignore_case, ignore_whitespace):
+    return [tools.normalize_line(line, ignore_case, ignore_whitespace) for line in text.splitlines()]
+
+
+def expected_remove_duplicates(text, *flags):
+    seen = set()
+    result = []
+    for line, key in zip(text.splitlines(), keys(text, *flags)):
+        if key not in seen:
+            seen.add(key)
+            result.append(line)
+    return "\n".join(result)
+
+
+def expected_unique(text, *flags):
+    counts = Counter(keys(text, *flags))
+    return "\n".join(line for line, key in zip(text.splitlines(), keys(text, *flags)) if counts[key] == 1)
+
+
+def expected_count(text, *flags):
+    counts = Counter(keys(text, *flags))
+    first = {}
+    for line, key in zip(text.splitlines(), keys(text, *flags)):
+        first.setdefault(key, line)
+    rows = sorted(counts.items(), key=lambda item: item[1], reverse=True)
+    return "\n".join(f"{count} {first[key]}" for key, count in rows)
+
+
+def check(text, flags):
+    assert remove_duplicate_lines(text, *flags) == expected_remove_duplicates(text, *flags), repr(text)
+    assert unique_lines(text, *flags) == expected_unique(text, *flags), repr(text)
+    assert count_lines(text, *flags) == expected_count(text, *flags), repr(text)
+
+
+FLAGS = [(False, False), (True, False), (False, True), (True, True)]
+
+
+@pytest.mark.parametrize("flags", FLAGS)
+def test_duplicate_rows(flags):
+    rnd = random.Random(str(flags))
+    for _ in range(300):
+        check(random_text(rnd), flags)
+
+
+@pytest.mark.parametrize("flags", FLAGS)
+def test_hash_collisions(flags, monkeypatch):
+    monkeypatch.setattr(tools, "hash", lambda key: len(key) % 2, raising=False)
+    rnd = random.Random(str(flags))
+    for _ in range(100):
+        check(random_text(rnd), flags)
+
+
+def test_several_blocks():
+    rnd = random.Random(0)
+    text = "".join(rnd.choice(["row", "Row", "other row", "row "]) + f" {rnd.randint(0, 99999)}\n"
+                   for _ in range(200000))
+    assert len(text) > tools.LINE_BLOCK_SIZE * 2
+    check(text, (True, True))
+
+
+@pytest.mark.parametrize("size", [1, 3, 7])
+def test_line_blocks(size):
+    rnd = random.Random(size)
+    for _ in range(100):
+        text = random_text(rnd)
+        blocks = list(line_blocks(text, size))
+        assert "".join(block for _, block in blocks) == text
+        assert [offset for offset, _ in blocks] == [sum(len(b) for _, b in blocks[:i]) for i in range(len(blocks))]
+        assert [line for _, block in blocks for line in block.splitlines()] == text.splitlines()
+        assert list(iter_lines(text)) == text.splitlines()
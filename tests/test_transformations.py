@@ -0,0 +1,108 @@
+import json
+import os
+import random
+
+import pytest
+
+from typobuster import transformations
+from typobuster.sanitizer import sanitize
+from typobuster.transformations import SANITIZE, Cancelled, apply_enabled_rule_packs, load_pipelines, \
+    pipeline_steps, pipelines_path, run_pipeline, run_pipeline_in_chunks, save_pipelines, transform
+from tests.test_rules import UNITS, write_pack
+from tests.test_streaming import random_text
+
+TEXT = "b  row ,\n\nA row\nb  row ,\nżółw\n"
+
+
+def test_pipeline_steps(settings):
+    steps = [step for step, key in pipeline_steps()]
+    assert len(steps) == len(set(steps))
+    assert SANITIZE in steps
+    for step in steps:
+        assert isinstance(run_pipeline(TEXT, [step], settings), str)
+
+
+def test_run_pipeline(settings):
+    assert run_pipeline(TEXT, [], settings) == TEXT
+    steps = [SANITIZE, "remove-duplicate-rows", "sort-asc", "uppercase"]
+    expected = transform(transform(transform(sanitize(TEXT, settings), "remove-duplicate-rows", settings),
+                                   "sort-asc", settings), "uppercase", settings)
+    assert run_pipeline(TEXT, steps, settings) == expected
+
+
+def test_save_load_pipelines(settings):
+    assert load_pipelines() == {}
+    pipelines = {"Clean up": [SANITIZE, "remove-empty-rows"], "Empty": [], "Żółw": ["remove-non-ascii"]}
+    save_pipelines(pipelines)
+    assert load_pipelines() == pipelines
+
+
+def test_load_invalid_pipelines(settings):
+    with open(pipelines_path(), "w") as file:
+        json.dump({"ok": ["title"], "unknown": ["title", "no-such-step"], "not a list": "title"}, file)
+    assert load_pipelines() == {"ok": ["title"]}
+
+    for content in ["[]", "not json"]:
+        with open(pipelines_path(), "w") as file:
+            file.write(content)
+        assert load_pipelines() == {}
+
+    os.remove(pipelines_path())
+    assert load_pipelines() == {}
+
+
+def test_enabled_packs(settings):
+    write_pack("units", UNITS)
+    assert apply_enabled_rule_packs("5 kg", settings) == "5 kg"
+
+    settings["sanitize-rule-packs"] = ["units"]
+    rule_stats = []
+    assert apply_enabled_rule_packs("5 kg", settings, rule_stats) == "5\u00a0kg"
+    assert len(rule_stats) == 2
+
+    # after the built-in rules
+    text = "5  kg , colour"
+    assert run_pipeline(text, [SANITIZE], settings) == sanitize(text, settings).replace(" kg", "\u00a0kg") \
+        .replace("colour", "color")
+
+
+def test_pipeline_in_chunks(settings, monkeypatch):
+    monkeypatch.setattr(transformations, "CHUNK_SIZE", 5)
+    rnd = random.Random(0)
+    steps = [SANITIZE, "title", "sort-desc", "remove-non-ascii", "ordered", "count-rows"]
+    for _ in range(100):
+        text = random_text(rnd)
+        fractions = []
+        assert run_pipeline_in_chunks(text, steps, settings, progress=fractions.append) == \
+               run_pipeline(text, steps, settings), repr(text)
+        assert fractions == sorted(fractions)
+        assert all(0 <= f <= 1 for f in fractions)
+        assert fractions[-1] == 1.0
+
+
+def test_pipeline_in_chunks_rule_stats(settings):
+    write_pack("units", UNITS)
+    settings["sanitize-rule-packs"] = ["units"]
+    rule_stats = []
+    assert run_pipeline_in_chunks("5 kg", [SANITIZE], settings, rule_stats=rule_stats) == "5\u00a0kg"
+    assert len(rule_stats) == 2
+
+
+@pytest.mark.parametrize("steps", [["uppercase"], [SANITIZE], ["sort-asc"], ["uppercase", "sort-asc"]])
+def test_pipeline_cancelled(settings, monkeypatch, steps):
+    monkeypatch.setattr(transformations, "CHUNK_SIZE", 10)
+    with pytest.raises(Cancelled):
+        run_pipeline_in_chunks("a\n" * 100, steps, settings, cancelled=lambda: True)
+
+    # cancelled midway: no more progress reported
+    checks = []
+    fractions = []
+
+    def cancelled():
+        checks.append(True)
+        return len(checks) > 3
+
+    with pytest.raises(Cancelled):
+        run_pipeline_in_chunks("a\n" * 100, steps * 5, settings, progress=fractions.append, cancelled=cancelled)
+    assert 1.0 not in fractions
+    assert len(checks) == 4
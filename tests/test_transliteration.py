@@ -0,0 +1,56 @@
+import json
+import os
+
+from typobuster import transliteration
+from typobuster.tools import config_dir
+from typobuster.transliteration import build_table, cache_path, languages, transliterate
+
+
+def test_transliterate():
+    assert transliterate("") == ""
+    assert transliterate("plain ASCII\n") == "plain ASCII\n"
+    assert transliterate("Zażółć gęślą jaźń") == "Zazolc gesla jazn"
+    assert transliterate("straße, ﬁne, ①, Øre") == "strasse, fine, 1, Ore"
+    assert transliterate("„quoted” – dash…") == '"quoted" - dash...'
+    # characters with no transliteration are removed
+    assert transliterate("中文 text 😀") == " text "
+
+
+def test_same_as_character_by_character():
+    table = build_table()
+    text = "".join(chr(c) for c in range(0x20, 0x3000))
+    expected = "".join(c if c.isascii() else table.get(ord(c), "") for c in text)
+    assert transliterate(text) == expected
+
+
+def test_languages():
+    assert transliterate("Ärger über Öl") == "Arger uber Ol"
+    assert transliterate("Ärger über Öl", "de") == "Aerger ueber Oel"
+    assert transliterate("Ærø på ø", "da") == "AEroe paa oe"
+
+
+def test_user_overrides():
+    os.makedirs(os.path.join(config_dir(), "transliteration"))
+    with open(os.path.join(config_dir(), "transliteration", "xx.json"), "w") as file:
+        json.dump({"é": "ee", "ab": "skipped", "a": "skipped too"}, file)
+    assert transliterate("café", "xx") == "cafee"
+    assert transliterate("ab a", "xx") == "ab a"
+    assert languages() == ["da", "de", "nb", "xx"]
+
+
+def test_table_cached(monkeypatch):
+    monkeypatch.setattr(transliteration, "_tables", {})
+    transliterate("é")
+    assert os.path.isfile(cache_path())
+
+    monkeypatch.setattr(transliteration, "_tables", {})
+    monkeypatch.setattr(transliteration, "build_table", lambda: {})
+    assert transliterate("é") == "e"
+
+
+def test_sparse_and_dense_text():
+    table = build_table()
+    sparse = "plain ASCII text, " * 10000 + "café ① 中 Øre" + " more text" * 10000
+    dense = "Zażółć gęślą jaźń, 中文 " * 10000
+    for text in [sparse, dense, dense + sparse, sparse + dense]:
+        assert transliterate(text) == "".join(c if ord(c) < 128 else table.get(ord(c), "") for c in text)
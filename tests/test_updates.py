@@ -0,0 +1,59 @@
+from typobuster.updates import UpdateScheduler
+
+
+class MainLoop:
+    """ Idle callbacks, run on iterate() until they return False """
+
+    def __init__(self):
+        self.sources = []
+
+    def idle_add(self, callback):
+        self.sources.append(callback)
+
+    def iterate(self):
+        sources, self.sources = self.sources, []
+        self.sources += [callback for callback in sources if callback()]
+
+
+def test_coalesced():
+    loop = MainLoop()
+    refreshed = []
+    updates = UpdateScheduler(loop.idle_add, refreshed.append)
+
+    # many signals, a single refresh
+    for _ in range(1000):
+        updates.mark("cursor", "stats", "title")
+    updates.mark("cursor")
+    assert len(loop.sources) == 1
+    assert refreshed == []
+    loop.iterate()
+    assert refreshed == [{"cursor", "stats", "title"}]
+    assert loop.sources == []
+
+    # nothing marked, nothing refreshed
+    loop.iterate()
+    assert len(refreshed) == 1
+
+    updates.mark("stats")
+    updates.mark()
+    loop.iterate()
+    assert refreshed[1:] == [{"stats"}]
+
+
+def test_marked_while_refreshing():
+    loop = MainLoop()
+    refreshed = []
+
+    def refresh(items):
+        refreshed.append(items)
+        if "stats" in items:
+            # e.g. a label change moving the cursor
+            updates.mark("cursor")
+
+    updates = UpdateScheduler(loop.idle_add, refresh)
+    updates.mark("stats")
+    loop.iterate()
+    assert refreshed == [{"stats"}]
+    loop.iterate()
+    assert refreshed == [{"stats"}, {"cursor"}]
+    assert loop.sources == []
@@ -0,0 +1,131 @@
+"""
+Headless batch mode: applies the Web cleanup rules, or a line transformation, to files and directories, in a
+process pool. Files are streamed, so their size is not limited by RAM.
+This module must not import Gtk.
+"""
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from typobuster import extsort, parallel, streaming
+from typobuster.tools import eprint, load_settings
+
+
+def collect_files(paths):
+    """
+    Returns (file path, output path relative to the output directory) tuples for given files and directories; files
+    given more than once (also within given directories) are listed once
+    """
+    files = []
+    for path in paths:
+        path = os.path.abspath(path)
+        if os.path.isdir(path):
+            for root, dirs, names in os.walk(path):
+                dirs.sort()
+                for name in sorted(names):
+                    file_path = os.path.join(root, name)
+                    files.append((file_path, os.path.join(os.path.basename(path), os.path.relpath(file_path, path))))
+        elif os.path.isfile(path):
+            files.append((path, os.path.basename(path)))
+        else:
+            eprint(f"'{path}' does not exist")
+
+    seen = set()
+    unique = []
+    for file_path, rel_path in files:
+        if file_path not in seen:
+            seen.add(file_path)
+            unique.append((file_path, rel_path))
+    return unique
+
+
+def output_collisions(files):
+    """ Returns {output path relative to the output directory: [file paths]} for outputs of more than one file """
+    sources = {}
+    for path, rel_path in files:
+        sources.setdefault(rel_path, []).append(path)
+    return {rel_path: paths for rel_path, paths in sources.items() if len(paths) > 1}
+
+
+def process_file(path, output_path, transformation, settings, jobs=1):
+    """
+    Worker: sanitizes (if no transformation given) or transforms a single file, writes the result to output_path
+    (or in place, if None). Returns (path, number of changes, time taken, error message)
+    """
+    start = time.perf_counter()
+    try:
+        if transformation in ["sort-asc", "sort-desc"]:
+            # rows are sorted with a bounded memory use, whatever the file size
+            extsort.sort_file(path, output_path, order=transformation[5:])
+            changes = None
+        else:
+            changes = streaming.process_file(path, output_path, transformation=transformation, settings=settings,
+                                             jobs=jobs)
+        return path, changes, time.perf_counter() - start, None
+    except Exception as e:
+        return path, None, time.perf_counter() - start, str(e)
+
+
+def process_files(paths, jobs=None, output_dir=None, transformation=None, settings=None):
+    """
+    Sanitizes or transforms files and directories in a process pool, prints a summary.
+    Returns the number of failures.
+    """
+    if settings is None:
+        settings = load_settings(log=eprint)
+
+    files = collect_files(paths)
+    if not files:
+        eprint("No files to process")
+        return 1
+    if output_dir:
+        collisions = output_collisions(files)
+        for rel_path, sources in collisions.items():
+            eprint(f"'{rel_path}' would be written for each of: {', '.join(sources)}")
+        if collisions:
+            eprint("Nothing processed: give files of the same name separately, or to different output directories")
+            return 1
+
+    tasks = []
+    for path, rel_path in files:
+        output_path = os.path.join(os.path.abspath(output_dir), rel_path) if output_dir else None
+        tasks.append((path, output_path, transformation, settings))
+
+    # files above the parallel threshold are split into blocks processed in a pool, one file at a time
+    step = transformation or parallel.SANITIZE
+    large = [t for t in tasks if jobs != 1 and parallel.use_parallel(step, os.path.getsize(t[0]), settings, jobs)]
+    tasks = [t for t in tasks if t not in large]
+
+    start = time.perf_counter()
+    results = []
+    for task in large:
+        results.append(process_file(*task, jobs=jobs))
+        print_result(*results[-1])
+    if jobs == 1 or len(tasks) == 1:
+        for task in tasks:
+            results.append(process_file(*task))
+            print_result(*results[-1])
+    elif tasks:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            futures = [executor.submit(process_file, *task) for task in tasks]
+            for future in as_completed(futures):
+                results.append(future.result())
+                print_result(*results[-1])
+
+    failures = len([r for r in results if r[3]])
+    summary = f"Processed {len(results) - failures} file(s)"
+    if transformation is None:
+        summary += f", {sum(r[1] for r in results if r[1])} change(s)"
+    print(f"{summary}, {failures} failure(s) in {time.perf_counter() - start:.3f} s")
+
+    return failures
+
+
+def print_result(path, changes, elapsed, error):
+    if error:
+        eprint(f"{path}: error: {error}")
+    elif changes is None:
+        print(f"{path}: {elapsed:.3f} s")
+    else:
+        print(f"{path}: {changes} change(s), {elapsed:.3f} s")
@@ -0,0 +1,79 @@
+"""
+Command line entry point. Headless modes run from here, without importing Gtk.
+"""
+
+import argparse
+import sys
+
+from typobuster.__about__ import __version__
+from typobuster.streaming import STREAMABLE_TRANSFORMATIONS
+
+# streamed, or externally sorted
+HEADLESS_TRANSFORMATIONS = STREAMABLE_TRANSFORMATIONS + ["sort-asc", "sort-desc"]
+
+
+def arg_parser():
+    parser = argparse.ArgumentParser(description="Simple text editor")
+    parser.add_argument("file_path", type=str, nargs="*",
+                        help="Path of the file to open (files and directories to process in headless modes; one "
+                             "file at most in the editor)")
+    parser.add_argument("-v",
+                        "--version",
+                        action="version",
+                        version="%(prog)s version {}".format(__version__),
+                        help="display version information")
+    parser.add_argument("--sanitize",
+                        action="store_true",
+                        help="apply Web cleanup rules from settings to given files and directories, without the GUI")
+    parser.add_argument("--transform",
+                        type=str,
+                        choices=HEADLESS_TRANSFORMATIONS,
+                        metavar="NAME",
+                        help="apply a line transformation to given files and directories, without the GUI; one of: "
+                             "{}".format(", ".join(HEADLESS_TRANSFORMATIONS)))
+    parser.add_argument("-j",
+                        "--jobs",
+                        type=int,
+                        default=None,
+                        help="number of worker processes in headless modes (default: number of CPUs)")
+    parser.add_argument("-o",
+                        "--output-dir",
+                        type=str,
+                        default=None,
+                        help="write results to this directory instead of modifying files in place")
+    parser.add_argument("--profile",
+                        type=str,
+                        nargs="?",
+                        const="typobuster-profile",
+                        default=None,
+                        metavar="PREFIX",
+                        help="record latencies of event handlers and transformations; on exit, write a summary to "
+                             "PREFIX.json and a Chrome trace to PREFIX.trace.json (default: typobuster-profile)")
+    return parser
+
+
+def main(argv=None):
+    parser = arg_parser()
+    args = parser.parse_args(argv)
+
+    if args.sanitize or args.transform:
+        if args.sanitize and args.transform:
+            parser.error("--sanitize and --transform can't be used together")
+        if not args.file_path:
+            parser.error("at least one file or directory required")
+        if args.jobs is not None and args.jobs < 1:
+            parser.error("--jobs must be a positive number")
+
+        from typobuster.batch import process_files
+        return 1 if process_files(args.file_path, jobs=args.jobs, output_dir=args.output_dir,
+                                  transformation=args.transform) else 0
+
+    if len(args.file_path) > 1:
+        parser.error("only one file can be opened in the editor; more are only accepted by --sanitize and --transform")
+
+    from typobuster.main import main as gui_main
+    return gui_main(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
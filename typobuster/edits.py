@@ -0,0 +1,210 @@
+"""
+Minimal buffer edits: instead of deleting a text range and inserting the new text, only the changed hunks are
+replaced. Unchanged text keeps its marks, tags and syntax highlighting, and the cursor and scroll position survive.
+Also tracks whether the buffer differs from the text last loaded or saved.
+This module must not import Gtk: buffers are only used via the Gtk.TextBuffer methods.
+"""
+
+from bisect import bisect_left
+from collections import Counter
+from itertools import accumulate
+
+# below this length, a changed middle part is replaced as a whole, without diffing lines
+MIN_DIFF_LENGTH = 1024
+# above this number of hunks, a single replace is cheaper than applying them one by one
+MAX_HUNKS = 10000
+
+
+def common_prefix_length(a, b):
+    # bisect on slice comparisons, which run in C
+    low, high = 0, min(len(a), len(b))
+    while low < high:
+        mid = (low + high + 1) // 2
+        if a[low:mid] == b[low:mid]:
+            low = mid
+        else:
+            high = mid - 1
+    return low
+
+
+def common_suffix_length(a, b):
+    low, high = 0, min(len(a), len(b))
+    while low < high:
+        mid = (low + high + 1) // 2
+        if a[len(a) - mid:len(a) - low] == b[len(b) - mid:len(b) - low]:
+            low = mid
+        else:
+            high = mid - 1
+    return low
+
+
+def trimmed_hunk(old, new, offset):
+    """ (start, end, replacement) for old replaced with new at offset, with the common prefix and suffix left out """
+    prefix = common_prefix_length(old, new)
+    suffix = common_suffix_length(old[prefix:], new[prefix:])
+    return offset + prefix, offset + len(old) - suffix, new[prefix:len(new) - suffix]
+
+
+def anchors(old_lines, new_lines):
+    """
+    (old index, new index) pairs of lines occurring exactly once in both lists, longest sequence in the same order on
+    both sides (as in the patience diff)
+    """
+    old_counts = Counter(old_lines)
+    new_counts = Counter(new_lines)
+    new_index = {line: j for j, line in enumerate(new_lines) if new_counts[line] == 1}
+    pairs = [(i, new_index[line]) for i, line in enumerate(old_lines) if old_counts[line] == 1 and line in new_index]
+
+    # longest increasing subsequence of new indexes
+    tails = []
+    previous = [None] * len(pairs)
+    tail_indexes = []
+    for k, (i, j) in enumerate(pairs):
+        pos = bisect_left(tails, j)
+        if pos == len(tails):
+            tails.append(j)
+            tail_indexes.append(k)
+        else:
+            tails[pos] = j
+            tail_indexes[pos] = k
+        previous[k] = tail_indexes[pos - 1] if pos > 0 else None
+
+    result = []
+    k = tail_indexes[-1] if tail_indexes else None
+    while k is not None:
+        result.append(pairs[k])
+        k = previous[k]
+    result.reverse()
+    return result
+
+
+def diff_lines(old_lines, new_lines):
+    """ Returns (i1, i2, j1, j2) blocks of lines: old_lines[i1:i2] to be replaced with new_lines[j1:j2] """
+    blocks = []
+    i = j = 0
+    for anchor_i, anchor_j in anchors(old_lines, new_lines) + [(len(old_lines), len(new_lines))]:
+        # the gap between anchors: leave out equal lines at both ends
+        i2, j2 = anchor_i, anchor_j
+        while i < i2 and j < j2 and old_lines[i] == new_lines[j]:
+            i += 1
+            j += 1
+        while i < i2 and j < j2 and old_lines[i2 - 1] == new_lines[j2 - 1]:
+            i2 -= 1
+            j2 -= 1
+
+        if i2 - i == j2 - j:
+            # same number of lines: compare them one by one
+            start = None
+            for k in range(i2 - i + 1):
+                if k < i2 - i and old_lines[i + k] != new_lines[j + k]:
+                    if start is None:
+                        start = k
+                elif start is not None:
+                    blocks.append((i + start, i + k, j + start, j + k))
+                    start = None
+        else:
+            blocks.append((i, i2, j, j2))
+
+        i, j = anchor_i + 1, anchor_j + 1
+    return blocks
+
+
+def diff_hunks(old, new):
+    """
+    Returns (start, end, replacement) tuples turning old into new, with start and end being offsets in old text,
+    in ascending order. Empty list if texts are equal.
+    """
+    if old == new:
+        return []
+
+    start, end, replacement = trimmed_hunk(old, new, 0)
+    old_middle = old[start:end]
+    if len(old_middle) < MIN_DIFF_LENGTH or len(replacement) < MIN_DIFF_LENGTH:
+        return [(start, end, replacement)]
+
+    # diff lines of what's left, then trim each changed block
+    old_lines = old_middle.splitlines(keepends=True)
+    new_lines = replacement.splitlines(keepends=True)
+    old_offsets = [start] + [start + offset for offset in accumulate(len(line) for line in old_lines)]
+    new_offsets = [0] + list(accumulate(len(line) for line in new_lines))
+
+    hunks = []
+    for i1, i2, j1, j2 in diff_lines(old_lines, new_lines):
+        hunks.append(trimmed_hunk(old[old_offsets[i1]:old_offsets[i2]], replacement[new_offsets[j1]:new_offsets[j2]],
+                                  old_offsets[i1]))
+
+    if len(hunks) > MAX_HUNKS:
+        return [(start, end, replacement)]
+    return hunks
+
+
+def replace_range(buffer, start, end, text, old_text=None):
+    """
+    Replaces text between start and end iters with given text, as a single user action, changing only what differs.
+    Pass old_text if already taken from the range. Returns the number of hunks applied.
+    """
+    offset = start.get_offset()
+    if old_text is None:
+        old_text = buffer.get_text(start, end, True)
+    return apply_hunks(buffer, offset, diff_hunks(old_text, text))
+
+
+def apply_hunks(buffer, offset, hunks):
+    """ Applies hunks from diff_hunks at offset, as a single user action. Returns the number of hunks applied. """
+    if not hunks:
+        return 0
+
+    buffer.begin_user_action()
+    # from the end, so that offsets of hunks yet to apply stay valid
+    for hunk_start, hunk_end, replacement in reversed(hunks):
+        if hunk_end > hunk_start:
+            buffer.delete(buffer.get_iter_at_offset(offset + hunk_start), buffer.get_iter_at_offset(offset + hunk_end))
+        if replacement:
+            buffer.insert(buffer.get_iter_at_offset(offset + hunk_start), replacement)
+    buffer.end_user_action()
+
+    return len(hunks)
+
+
+class SavedState:
+    """
+    Tells whether the buffer differs from the text last loaded or saved, without comparing texts on every keystroke.
+    Call edited() on each buffer change.
+    """
+
+    def __init__(self, buffer):
+        self.buffer = buffer
+        # length and hash of the saved text; the hash is only checked if the lengths match
+        self.length = 0
+        self.hash = hash("")
+        # buffer changes counter, and its value when the text was last found to differ from the saved one by the hash
+        self.edits = 0
+        self.checked_at = -1
+
+    def edited(self):
+        self.edits += 1
+
+    def changed(self):
+        # the modified flag is cleared on save and load, and by the undo manager on undoing back to that point
+        if not self.buffer.get_modified():
+            return False
+        if self.buffer.get_char_count() != self.length:
+            return True
+
+        # edited back to the saved text, but not by undo? compare hashes, once per change
+        if self.checked_at == self.edits:
+            return True
+        text = self.buffer.get_text(self.buffer.get_start_iter(), self.buffer.get_end_iter(), True)
+        if hash(text) == self.hash:
+            self.buffer.set_modified(False)
+            return False
+        self.checked_at = self.edits
+        return True
+
+    def set(self, text=None):
+        """ Marks the buffer unmodified; pass text if already taken from the buffer """
+        if text is None:
+            text = self.buffer.get_text(self.buffer.get_start_iter(), self.buffer.get_end_iter(), True)
+        self.length = len(text)
+        self.hash = hash(text)
+        self.buffer.set_modified(False)
@@ -0,0 +1,99 @@
+"""
+External merge sort of rows, for files too large to sort in memory: sorted runs are spilled to temporary files, and
+then merged. Ordering is the same as in sort_lines from tools.py (case-insensitive, stable).
+This module must not import Gtk.
+"""
+
+import heapq
+import os
+import tempfile
+
+from typobuster.streaming import CHUNK_SIZE, read_chunks, iter_lines, strip_line_break
+
+# characters held in memory per run
+RUN_SIZE = 64 * 1024 * 1024
+
+
+class Cancelled(Exception):
+    pass
+
+
+def sort_key(line):
+    return line.lower()
+
+
+def write_run(lines, directory, reverse):
+    lines.sort(key=sort_key, reverse=reverse)
+    fd, path = tempfile.mkstemp(dir=directory, prefix="run-")
+    # lines contain no line breaks (as str.splitlines() knows them), so '\n' can't be confused with their content
+    with os.fdopen(fd, 'w', newline="\n") as file:
+        for line in lines:
+            file.write(line)
+            file.write("\n")
+    return path
+
+
+def read_run(path):
+    with open(path, 'r', newline="\n") as file:
+        for line in file:
+            yield line[:-1]
+
+
+def sort_file(path, output_path=None, order="asc", run_size=RUN_SIZE, tmp_dir=None, progress=None, cancelled=None):
+    """
+    Sorts rows of the file, writes them to output_path (or in place, if None), joined with '\n', as sort_lines does.
+    Memory use is bounded by run_size. progress(fraction of the input read), cancelled() are checked between chunks;
+    raises Cancelled. Returns the number of rows.
+    """
+    reverse = order == "desc"
+    size = os.path.getsize(path)
+    target = output_path if output_path else path
+    out_dir = os.path.dirname(os.path.abspath(target))
+    os.makedirs(out_dir, exist_ok=True)
+
+    def chunks():
+        done = 0
+        for chunk in read_chunks(path, CHUNK_SIZE):
+            if cancelled and cancelled():
+                raise Cancelled
+            yield chunk
+            done += len(chunk)
+            if progress and size:
+                progress(min(done / size, 1.0))
+
+    with tempfile.TemporaryDirectory(dir=tmp_dir, prefix="typobuster-sort-") as runs_dir:
+        runs = []
+        lines = []
+        length = 0
+        count = 0
+        for line in iter_lines(chunks()):
+            line = strip_line_break(line)
+            lines.append(line)
+            length += len(line) + 1
+            count += 1
+            if length >= run_size:
+                runs.append(write_run(lines, runs_dir, reverse))
+                lines = []
+                length = 0
+        # the last run is merged straight from memory
+        lines.sort(key=sort_key, reverse=reverse)
+
+        # heapq.merge is stable, like sorted(): with equal keys, lines from earlier runs come first
+        merged = heapq.merge(*[read_run(p) for p in runs], lines, key=sort_key, reverse=reverse)
+
+        fd, tmp_path = tempfile.mkstemp(dir=out_dir, prefix=".typobuster-")
+        try:
+            with os.fdopen(fd, 'w') as file:
+                for idx, line in enumerate(merged):
+                    if idx:
+                        file.write("\n")
+                    file.write(line)
+            if os.path.isfile(target):
+                os.chmod(tmp_path, os.stat(target).st_mode)
+            os.replace(tmp_path, target)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    return count
@@ -0,0 +1,122 @@
+"""
+Find and replace across a directory tree. Files are searched in a thread pool, as memory-mapped bytes, so that they're
+neither read into memory nor decoded unless they contain the phrase; binary files are skipped. Files are taken as
+UTF-8; replacing writes each file atomically, via a temporary file.
+This module must not import Gtk.
+"""
+
+import mmap
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from typobuster.tools import eprint
+
+# a NUL byte within this many first bytes makes a file binary
+BINARY_CHECK_SIZE = 8192
+
+# matches listed per file (all of them are replaced, though)
+MAX_MATCHES_PER_FILE = 1000
+
+
+def iter_files(root):
+    """ Yields paths of files in the directory tree, hidden files and directories skipped """
+    for dir_path, dir_names, file_names in os.walk(root):
+        dir_names[:] = sorted(name for name in dir_names if not name.startswith("."))
+        for name in sorted(file_names):
+            if not name.startswith("."):
+                path = os.path.join(dir_path, name)
+                if os.path.isfile(path) and not os.path.islink(path):
+                    yield path
+
+
+def search_file(path, phrase):
+    """ Returns (row number, column, row text) tuples of matches in the file; rows and columns count from 1 """
+    needle = phrase.encode("utf-8")
+    matches = []
+    try:
+        with open(path, "rb") as file:
+            if os.fstat(file.fileno()).st_size == 0:
+                return matches
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                if b"\0" in data[:BINARY_CHECK_SIZE]:
+                    return matches
+
+                row = 1
+                counted = 0
+                pos = data.find(needle)
+                while pos != -1 and len(matches) < MAX_MATCHES_PER_FILE:
+                    row += data[counted:pos].count(b"\n")
+                    counted = pos
+                    row_start = data.rfind(b"\n", 0, pos) + 1
+                    row_end = data.find(b"\n", pos)
+                    row_end = len(data) if row_end == -1 else row_end
+                    column = len(data[row_start:pos].decode("utf-8", "replace")) + 1
+                    matches.append((row, column, data[row_start:row_end].decode("utf-8", "replace").rstrip("\r")))
+                    pos = data.find(needle, pos + len(needle))
+    except (OSError, ValueError) as e:
+        eprint(f"{path}: {e}")
+    return matches
+
+
+def search_files(root, phrase, jobs=None, cancelled=None):
+    """
+    Yields (path, matches) for files in the directory tree containing the phrase, as soon as they're searched (so not
+    in order). A few files per thread are in flight at a time. Stops if cancelled() returns True.
+    """
+    jobs = jobs or min(32, (os.cpu_count() or 1) + 4)
+    paths = iter_files(root)
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        pending = {}
+        while True:
+            while len(pending) < jobs * 4:
+                path = next(paths, None)
+                if path is None:
+                    break
+                pending[executor.submit(search_file, path, phrase)] = path
+            if not pending or (cancelled and cancelled()):
+                for future in pending:
+                    future.cancel()
+                return
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                path = pending.pop(future)
+                matches = future.result()
+                if matches:
+                    yield path, matches
+
+
+def replace_in_file(path, old, new):
+    """ Replaces all occurrences of old in the file, atomically. Returns the number of replacements. """
+    try:
+        with open(path, "r", encoding="utf-8", newline="") as file:
+            text = file.read()
+    except (OSError, UnicodeDecodeError) as e:
+        eprint(f"{path}: {e}")
+        return 0
+
+    count = text.count(old)
+    if not count:
+        return 0
+
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), prefix=".typobuster-")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8", newline="") as file:
+            file.write(text.replace(old, new))
+        os.chmod(tmp_path, os.stat(path).st_mode)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        eprint(f"{path}: {e}")
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        return 0
+    return count
+
+
+def replace_in_files(paths, old, new, jobs=None):
+    """ Returns {path: number of replacements} """
+    jobs = jobs or min(32, (os.cpu_count() or 1) + 4)
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        counts = executor.map(replace_in_file, paths, [old] * len(paths), [new] * len(paths))
+        return dict(zip(paths, counts))
@@ -0,0 +1,137 @@
+"""
+Read-only access to files too large to edit: the file is memory-mapped, and only the rows asked for are decoded.
+Rows are found with a sparse index, holding the row number at the start of each block of the file; within a block,
+rows are counted on demand. The index is built block by block, so that the beginning of the file can be read before
+the rest is indexed. Rows end with '\n'; the file is taken as UTF-8.
+This module must not import Gtk.
+"""
+
+import mmap
+from bisect import bisect_left, bisect_right
+
+# bytes per index block
+BLOCK_SIZE = 256 * 1024
+
+# bytes searched at a time, between checks for cancelling
+SEARCH_BLOCK_SIZE = 16 * 1024 * 1024
+
+
+class Cancelled(Exception):
+    pass
+
+
+class MappedFile:
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "rb")
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.size = len(self.data)
+        # byte offset of each indexed block, and number of the row it begins in
+        self.block_offsets = [0]
+        self.block_rows = [0]
+        # rows in the indexed part of the file (all of them, once indexed)
+        self.rows = 1
+        self.indexed = False
+        # (row, byte offset it begins at) found last: rows past the indexed part are counted from there
+        self.hint = (0, 0)
+
+    def close(self):
+        self.data.close()
+        self.file.close()
+
+    def build_index(self, progress=None, cancelled=None):
+        """ Indexes the file; progress(fraction) is called, and cancelled() checked, after each block """
+        offset = self.block_offsets[-1]
+        row = self.block_rows[-1]
+        while offset < self.size:
+            if cancelled and cancelled():
+                raise Cancelled
+            end = min(offset + BLOCK_SIZE, self.size)
+            row += self.data[offset:end].count(b"\n")
+            offset = end
+            if offset < self.size:
+                # (appended in this order, so that readers on another thread never see a block without its row)
+                self.block_rows.append(row)
+                self.block_offsets.append(offset)
+            self.rows = row + 1
+            if progress:
+                progress(offset / self.size)
+        self.indexed = True
+
+    def row_offset(self, row):
+        """ Returns the byte offset the row (counted from 0) begins at; the file size if past the last row """
+        # (the last block the row begins after: blocks may begin mid-row)
+        idx = bisect_left(self.block_rows, row, 0, len(self.block_offsets)) - 1
+        base_row, base_offset = (self.block_rows[idx], self.block_offsets[idx]) if idx >= 0 else (0, 0)
+        hint_row, hint_offset = self.hint
+        if base_row < hint_row <= row:
+            base_row, base_offset = hint_row, hint_offset
+        offset = self.skip_rows(base_offset, row - base_row)
+        if offset < self.size:
+            self.hint = (row, offset)
+        return offset
+
+    def skip_rows(self, offset, count):
+        """ Returns the byte offset count rows after the one at offset; the file size if past the last row """
+        for _ in range(count):
+            offset = self.data.find(b"\n", offset)
+            if offset == -1:
+                return self.size
+            offset += 1
+        return offset
+
+    def read_rows(self, first, count):
+        """ Returns text of count rows from the first one, decoded """
+        start = self.row_offset(first)
+        return self.data[start:self.skip_rows(start, count)].decode("utf-8", "replace")
+
+    def row_at(self, offset):
+        """ Returns (row number, column in characters) of the byte offset """
+        idx = bisect_right(self.block_offsets, offset) - 1
+        row = self.block_rows[idx]
+        # (counted a block at a time: the offset may be far past the indexed part)
+        for start in range(self.block_offsets[idx], offset, BLOCK_SIZE):
+            row += self.data[start:min(start + BLOCK_SIZE, offset)].count(b"\n")
+        row_start = self.data.rfind(b"\n", 0, offset) + 1
+        self.hint = (row, row_start)
+        return row, len(self.data[row_start:offset].decode("utf-8", "replace"))
+
+    def find(self, phrase, offset, cancelled=None):
+        """
+        Returns the byte offset of the first match at or after offset, wrapping around; -1 if none. Raises Cancelled
+        if cancelled() returns True, which is checked after each SEARCH_BLOCK_SIZE bytes.
+        """
+        needle = phrase.encode("utf-8")
+        found = self.find_between(needle, offset, self.size, cancelled)
+        if found == -1:
+            found = self.find_between(needle, 0, min(offset + len(needle) - 1, self.size), cancelled)
+        return found
+
+    def rfind(self, phrase, offset, cancelled=None):
+        """ Returns the byte offset of the last match ending at or before offset, wrapping around; -1 if none """
+        needle = phrase.encode("utf-8")
+        found = self.rfind_between(needle, 0, offset, cancelled)
+        if found == -1:
+            found = self.rfind_between(needle, max(offset - len(needle) + 1, 0), self.size, cancelled)
+        return found
+
+    def find_between(self, needle, start, end, cancelled=None):
+        while start < end:
+            if cancelled and cancelled():
+                raise Cancelled
+            # (blocks overlap, so that matches beginning near the block end are found)
+            found = self.data.find(needle, start, min(start + SEARCH_BLOCK_SIZE + len(needle) - 1, end))
+            if found != -1:
+                return found
+            start += SEARCH_BLOCK_SIZE
+        return -1
+
+    def rfind_between(self, needle, start, end, cancelled=None):
+        while end > start:
+            if cancelled and cancelled():
+                raise Cancelled
+            found = self.data.rfind(needle, max(end - SEARCH_BLOCK_SIZE - len(needle) + 1, start), end)
+            if found != -1:
+                return found
+            end -= SEARCH_BLOCK_SIZE
+        return -1
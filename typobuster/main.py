@@ -6,10 +6,11 @@ Copyright (c) 2025 Piotr Miller & Contributors
 License: GPL3
 """
 
-import argparse
 import cairo
+import atexit
 import os.path
 import subprocess
+import threading
 
 import gi
 
@@ -17,14 +18,31 @@ gi.require_version("Gtk", "3.0")
 gi.require_version("GtkSource", "4")
 from gi.repository import Gtk, Gdk, GLib, GtkSource
 
-from typobuster.ui_components import MenuBar, ButtonBar, SanitizationDialog, AboutWindow, SearchBar, PreferencesDialog
+from typobuster.ui_components import MenuBar, ButtonBar, SanitizationDialog, AboutWindow, SearchBar, PreferencesDialog, \
+    TypoHighlighter, TextCounters, PipelinesDialog, FindInFilesWindow, StatisticsWindow, LargeFileView
 from typobuster.tools import *
-
-from typobuster.__about__ import __version__
+from typobuster.cli import arg_parser
+from typobuster.edits import SavedState, replace_range, diff_hunks, apply_hunks
+from typobuster.updates import UpdateScheduler
+from typobuster.rules import print_rule_stats
+from typobuster.search import replacement_hunks
+from typobuster.stats import count_words
+from typobuster import extsort
+from typobuster.streaming import read_ahead
+from typobuster.transformations import BACKGROUND_THRESHOLD, SANITIZE, Cancelled, run_pipeline, \
+    run_pipeline_in_chunks, load_pipelines
 
 dir_name = os.path.dirname(__file__)
 file_path = ""
 voc = {}
+# --profile given: rule pack stats are printed too
+profiling = False
+
+# files larger than this (in bytes) are loaded on a worker thread, and inserted into the buffer in chunks of this
+# many characters
+LOAD_CHUNK_SIZE = 256 * 1024
+# chunks read ahead of the buffer
+LOAD_CHUNKS_AHEAD = 8
 
 
 def load_vocabulary():
@@ -79,11 +97,18 @@ class Typobuster(Gtk.Window):
 
         self.last_dir_path = ""
         self.search_bar = None
+        # transformation running on a worker thread
+        self.job = None
 
         self.gtk_settings = Gtk.Settings.get_default()
 
-        self.initial_text = ""
+        # status items ("cursor", "stats", "title") marked for refreshing, refreshed together before the next frame
+        self.ui_updates = UpdateScheduler(
+            # (redrawing happens at GDK_PRIORITY_REDRAW, i.e. PRIORITY_HIGH_IDLE + 20)
+            lambda callback: GLib.idle_add(callback, priority=GLib.PRIORITY_HIGH_IDLE + 10), self.refresh_ui)
         self.file_stat = None
+        # read-only view of a file too large to edit, shown instead of the editor
+        self.large_file_view = None
 
         self.gspell_available = False
         self.gspell_text_view = None
@@ -91,8 +116,8 @@ class Typobuster(Gtk.Window):
         self.connect("delete-event", self.on_close)
         self.connect("key-release-event", self.handle_keyboard_release)
 
-        vbox = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=0)
-        self.add(vbox)
+        self.vbox = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=0)
+        self.add(self.vbox)
 
         # Create a GtkSourceView and configure it
         self.source_view = GtkSource.View()
@@ -129,38 +154,43 @@ class Typobuster(Gtk.Window):
         # Set a language for syntax highlighting
         self.lang_manager = GtkSource.LanguageManager()
         self.buffer = GtkSource.Buffer()
+        # whether the text differs from the one last loaded or saved
+        self.saved_state = SavedState(self.buffer)
 
         self.buffer.set_highlight_matching_brackets(
             self.settings["highlight-matching-brackets"])  # Highlight matching brackets
 
         self.source_view.set_buffer(self.buffer)
+        self.typo_highlighter = TypoHighlighter(self.buffer, self.settings)
+        self.counters = TextCounters(self.buffer)
+        self.typo_highlighter.set_enabled(self.settings["highlight-typos"])
         self.buffer.connect("changed", self.on_text_changed)
         self.buffer.connect("mark-set", self.on_cursor_moved)
 
         self.clipboard = Gtk.Clipboard.get(Gdk.SELECTION_CLIPBOARD)
 
         self.menu_bar = MenuBar(self)
-        vbox.pack_start(self.menu_bar, False, False, 0)
+        self.vbox.pack_start(self.menu_bar, False, False, 0)
 
         self.button_bar_wrapper = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL)
         self.button_bar_wrapper.set_property("name", "bar-wrapper")
-        vbox.pack_start(self.button_bar_wrapper, False, False, 0)
+        self.vbox.pack_start(self.button_bar_wrapper, False, False, 0)
 
         self.create_button_bar()
 
         # Create a scrollable window and add the source view
-        scrolled_window = Gtk.ScrolledWindow()
-        scrolled_window.set_hexpand(True)
-        scrolled_window.set_vexpand(True)
-        scrolled_window.add(self.source_view)
+        self.scrolled_window = Gtk.ScrolledWindow()
+        self.scrolled_window.set_hexpand(True)
+        self.scrolled_window.set_vexpand(True)
+        self.scrolled_window.add(self.source_view)
 
         self.connect("enter-notify-event", self.check_file_change)
 
         # Add the scrollable window to the main window
-        vbox.add(scrolled_window)
+        self.vbox.add(self.scrolled_window)
 
         self.search_bar = SearchBar(self)
-        vbox.pack_end(self.search_bar, False, False, 0)
+        self.vbox.pack_end(self.search_bar, False, False, 0)
 
         if "syntax" in self.settings:
             language = self.lang_manager.get_language(self.settings["syntax"])
@@ -174,7 +204,7 @@ class Typobuster(Gtk.Window):
         # Add initial (empty) text to the buffer
         self.buffer.begin_not_undoable_action()
         self.buffer.set_text("")
-        self.reset_initial_text()
+        self.set_saved_state("")
         self.update_stats()
         self.buffer.end_not_undoable_action()
 
@@ -236,14 +266,30 @@ class Typobuster(Gtk.Window):
             self.button_bar_wrapper.hide()
 
     def text_changed(self):
-        return self.buffer.get_text(self.buffer.get_start_iter(), self.buffer.get_end_iter(), True) != self.initial_text
+        return self.saved_state.changed()
 
-    def reset_initial_text(self):
-        self.initial_text = self.buffer.get_text(self.buffer.get_start_iter(), self.buffer.get_end_iter(), True)
+    def set_saved_state(self, text=None):
+        """ Marks the buffer unmodified; pass text if already taken from the buffer """
+        self.saved_state.set(text)
 
     def on_text_changed(self, buffer):
-        self.update_cursor_position()
-        self.update_stats()
+        self.saved_state.edited()
+        self.schedule_ui_update("cursor", "stats", "title")
+
+    def schedule_ui_update(self, *items):
+        """
+        Marks status items ("cursor", "stats", "title") for refreshing. A paste or transformation emits many signals;
+        the items are refreshed once, before the next frame is drawn.
+        """
+        self.ui_updates.mark(*items)
+
+    def refresh_ui(self, items):
+        if "cursor" in items:
+            self.update_cursor_position()
+        if "stats" in items:
+            self.update_stats_label()
+        if "title" in items:
+            self.mark_changes_in_ui()
 
     def update_cursor_position(self):
         """ Get and print the cursor position. """
@@ -256,19 +302,26 @@ class Typobuster(Gtk.Window):
     def on_cursor_moved(self, buffer, iter_, mark):
         """ Fires when the cursor moves. """
         if mark == buffer.get_insert():  # Ignore selection mark
-            self.update_cursor_position()
-        else:
+            self.schedule_ui_update("cursor")
+        elif mark == buffer.get_selection_bound():  # (other marks don't change the selection)
             if self.settings["show-stats"]:
-                self.update_stats()
+                self.schedule_ui_update("stats")
 
     def update_stats(self):
+        self.update_stats_label()
+        self.mark_changes_in_ui()
+
+    def update_stats_label(self):
         if self.settings["show-stats"]:
-            txt, s, e = selected_text(self.buffer)
-            selection = txt[s:e]
+            bounds = self.buffer.get_selection_bounds()
+            if bounds:
+                # only the selected range is counted
+                selection = self.buffer.get_text(bounds[0], bounds[1], True)
+                characters, words = len(selection), count_words(selection)
+            else:
+                characters, words = self.counters.characters, self.counters.words
             self.search_bar.stat_lbl.set_text(
-                f'{self.voc["characters"]}: {len(selection)} {self.voc["words"]}: {len(selection.split())}')
-
-        self.mark_changes_in_ui()
+                f'{self.voc["characters"]}: {characters} {self.voc["words"]}: {words}')
 
     def mark_changes_in_ui(self):
         if self.text_changed():
@@ -313,6 +366,9 @@ class Typobuster(Gtk.Window):
             self.redo()
         elif event.keyval == Gdk.KEY_f and event.state & Gdk.ModifierType.CONTROL_MASK:
             self.search_selection()
+        elif event.keyval == Gdk.KEY_F and (event.state & Gdk.ModifierType.CONTROL_MASK) and (
+                event.state & Gdk.ModifierType.SHIFT_MASK):
+            self.find_in_files()
 
     def search_selection(self):
         txt, s, e = selected_text(self.buffer)
@@ -378,16 +434,16 @@ class Typobuster(Gtk.Window):
         self.search_bar.syntax_lbl.set_text(s_lbl)
 
     def undo(self, *args):
-        if self.buffer.can_undo():
+        if self.buffer.can_undo() and not self.job:
             self.buffer.undo()
 
     def redo(self, *args):
-        if self.buffer.can_redo():
+        if self.buffer.can_redo() and not self.job:
             self.buffer.redo()
 
     def cut_text(self, *args):
         self.buffer.begin_user_action()
-        self.buffer.cut_clipboard(self.clipboard, True)  # True -> delete after copying
+        self.buffer.cut_clipboard(self.clipboard, self.source_view.get_editable())  # delete after copying if editable
         self.buffer.end_user_action()
 
     def copy_text(self, widget):
@@ -395,12 +451,12 @@ class Typobuster(Gtk.Window):
 
     def paste_text(self, widget):
         self.buffer.begin_user_action()
-        self.buffer.paste_clipboard(self.clipboard, None, True)
+        self.buffer.paste_clipboard(self.clipboard, None, self.source_view.get_editable())
         self.buffer.end_user_action()
 
     def delete_text(self, widget):
         self.buffer.begin_user_action()
-        self.buffer.delete_selection(True, True)
+        self.buffer.delete_selection(True, self.source_view.get_editable())
         self.buffer.end_user_action()
 
     def toggle_line_numbers(self, widget):
@@ -424,6 +480,20 @@ class Typobuster(Gtk.Window):
         self.source_view.get_buffer().set_highlight_matching_brackets(self.settings["highlight-matching-brackets"])
         save_settings(self.settings)
 
+    def toggle_highlight_typos(self, widget):
+        self.settings["highlight-typos"] = widget.get_active()
+        self.typo_highlighter.set_enabled(self.settings["highlight-typos"])
+        save_settings(self.settings)
+
+    def toggle_settings_key(self, widget, key):
+        self.settings[key] = widget.get_active()
+        save_settings(self.settings)
+
+    def on_transliteration_language_selected(self, item, language):
+        if item.get_active():
+            self.settings["transliteration-language"] = language
+            save_settings(self.settings)
+
     def toggle_line_wrap(self, widget):
         self.settings["wrap-lines"] = widget.get_active()
         if self.settings["wrap-lines"]:
@@ -472,6 +542,7 @@ class Typobuster(Gtk.Window):
     def on_tab_mode_changed(self, combo):
         self.settings["tab-mode"] = combo.get_active_id()
         self.set_tab_mode()
+        self.typo_highlighter.refresh()
         save_settings(self.settings)
 
     def on_icon_set_changed(self, combo):
@@ -555,52 +626,147 @@ class Typobuster(Gtk.Window):
         self.drag_in_progress = False
 
     def transform_text(self, widget, transformation):
-        start = self.buffer.get_start_iter()
-        end = self.buffer.get_end_iter()
+        self.transform_range([transformation])
+
+    def apply_pipeline(self, widget, name):
+        steps = load_pipelines().get(name)
+        if not steps:
+            eprint(f"Pipeline '{name}' not found")
+            return
+        self.transform_range(steps)
+
+    def transform_range(self, steps):
+        # Apply transformations (and/or the Web cleanup) to the selection, or to the whole text
+        if self.job:
+            return
+        start, end = self.buffer.get_bounds()
         if self.buffer.get_has_selection():
             start, end = self.buffer.get_selection_bounds()
-        if start and end:
-            text = self.buffer.get_text(start, end, True)
-
-            if transformation == "sentence":
-                transformed_text = as_in_sentence(text)
-            elif transformation == "title":
-                transformed_text = as_in_title(text)
-            elif transformation == "lowercase":
-                transformed_text = to_lower_case(text)
-            elif transformation == "uppercase":
-                transformed_text = to_upper(text)
-            elif transformation == "camelcase":
-                transformed_text = to_camel_case(text)
-            elif transformation == "snakecase":
-                transformed_text = to_snake_case(text)
-            elif transformation == "kebabcase":
-                transformed_text = to_kebab_case(text)
-            elif transformation == "unordered":
-                transformed_text = unordered_list(text)
-            elif transformation == "ordered":
-                transformed_text = ordered_list(text)
-            elif transformation == "sort-asc":
-                transformed_text = sort_lines(text)
-            elif transformation == "sort-desc":
-                transformed_text = sort_lines(text, order="desc")
-            elif transformation == "remove-empty-rows":
-                transformed_text = remove_empty_lines(text)
-            elif transformation == "remove-non-ascii":
-                transformed_text = remove_non_ascii(text)
-            elif transformation == "first-to-end":
-                transformed_text = move_first_word_to_end(text)
-            elif transformation == "last-to-beginning":
-                transformed_text = move_last_word_to_beginning(text)
-            elif transformation == "merge-rows":
-                transformed_text = merge_lines(text)
-            else:
-                transformed_text = text
+        text = self.buffer.get_text(start, end, True)
+
+        if len(text) > BACKGROUND_THRESHOLD:
+            self.start_job(start.get_offset(), text, steps)
+        else:
+            # all steps run in memory, the buffer is written once
+            rule_stats = []
+            replace_range(self.buffer, start, end, run_pipeline(text, steps, self.settings, rule_stats), text)
+            self.show_rule_stats(steps, rule_stats)
+
+    def show_rule_stats(self, steps, rule_stats):
+        if SANITIZE in steps:
+            self.search_bar.show_rule_stats(rule_stats)
+            if profiling:
+                print_rule_stats(rule_stats)
+
+    def start_job(self, offset, text, steps):
+        # the buffer is read-only until the job is done, or cancelled
+        self.job = {"cancelled": threading.Event(), "stale": False, "progress": 0, "steps": steps, "rule-stats": []}
+        self.job["handler"] = self.buffer.connect("changed", lambda b, job=self.job: job.update(stale=True))
+        self.source_view.set_editable(False)
+        self.search_bar.show_progress()
+
+        thread = threading.Thread(target=self.run_job, args=(self.job, offset, text, steps, dict(self.settings)),
+                                  daemon=True)
+        thread.start()
+
+    def report_progress(self, job, fraction):
+        # called from worker threads; don't flood the main loop
+        if fraction - job["progress"] >= 0.01 or fraction == 1.0:
+            job["progress"] = fraction
+            GLib.idle_add(self.search_bar.set_progress, fraction)
+
+    def run_job(self, job, offset, text, steps, settings):
+        # worker thread: works on a snapshot of the text, must not touch Gtk
+        hunks = None
+        try:
+            result = run_pipeline_in_chunks(text, steps, settings, lambda f: self.report_progress(job, f),
+                                            job["cancelled"].is_set, job["rule-stats"])
+            hunks = diff_hunks(text, result)
+        except Cancelled:
+            print("Transformation cancelled")
+        except Exception as e:
+            eprint(f"Transformation failed: {e}")
+        GLib.idle_add(self.finish_job, job, offset, hunks)
+
+    def finish_job(self, job, offset, hunks):
+        self.buffer.disconnect(job["handler"])
+        self.source_view.set_editable(True)
+        self.search_bar.hide_progress()
+        self.job = None
+
+        if hunks and not job["stale"]:
+            apply_hunks(self.buffer, offset, hunks)
+        elif hunks:
+            eprint("Text changed during the transformation, result discarded")
+        if hunks is not None and not job["stale"]:
+            self.show_rule_stats(job["steps"], job["rule-stats"])
+        return False
+
+    def sort_file(self, widget, order):
+        # Sort rows of a file too large to edit, with bounded memory use
+        if self.job:
+            return
+        dialog = Gtk.FileChooserDialog(
+            title="Sort File",
+            parent=self,
+            action=Gtk.FileChooserAction.OPEN,
+        )
+        dialog.add_buttons(Gtk.STOCK_CANCEL, Gtk.ResponseType.CANCEL, Gtk.STOCK_OPEN, Gtk.ResponseType.OK)
+        dialog.set_current_folder(self.last_dir_path if self.last_dir_path else os.getenv("HOME"))
+        response = dialog.run()
+        src = dialog.get_filename()
+        dialog.destroy()
+        if response != Gtk.ResponseType.OK:
+            return
 
-            self.buffer.begin_user_action()
-            self.buffer.delete(start, end)
-            self.buffer.insert(start, transformed_text)
-            self.buffer.end_user_action()
+        dialog = Gtk.FileChooserDialog(
+            title="Save Sorted File",
+            parent=self,
+            action=Gtk.FileChooserAction.SAVE,
+        )
+        dialog.add_buttons(Gtk.STOCK_CANCEL, Gtk.ResponseType.CANCEL, Gtk.STOCK_SAVE, Gtk.ResponseType.OK)
+        dialog.set_do_overwrite_confirmation(True)
+        dialog.set_current_folder(os.path.dirname(src))
+        dialog.set_current_name(f"sorted-{os.path.basename(src)}")
+        response = dialog.run()
+        dst = dialog.get_filename()
+        dialog.destroy()
+        if response != Gtk.ResponseType.OK:
+            return
+
+        self.job = {"cancelled": threading.Event(), "progress": 0}
+        self.search_bar.show_progress()
+        thread = threading.Thread(target=self.run_sort_job, args=(self.job, src, dst, order), daemon=True)
+        thread.start()
+
+    def run_sort_job(self, job, src, dst, order):
+        try:
+            count = extsort.sort_file(src, dst, order=order, progress=lambda f: self.report_progress(job, f),
+                                      cancelled=job["cancelled"].is_set)
+            print(f"Sorted {count} row(s) of '{src}' to '{dst}'")
+        except extsort.Cancelled:
+            print("Sorting cancelled")
+        except Exception as e:
+            eprint(f"Sorting '{src}' failed: {e}")
+        GLib.idle_add(self.finish_sort_job)
+
+    def finish_sort_job(self):
+        self.search_bar.hide_progress()
+        self.job = None
+        return False
+
+    def cancel_job(self, *args):
+        if self.job:
+            self.job["cancelled"].set()
+
+    def edit_pipelines(self, widget):
+        PipelinesDialog(self)
+
+    def find_in_files(self, *args):
+        FindInFilesWindow(self)
+
+    def show_statistics(self, widget):
+        StatisticsWindow(self)
 
     def select_range(self, start, end):
         start_iter = self.buffer.get_iter_at_offset(start)
@@ -611,19 +777,33 @@ class Typobuster(Gtk.Window):
         # Apply some basic predefined sanitization
         d = SanitizationDialog(self, self.buffer)
 
-    def replace(self, old, new):
-        start = self.buffer.get_start_iter()
-        end = self.buffer.get_end_iter()
-
-        text = self.buffer.get_text(start, end, True)
-        text = replace_all(text, old, new)
-        self.update_text(text)
+    def replace(self, old, new, in_selection=False):
+        """
+        Replaces all occurrences of old, in the selection or the whole text, with new inserted as is (backslashes
+        aren't escapes: group references only work in regex mode, through GtkSourceView). Returns the number of
+        replacements.
+        """
+        if self.job:
+            return 0
+        # (the search bar keeps the text, and an index of it, while searching)
+        text = self.search_bar.text()
+        start, end = 0, len(text)
+        if in_selection:
+            bounds = self.buffer.get_selection_bounds()
+            if not bounds:
+                return 0
+            start, end = bounds[0].get_offset(), bounds[1].get_offset()
+
+        # each match replaced in place, from the end, as a single user action
+        return apply_hunks(self.buffer, 0, replacement_hunks(text, old, new, start, end, self.search_bar.index))
 
     def set_window_title(self, path):
         filename = os.path.basename(path)
         self.set_title(filename)
 
     def new_file(self, *args):
+        if self.job:
+            return
         title = file_path.split("/")[-1] if file_path else self.voc["untitled"]
         if self.text_changed():
             if self.buffer.get_text(self.buffer.get_start_iter(), self.buffer.get_end_iter(), True):
@@ -640,14 +820,18 @@ class Typobuster(Gtk.Window):
                 if response == Gtk.ResponseType.YES:
                     self.save_file(self.buffer.get_text(self.buffer.get_start_iter(), self.buffer.get_end_iter(), True))
 
+        self.close_large_file_view()
         self.buffer.begin_not_undoable_action()
         self.update_text("")
-        self.reset_initial_text()
+        self.set_saved_state("")
         self.buffer.end_not_undoable_action()
         self.update_stats()
         self.set_window_title(f"{voc['untitled']} - Typobuster")
 
-    def load_file(self, widget, path):
+    def load_file(self, widget, path, position=None):
+        # position: (row, column, length) of text to select once loaded, counted from 0
+        if self.job:
+            return
         if self.text_changed():
             resp = self.on_close(None, None)
             if resp:
@@ -675,21 +859,134 @@ class Typobuster(Gtk.Window):
             return
 
         text = ""
+        self.close_large_file_view()
         if os.path.isfile(path):
             self.last_dir_path = os.path.dirname(path)  # remember last opened dir for file chooser
-            text = load_text_file(path)
             self.file_stat = os.stat(file_path)
             self.update_recent(path)
             self.menu_bar.recent_menu_item.set_sensitive(True)
+            if 0 < self.settings["large-file-threshold"] < self.file_stat.st_size:
+                self.open_large_file_view(path)
+                if position and self.large_file_view:
+                    self.large_file_view.go_to(*position)
+                return
+            if self.file_stat.st_size > LOAD_CHUNK_SIZE:
+                self.start_load(path, position)
+                return
+            text = load_text_file(path)
         self.buffer.begin_not_undoable_action()
         self.update_text(text)
-        self.reset_initial_text()
+        self.set_saved_state(text)
         self.buffer.end_not_undoable_action()
         self.update_stats()
         self.set_window_title(path)
 
         self.search_bar.clear()
         self.source_view.grab_focus()
+        if position:
+            self.select_at(*position)
+
+    def select_at(self, row, column, length):
+        start = self.buffer.get_iter_at_line_offset(row, column)
+        end = start.copy()
+        end.forward_chars(length)
+        self.buffer.select_range(start, end)
+        self.source_view.scroll_to_iter(start, 0.2, False, 0.5, 0.5)
+
+    def open_large_file_view(self, path):
+        global file_path
+        try:
+            self.large_file_view = LargeFileView(self, path)
+        except (OSError, ValueError) as e:
+            eprint(f"Mapping '{path}' failed: {e}")
+            return
+        # nothing to save: the (hidden) editor is empty, and not bound to the file
+        file_path = ""
+        self.file_stat = None
+        self.buffer.begin_not_undoable_action()
+        self.update_text("")
+        self.set_saved_state("")
+        self.buffer.end_not_undoable_action()
+        self.update_stats()
+
+        self.scrolled_window.hide()
+        self.search_bar.hide()
+        self.vbox.pack_start(self.large_file_view, True, True, 0)
+        self.vbox.reorder_child(self.large_file_view, self.vbox.child_get_property(self.scrolled_window, "position"))
+        self.set_window_title(f"{os.path.basename(path)} ({voc['read-only']})")
+        self.large_file_view.view.grab_focus()
+
+    def close_large_file_view(self):
+        if self.large_file_view:
+            self.large_file_view.close()
+            self.large_file_view = None
+            self.scrolled_window.show()
+            self.search_bar.show()
+
+    def start_load(self, path, position=None):
+        # the buffer is read-only, and undo off, until the file is loaded, or loading cancelled; position: as in
+        # load_file, selected once loaded
+        self.job = {"cancelled": threading.Event(), "progress": 0, "loaded": 0, "size": self.file_stat.st_size,
+                    "slots": threading.Semaphore(LOAD_CHUNKS_AHEAD), "position": position}
+        self.buffer.begin_not_undoable_action()
+        self.update_text("")
+        self.source_view.set_editable(False)
+        self.search_bar.clear()
+        self.search_bar.show_progress()
+        self.set_window_title(path)
+
+        thread = threading.Thread(target=self.run_load, args=(self.job, path), daemon=True)
+        thread.start()
+
+    def run_load(self, job, path):
+        # worker thread: reads chunks, the main thread inserts them; a few chunks are read ahead at most
+        error = None
+        try:
+            for chunk in read_ahead(path, job["slots"], job["cancelled"], LOAD_CHUNK_SIZE):
+                # (idle callbacks of the same priority run in order)
+                GLib.idle_add(self.insert_chunk, job, chunk)
+        except Exception as e:
+            error = e
+        GLib.idle_add(self.finish_load, job, path, error)
+
+    def insert_chunk(self, job, chunk):
+        if not job["cancelled"].is_set():
+            self.buffer.insert(self.buffer.get_end_iter(), chunk)
+            # (not a change to save)
+            self.buffer.set_modified(False)
+            job["loaded"] += len(chunk)
+            # (progress in characters of the size in bytes: exact for ASCII)
+            self.search_bar.set_progress(min(job["loaded"] / job["size"], 1.0))
+        job["slots"].release()
+        return False
+
+    def finish_load(self, job, path, error):
+        global file_path
+        self.buffer.end_not_undoable_action()
+        self.source_view.set_editable(True)
+        self.search_bar.hide_progress()
+        self.job = None
+
+        if error or job["cancelled"].is_set():
+            # a partially loaded file must not be saved over the original
+            if error:
+                eprint(f"Loading '{path}' failed: {error}")
+            else:
+                print(f"Loading '{path}' cancelled")
+            self.buffer.begin_not_undoable_action()
+            self.update_text("")
+            self.buffer.end_not_undoable_action()
+            file_path = ""
+            self.file_stat = None
+            self.set_window_title(f"{voc['untitled']} - Typobuster")
+        else:
+            self.buffer.place_cursor(self.buffer.get_start_iter())
+        self.set_saved_state()
+        self.update_stats()
+        self.source_view.grab_focus()
+        if job["position"] and not (error or job["cancelled"].is_set()):
+            self.select_at(*job["position"])
+        return False
 
     def open_file(self, *args):
         if self.text_changed():
@@ -726,7 +1023,7 @@ class Typobuster(Gtk.Window):
                 print(f"Saved text to {file_path}")
                 self.update_recent(file_path)
                 self.file_stat = os.stat(file_path)
-                self.reset_initial_text()
+                self.set_saved_state(text)
                 self.update_stats()
             else:
                 eprint(f"Error saving text to {file_path}: {result}")
@@ -757,7 +1054,7 @@ class Typobuster(Gtk.Window):
                 self.set_window_title(filename)
                 self.file_stat = os.stat(file_path)
                 self.update_recent(file_path)
-                self.reset_initial_text()
+                self.set_saved_state(text)
                 self.update_stats()
             else:
                 eprint(f"Error saving text to {filename}: {result}")
@@ -896,24 +1193,38 @@ class Typobuster(Gtk.Window):
         self.close()
 
 
-def main():
-    parser = argparse.ArgumentParser(description="Simple text editor")
-    parser.add_argument("file_path", type=str, nargs="?", help="Path of the file to open")
-    parser.add_argument("-v",
-                        "--version",
-                        action="version",
-                        version="%(prog)s version {}".format(__version__),
-                        help="display version information")
+def start_profiling(prefix):
+    # classes and modules are instrumented before the window is built, so that signals get connected to timed methods
+    from typobuster import transformations
+    from typobuster.profiling import Profiler
+
+    global profiling
+    profiling = True
+    profiler = Profiler()
+    profiler.instrument(Typobuster, ["on_text_changed", "on_cursor_moved", "refresh_ui", "update_stats",
+                                     "check_file_change", "transform_text", "load_file", "save_file"], "Typobuster.")
+    profiler.instrument(SearchBar, ["on_search_changed"], "SearchBar.")
+    profiler.instrument(sys.modules[__name__], ["run_pipeline", "run_pipeline_in_chunks"])
+    profiler.instrument(transformations, ["sanitize", "transform"])
+    profiler.instrument(Gtk.TextBuffer, ["get_text"], "Gtk.TextBuffer.")
+    atexit.register(profiler.dump, prefix)
+    print("Profiling on")
 
-    args = parser.parse_args()
+
+def main(args=None):
+    if args is None:
+        args = arg_parser().parse_args()
 
     if args.file_path:
         global file_path
-        file_path = args.file_path
+        file_path = args.file_path[0]
 
     GLib.set_prgname('typobuster')
     load_vocabulary()
 
+    if args.profile:
+        start_profiling(args.profile)
+
     window = Typobuster()
 
     screen = Gdk.Screen.get_default()
@@ -940,10 +1251,10 @@ def main():
         """
     provider.load_from_data(css)
 
-    if args.file_path:
-        window.load_file(None, args.file_path)
-
     window.show_all()
+
+    if args.file_path:
+        window.load_file(None, file_path)
     window.switch_stats_visibility()
     window.switch_change_visibility()
     Gtk.main()
@@ -0,0 +1,152 @@
+"""
+Multi-core execution of line-local transformations and of the Web cleanup. Text is split into blocks (of complete
+lines for transformations; after a letter or digit for the sanitizer, which never changes them), blocks are processed
+in a process pool, and results reassembled in order. The output is identical to the in-memory functions.
+Used above the `parallel-threshold` setting (in characters; 0 turns it off), in the GUI and in headless mode.
+This module must not import Gtk.
+"""
+
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from typobuster.sanitizer import compile_plan, sanitization_flags
+from typobuster.streaming import PER_LINE, LINE_BREAKS_INTACT, iter_line_blocks, transform_stream
+from typobuster.transformations import SANITIZE
+
+# characters per block
+BLOCK_SIZE = 1024 * 1024
+
+# transformations whose results are joined with a separator; empty results skipped for the list ones
+JOINED_WITH = dict([(name, "\n") for name in PER_LINE] + [("unordered", "\n"), ("remove-empty-rows", "\n"),
+                                                           ("merge-rows", " ")])
+SKIP_EMPTY = ["unordered", "remove-empty-rows"]
+
+PARALLEL_TRANSFORMATIONS = list(JOINED_WITH) + list(LINE_BREAKS_INTACT) + [SANITIZE]
+
+
+def use_parallel(step, length, settings, jobs=None):
+    jobs = jobs or os.cpu_count() or 1
+    return jobs > 1 and step in PARALLEL_TRANSFORMATIONS and 0 < settings["parallel-threshold"] <= length
+
+
+def is_safe(char):
+    # a character the sanitizer never changes, and which can't belong to a separator segment
+    # (str.isascii() needs Python 3.7)
+    return char < "\x80" and char.isalnum()
+
+
+def text_line_blocks(text, size=BLOCK_SIZE):
+    """ Yields (anchor, block) tuples, blocks being of complete lines, anchors empty """
+    start = 0
+    while start < len(text):
+        # right after '\n' is always a line boundary, also for str.splitlines()
+        idx = text.find("\n", start + size)
+        end = len(text) if idx == -1 else idx + 1
+        yield "", text[start:end]
+        start = end
+
+
+def stream_line_blocks(chunks):
+    """ Same as text_line_blocks, for text read in chunks """
+    for block in iter_line_blocks(chunks):
+        yield "", block
+
+
+def text_sanitizer_blocks(text, size=BLOCK_SIZE):
+    """
+    Yields (anchor, block) tuples. Blocks end with a safe character. Each block but the first one comes with its
+    anchor: the last character of the previous block, which keeps the block's first segment from being taken for the
+    beginning of the text.
+    """
+    start = 0
+    anchor = ""
+    while start < len(text):
+        end = start + size
+        while end < len(text) and not is_safe(text[end - 1]):
+            end += 1
+        end = min(end, len(text))
+        yield anchor, text[start:end]
+        anchor = text[end - 1]
+        start = end
+
+
+def stream_sanitizer_blocks(chunks):
+    """ Same as text_sanitizer_blocks, for text read in chunks """
+    pending = ""
+    anchor = ""
+    for chunk in chunks:
+        pending += chunk
+        end = len(pending)
+        while end > 0 and not is_safe(pending[end - 1]):
+            end -= 1
+        if end > 0:
+            yield anchor, pending[:end]
+            anchor = pending[end - 1]
+            pending = pending[end:]
+    if pending:
+        yield anchor, pending
+
+
+def process_block(anchor, block, step, flags, language):
+    """ Worker: returns the processed block, and the number of sanitizer changes (0 for transformations) """
+    if step == SANITIZE:
+        result, changes = compile_plan(*flags).apply_counted(anchor + block)
+        return result[len(anchor):], changes
+    return "".join(transform_stream([block], step, language)), 0
+
+
+def parallel_process(blocks, step, settings, jobs=None, counter=None, progress=None, cancelled=None):
+    """
+    Yields pieces of the result, processing (anchor, block) tuples in a process pool, in order. A few blocks per
+    worker are in flight at a time, so that blocks may come from a stream. progress(characters processed) is called
+    after each block. If cancelled() returns True, processing stops, leaving the result incomplete.
+    """
+    flags = sanitization_flags(settings) if step == SANITIZE else None
+    language = settings["transliteration-language"]
+    separator = JOINED_WITH.get(step)
+    jobs = jobs or os.cpu_count() or 1
+    first = True
+    done = 0
+
+    # spawned (not forked) workers, as the caller may be a multithreaded Gtk process
+    with ProcessPoolExecutor(max_workers=jobs, mp_context=multiprocessing.get_context("spawn")) as executor:
+        futures = deque()
+        blocks = iter(blocks)
+        while True:
+            while len(futures) < jobs * 2:
+                block = next(blocks, None)
+                if block is None:
+                    break
+                future = executor.submit(process_block, block[0], block[1], step, flags, language)
+                futures.append((len(block[1]), future))
+            if not futures:
+                break
+            if cancelled and cancelled():
+                for _, future in futures:
+                    future.cancel()
+                return
+
+            length, future = futures.popleft()
+            result, changes = future.result()
+            if counter is not None:
+                counter[0] += changes
+            done += length
+            if progress:
+                progress(done)
+
+            if separator is None:
+                yield result
+            elif not (result == "" and step in SKIP_EMPTY):
+                if not first:
+                    yield separator
+                yield result
+                first = False
+
+
+def parallel_apply(text, step, settings, jobs=None, progress=None, cancelled=None):
+    """ Returns the text processed in a process pool. progress(fraction) """
+    blocks = text_sanitizer_blocks(text) if step == SANITIZE else text_line_blocks(text)
+    report = (lambda done: progress(done / len(text))) if progress else None
+    return "".join(parallel_process(blocks, step, settings, jobs, progress=report, cancelled=cancelled))
@@ -0,0 +1,100 @@
+"""
+Latency instrumentation of hot code paths, turned on with --profile. Wrapped functions record each call: a summary
+(count, total, mean, percentiles, max and a histogram of latencies, per function) and a trace viewable in
+chrome://tracing or ui.perfetto.dev are written on exit.
+This module must not import Gtk.
+"""
+
+import functools
+import json
+import os
+import threading
+import time
+
+from typobuster.tools import eprint
+
+# histogram bucket upper bounds, in milliseconds
+BUCKETS = [0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, float("inf")]
+
+# per function, latencies kept for percentiles, and trace events kept in total
+MAX_SAMPLES = 100000
+MAX_EVENTS = 200000
+
+
+class Profiler:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.start = time.perf_counter()
+        # name: [call count, total ms, max ms, bucket counts, samples]
+        self.stats = {}
+        self.events = []
+
+    def record(self, name, started, elapsed):
+        ms = elapsed * 1000
+        with self.lock:
+            stats = self.stats.get(name)
+            if stats is None:
+                self.stats[name] = stats = [0, 0.0, 0.0, [0] * len(BUCKETS), []]
+            stats[0] += 1
+            stats[1] += ms
+            stats[2] = max(stats[2], ms)
+            stats[3][next(idx for idx, bound in enumerate(BUCKETS) if ms <= bound)] += 1
+            if len(stats[4]) < MAX_SAMPLES:
+                stats[4].append(ms)
+            if len(self.events) < MAX_EVENTS:
+                self.events.append({"name": name, "ph": "X", "pid": os.getpid(), "tid": threading.get_ident(),
+                                    "ts": (started - self.start) * 1e6, "dur": elapsed * 1e6})
+
+    def wrap(self, function, name):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.record(name, started, time.perf_counter() - started)
+
+        return wrapper
+
+    def instrument(self, owner, names, prefix=""):
+        """ Replaces functions (or methods, if owner is a class) of given names with timed ones """
+        for name in names:
+            setattr(owner, name, self.wrap(getattr(owner, name), prefix + name))
+
+    def summary(self):
+        result = {}
+        with self.lock:
+            for name, (count, total, maximum, buckets, samples) in sorted(self.stats.items()):
+                samples = sorted(samples)
+                result[name] = {
+                    "count": count,
+                    "total-ms": round(total, 3),
+                    "mean-ms": round(total / count, 3),
+                    "p50-ms": round(percentile(samples, 50), 3),
+                    "p95-ms": round(percentile(samples, 95), 3),
+                    "p99-ms": round(percentile(samples, 99), 3),
+                    "max-ms": round(maximum, 3),
+                    "histogram": {f"<={bound}ms" if bound != float("inf") else f">{BUCKETS[-2]}ms": n
+                                  for bound, n in zip(BUCKETS, buckets) if n},
+                }
+        return result
+
+    def dump(self, prefix):
+        """ Writes the summary to {prefix}.json, and the trace to {prefix}.trace.json """
+        summary_path = f"{prefix}.json"
+        trace_path = f"{prefix}.trace.json"
+        try:
+            with open(summary_path, "w") as file:
+                json.dump(self.summary(), file, indent=2)
+            with self.lock:
+                with open(trace_path, "w") as file:
+                    json.dump({"traceEvents": self.events, "displayTimeUnit": "ms"}, file)
+            print(f"Profile saved to {summary_path}, trace to {trace_path}")
+        except OSError as e:
+            eprint(f"Failed saving profile: {e}")
+
+
+def percentile(samples, p):
+    if not samples:
+        return 0.0
+    return samples[min(int(len(samples) * p / 100), len(samples) - 1)]
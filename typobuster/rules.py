@@ -0,0 +1,107 @@
+r"""
+User-defined Web cleanup rules. Rule packs are JSON files in the `rules` subdirectory of the config dir, e.g.:
+
+{
+  "name": "Polish typography",
+  "rules": [
+    {"name": "Non-breaking space before units", "pattern": "(\\d) (kg|km|cm|m)\\b", "replacement": "\\1\u00a0\\2"},
+    {"name": "Polish quotes", "pattern": "\"([^\"]*)\"", "replacement": "„\\1”"}
+  ]
+}
+
+Rules are applied in order, after the built-in ones; optional "ignore-case" and "multiline" rule keys set regex flags.
+Packs are compiled once, and recompiled only if the file modification time changes.
+This module must not import Gtk.
+"""
+
+import os
+import re
+import time
+
+from typobuster.tools import config_dir, eprint, load_json
+
+# path: (modification time, RulePack)
+_packs = {}
+
+
+def rules_dir():
+    return os.path.join(config_dir(), "rules")
+
+
+class Rule:
+    def __init__(self, name, pattern, replacement, flags=0):
+        self.name = name
+        self.regex = re.compile(pattern, flags)
+        self.replacement = replacement
+
+
+class RulePack:
+    def __init__(self, file_name, name, rules):
+        # file name without extension, as stored in settings
+        self.id = file_name
+        self.name = name
+        self.rules = rules
+
+
+def compile_pack(path):
+    data = load_json(path)
+    file_name = os.path.splitext(os.path.basename(path))[0]
+    if not isinstance(data, dict) or not isinstance(data.get("rules"), list):
+        eprint(f"{path}: no 'rules' list found")
+        return None
+
+    rules = []
+    for idx, rule in enumerate(data["rules"]):
+        try:
+            flags = 0
+            if rule.get("ignore-case"):
+                flags |= re.IGNORECASE
+            if rule.get("multiline"):
+                flags |= re.MULTILINE
+            rules.append(Rule(rule.get("name", f"#{idx + 1}"), rule["pattern"], rule.get("replacement", ""), flags))
+        except (KeyError, AttributeError, re.error) as e:
+            eprint(f"{path}: skipping rule #{idx + 1}: {e}")
+    return RulePack(file_name, data.get("name", file_name), rules)
+
+
+def load_rule_packs():
+    """ Returns rule packs from the rules directory, sorted by file name; only new and modified files are compiled """
+    paths = []
+    if os.path.isdir(rules_dir()):
+        paths = sorted(os.path.join(rules_dir(), name) for name in os.listdir(rules_dir()) if name.endswith(".json"))
+
+    packs = []
+    for path in paths:
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            continue
+        cached = _packs.get(path)
+        if not cached or cached[0] != mtime:
+            cached = (mtime, compile_pack(path))
+            _packs[path] = cached
+        if cached[1]:
+            packs.append(cached[1])
+
+    # forget removed files
+    for path in list(_packs):
+        if path not in paths:
+            del _packs[path]
+
+    return packs
+
+
+def apply_rule_packs(text, packs):
+    """ Applies rules of given packs in order. Returns the text, and (pack, rule, matches, seconds) tuples """
+    stats = []
+    for pack in packs:
+        for rule in pack.rules:
+            start = time.perf_counter()
+            text, count = rule.regex.subn(rule.replacement, text)
+            stats.append((pack.name, rule.name, count, time.perf_counter() - start))
+    return text, stats
+
+
+def print_rule_stats(stats):
+    for pack_name, rule_name, count, elapsed in sorted(stats, key=lambda s: s[3], reverse=True):
+        print(f"{pack_name} / {rule_name}: {count} match(es), {elapsed * 1000:.2f} ms")
@@ -0,0 +1,228 @@
+"""
+Single-pass sanitization engine for the Web cleanup tool.
+
+Rules enabled in settings are compiled into a cached plan: a character map stage, and a single regex pass over
+separator segments (runs of whitespace, hyphens and punctuation marks). Rules only ever touch characters inside such
+segments, so the rule chain runs on each (short, heavily repeated) segment instead of on the whole text. Texts whose
+segments hardly repeat (so that the per-segment Python callback costs more than it saves) go through the chain as
+whole-text C-level passes instead. Either way, the result is identical to the chain of sanitize_* functions from
+tools.py.
+"""
+
+import re
+from functools import lru_cache
+
+# number of distinct segments remembered by a plan
+SEGMENT_CACHE_SIZE = 4096
+
+# characters sampled, and segments found in them at least, to tell if segments repeat enough to be cached
+SAMPLE_SIZE = 16384
+MIN_SAMPLED_SEGMENTS = 64
+
+# characters any of the rules may touch or match
+SEPARATORS = r"\s\-.,!?;:"
+
+# separator segment, unless a single space between two words (the most frequent case, never changed by any rule)
+SEGMENT_PATTERN = r" [{0}]+|[^\S ][{0}]*|[\-.,!?;:][{0}]*".format(SEPARATORS)
+# a single space at the beginning or the end of the text (changed only by stripping the text)
+EDGE_SPACE_PATTERN = r"|\A (?![{0}])| \Z".format(SEPARATORS)
+# tells if the segment is followed by an ASCII letter (what matters for adding spaces after punctuation marks)
+FOLLOWING_LETTER_PATTERN = r"(?=([A-Za-z]))?"
+
+SPACES_BEFORE_PUNCTUATION_RE = re.compile(r'\s+([.,!?;:])')
+NO_SPACE_AFTER_PUNCTUATION_RE = re.compile(r'([.,!?;:])([A-Za-z])')
+MULTIPLE_SPACES_RE = re.compile(r" {2,}")
+TABS_RE = re.compile(r'\t+')
+MULTIPLE_EOL_RE = re.compile(r"\n{2,}")
+
+
+def sanitization_flags(settings):
+    """ Rule switches from the settings dictionary, in the form accepted by `compile_plan` """
+    return (settings["sanitize-hyphens"],
+            settings["sanitize-quotes"],
+            settings["sanitize-punctuation-marks"],
+            settings["sanitize-add-spaces-after-punctuation"],
+            settings["sanitize-spaces"],
+            settings["tab-mode"] == "spaces",
+            settings["tab-width"],
+            settings["sanitize-eol"])
+
+
+class SanitizationPlan:
+    def __init__(self, hyphens, quotes, punctuation_marks, add_spaces_after_punctuation, spaces, convert_tabs,
+                 tab_width, eol):
+        self.hyphens = hyphens
+        self.quotes = quotes
+        self.punctuation_marks = punctuation_marks
+        self.add_spaces_after_punctuation = add_spaces_after_punctuation
+        self.spaces = spaces
+        self.convert_tabs = spaces and convert_tabs
+        self.tab_width = tab_width
+        self.eol = eol
+
+        # character map stage (a few characters only, so str.replace is way faster than str.translate here)
+        self.char_map = {}
+        if hyphens:
+            self.char_map["–"] = "-"  # Replace en-dashes with hyphens
+        if quotes:
+            self.char_map["„"] = '"'  # Replace German-style quotes with English-style quotes
+            self.char_map["”"] = '"'
+
+        # rule chain: (pattern, replacement) steps before and after stripping the text (if tabs converted); patterns are
+        # either strings to replace or compiled regexes. The steps run on separator segments, or on the whole text.
+        self.steps_before_strip = []
+        self.steps_after_strip = []
+
+        if hyphens:
+            self.steps_before_strip += [(" -", " - "), ("- ", " - ")]  # Add spaces around hyphens
+        if quotes:
+            self.steps_before_strip.append((",,", '"'))
+        if punctuation_marks:
+            self.steps_before_strip += [(SPACES_BEFORE_PUNCTUATION_RE, r"\1"), (". ,", ".,")]
+        if add_spaces_after_punctuation:
+            self.steps_before_strip.append((NO_SPACE_AFTER_PUNCTUATION_RE, r"\1 \2"))
+        if spaces:
+            self.steps_before_strip.append((MULTIPLE_SPACES_RE, " "))
+            if self.convert_tabs:
+                self.steps_before_strip.append((TABS_RE, " " * tab_width))
+                self.steps_after_strip.append((MULTIPLE_SPACES_RE, " "))
+            self.steps_after_strip += [(" \n", "\n"), ("\n ", "\n")]
+        if eol:
+            self.steps_after_strip += [(MULTIPLE_EOL_RE, "\n"), ("\n", "\n\n")]
+
+        self.enabled = bool(self.char_map or self.steps_before_strip or self.steps_after_strip)
+
+        # single regex pass stage
+        pattern = SEGMENT_PATTERN
+        if self.convert_tabs:
+            pattern += EDGE_SPACE_PATTERN
+        self.segment_re = re.compile("(?:{}){}".format(
+            pattern, FOLLOWING_LETTER_PATTERN if add_spaces_after_punctuation else "()"))
+        self._segments = {}
+
+    def sanitize_segment(self, segment, followed_by_letter=False, at_start=False, at_end=False):
+        # any letter stands for all of them: the rules only care if the segment is followed by one
+        s = segment + "a" if followed_by_letter else segment
+        s = self.run_chain(s, at_start, at_end)
+        return s[:-1] if followed_by_letter else s
+
+    def run_chain(self, text, at_start=True, at_end=True, counter=None):
+        """ Runs the rule steps over the text; counts replacements made, if counter given """
+        text = run_steps(text, self.steps_before_strip, counter)
+        if self.convert_tabs:
+            if at_start:
+                text = text.lstrip()
+            if at_end:
+                text = text.rstrip()
+        return run_steps(text, self.steps_after_strip, counter)
+
+    def apply(self, text):
+        return self._apply(text)
+
+    def apply_counted(self, text):
+        """ Returns the sanitized text, and the number of changes made """
+        counter = [0]
+        return self._apply(text, counter), counter[0]
+
+    def _apply(self, text, counter=None):
+        if not self.enabled or not text:
+            return text
+        return self.sanitize_segments(self.map_chars(text, counter), counter)
+
+    def map_chars(self, text, counter=None):
+        """ Character map stage """
+        for char in self.char_map:
+            if counter is not None:
+                counter[0] += text.count(char)
+            text = text.replace(char, self.char_map[char])
+        return text
+
+    def varied_segments(self, text):
+        """ Tells if separator segments in (a sample of) the text are too varied for the segment cache to pay off """
+        segments = [match.group(0, 1) for match in self.segment_re.finditer(text, 0, SAMPLE_SIZE)]
+        return len(segments) >= MIN_SAMPLED_SEGMENTS and len(set(segments)) * 2 > len(segments)
+
+    def sanitize_segments(self, text, counter=None):
+        """
+        Regex pass stage, over text with characters already mapped. If segments are mostly distinct, the rule chain
+        runs over the whole text instead, as it then beats running it (in Python) on each segment. Changes are counted
+        as changed segments, or as replacements made, respectively.
+        """
+        if self.varied_segments(text):
+            return self.run_chain(text, counter=counter)
+
+        length = len(text)
+        segments = self._segments
+        convert_tabs = self.convert_tabs
+
+        def sub(match):
+            if convert_tabs and (match.start() == 0 or match.end() == length):
+                result = self.sanitize_segment(match.group(), bool(match.group(1)), match.start() == 0,
+                                               match.end() == length)
+            else:
+                # (segment, following letter)
+                key = match.group(0, 1)
+                result = segments.get(key)
+                if result is None:
+                    result = self.sanitize_segment(key[0], bool(key[1]))
+                    if len(segments) >= SEGMENT_CACHE_SIZE:
+                        segments.clear()
+                    segments[key] = result
+            if counter is not None and result != match.group():
+                counter[0] += 1
+            return result
+
+        return self.segment_re.sub(sub, text)
+
+
+def run_steps(text, steps, counter=None):
+    for pattern, replacement in steps:
+        if isinstance(pattern, str):
+            if counter is not None:
+                counter[0] += text.count(pattern)
+            text = text.replace(pattern, replacement)
+        else:
+            text, count = pattern.subn(replacement, text)
+            if counter is not None:
+                counter[0] += count
+    return text
+
+
+# Lint rules: what the Web cleanup would change, matched without changing anything. (End-of-line characters are
+# skipped: the cleanup doubles every single one of them, which would mark each line.) Text is linted a few paragraphs
+# at a time, so the beginning and the end of the text count as line bounds.
+LINT_RULES = [
+    (lambda s: s["sanitize-hyphens"], re.compile(r"–|(?<=[^ \n])-(?= )|(?<= )-(?=[^ \n])")),
+    (lambda s: s["sanitize-quotes"], re.compile(r"[„”]|,,")),
+    (lambda s: s["sanitize-punctuation-marks"], re.compile(r"\s+(?=[.,!?;:])")),
+    (lambda s: s["sanitize-add-spaces-after-punctuation"], re.compile(r"[.,!?;:][A-Za-z]")),
+    (lambda s: s["sanitize-spaces"], re.compile(r" {2,}| $|^ ", re.MULTILINE)),
+    (lambda s: s["sanitize-spaces"] and s["tab-mode"] == "spaces", re.compile(r"\t+")),
+]
+
+
+def find_typos(text, settings):
+    """ Returns (start, end) offsets of what the enabled Web cleanup rules would change, sorted """
+    matches = []
+    for enabled, regex in LINT_RULES:
+        if enabled(settings):
+            matches.extend(m.span() for m in regex.finditer(text))
+    matches.sort()
+    return matches
+
+
+def is_separator(char):
+    """ Tells if the character may belong to a separator segment """
+    return char.isspace() or char in "-.,!?;:"
+
+
+@lru_cache(maxsize=16)
+def compile_plan(hyphens, quotes, punctuation_marks, add_spaces_after_punctuation, spaces, convert_tabs, tab_width,
+                 eol):
+    return SanitizationPlan(hyphens, quotes, punctuation_marks, add_spaces_after_punctuation, spaces, convert_tabs,
+                            tab_width, eol)
+
+
+def sanitize(text, settings):
+    """ Apply the Web cleanup rules enabled in settings to the text """
+    return compile_plan(*sanitization_flags(settings)).apply(text)
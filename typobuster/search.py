@@ -0,0 +1,316 @@
+"""
+Search in the text: matches are found on demand, from a position, instead of all at once, so that looking for the next
+match costs no more than the distance to it. Matches are literal and non-overlapping, as re.finditer finds them.
+
+In large texts, a SearchIndex narrows the search down to blocks of the text containing all the phrase trigrams. It is
+kept up to date on edits (edited blocks are searched in full until the index is rebuilt), and cached on disk by the
+hash of the text, so that the same document opened again is indexed at once. Cached indexes are plain arrays of
+numbers (never unpickled, so a file dropped into the cache can't run code), in the cache dir rather than next to the
+document: its directory may be read-only, or shared.
+This module must not import Gtk.
+"""
+
+import hashlib
+import os
+import struct
+import sys
+import tempfile
+from array import array
+from bisect import bisect_left, bisect_right
+
+from typobuster.tools import cache_dir, eprint
+
+# characters per index block
+BLOCK_SIZE = 64 * 1024
+
+# trigrams starting this far into the next block are indexed too: only the phrase prefix this long (plus 2) is looked
+# up, so that matches beginning near the block end are found
+OVERLAP = 64
+
+# bump to invalidate indexes cached on disk
+INDEX_VERSION = 2
+
+# cached index file header: magic, version, block size, overlap, text length, number of trigrams; then arrays of
+# trigram code points (3 per trigram), of posting list lengths, and of all posting lists, as little-endian uint32
+# (array("I") items being 4 bytes long on all supported platforms)
+INDEX_MAGIC = b"TBIX"
+INDEX_HEADER = struct.Struct("<4sIIIQI")
+
+# indexes kept in the cache dir
+MAX_CACHED = 16
+
+
+def find_next(text, phrase, pos):
+    """ Returns (start, end) of the first match at or after pos, wrapping around to the beginning; None if no match """
+    idx = text.find(phrase, pos)
+    if idx == -1:
+        idx = text.find(phrase, 0, pos + len(phrase) - 1)
+    return (idx, idx + len(phrase)) if idx != -1 else None
+
+
+def find_previous(text, phrase, pos):
+    """ Returns (start, end) of the last match ending at or before pos, wrapping around to the end; None if no match """
+    idx = text.rfind(phrase, 0, pos)
+    if idx == -1:
+        idx = text.rfind(phrase, max(pos - len(phrase) + 1, 0))
+    return (idx, idx + len(phrase)) if idx != -1 else None
+
+
+def count_matches(text, phrase, windows=None):
+    """ Counts matches in the text, or in (start, end) windows of it, as returned by SearchIndex.windows """
+    if not phrase:
+        return 0
+    if windows is None or overlaps_itself(phrase):
+        return text.count(phrase)
+    # a match can't overlap another one, so counting in windows gives the same result
+    return sum(text.count(phrase, start, end) for start, end in windows)
+
+
+def find_all(text, phrase, start=0, end=None, index=None):
+    """ Returns (start, end) of all matches between start and end; only in candidate blocks, if index given """
+    end = len(text) if end is None else end
+    windows = index.windows(phrase, len(text)) if index else None
+    if windows is None:
+        windows = [(start, end)]
+
+    matches = []
+    pos = start
+    for window_start, window_end in windows:
+        window_end = min(window_end, end)
+        idx = text.find(phrase, max(window_start, pos), window_end)
+        while idx != -1:
+            pos = idx + len(phrase)
+            matches.append((idx, pos))
+            idx = text.find(phrase, pos, window_end)
+    return matches
+
+
+def replacement_hunks(text, old, new, start=0, end=None, index=None):
+    """ Returns (start, end, new) hunks replacing each match between start and end, for edits.apply_hunks """
+    return [(match_start, match_end, new) for match_start, match_end in find_all(text, old, start, end, index)]
+
+
+def match_number(text, phrase, start, previous=None, total=None):
+    """
+    Returns the 1-based number of the match starting at start. Matches are counted from the nearest known point: the
+    beginning of the text, the (start, number) of a match numbered before, or the end of the text if the total is
+    known; so that stepping from match to match in a large text doesn't count from the beginning every time.
+    """
+    if overlaps_itself(phrase):
+        # overlapping matches: the count depends on where counting starts
+        return text.count(phrase, 0, start) + 1
+    from_end = len(text) - start if total is not None else len(text)
+    if previous is not None:
+        previous_start, previous_number = previous
+        if abs(start - previous_start) < min(start, from_end):
+            if start >= previous_start:
+                return previous_number + text.count(phrase, previous_start, start)
+            return previous_number - text.count(phrase, start, previous_start)
+    if from_end < start:
+        return total - text.count(phrase, start) + 1
+    return text.count(phrase, 0, start) + 1
+
+
+def overlaps_itself(phrase):
+    return any(phrase[:n] == phrase[-n:] for n in range(1, len(phrase)))
+
+
+def trigrams(text):
+    return set(zip(text, text[1:], text[2:]))
+
+
+class SearchIndex:
+    def __init__(self, length, postings):
+        # start offsets of blocks
+        self.starts = list(range(0, max(length, 1), BLOCK_SIZE))
+        # trigram: array of numbers of blocks containing it
+        self.postings = postings
+        # numbers of blocks edited since the index was built
+        self.dirty = set()
+
+    @classmethod
+    def build(cls, text):
+        postings = {}
+        for number, start in enumerate(range(0, max(len(text), 1), BLOCK_SIZE)):
+            for trigram in trigrams(text[start:start + BLOCK_SIZE + OVERLAP + 2]):
+                blocks = postings.get(trigram)
+                if blocks is None:
+                    postings[trigram] = blocks = array("I")
+                blocks.append(number)
+        return cls(len(text), postings)
+
+    def block_at(self, offset):
+        return max(bisect_right(self.starts, offset) - 1, 0)
+
+    def replace(self, offset, removed, inserted):
+        """ Updates the index on removing `removed` characters at offset, and inserting `inserted` ones """
+        first = self.block_at(offset)
+        last = self.block_at(offset + removed)
+        # (the previous block indexes trigrams reaching into the edited one)
+        self.dirty.update(range(max(first - 1, 0), last + 1))
+        for number in range(first + 1, len(self.starts)):
+            start = self.starts[number]
+            if start > offset:
+                self.starts[number] = max(offset, start - removed) + inserted
+
+    def stale(self):
+        # searching edited blocks in full costs more than rebuilding
+        return len(self.dirty) * 8 > len(self.starts)
+
+    def candidates(self, phrase):
+        """ Returns sorted numbers of blocks a match of the phrase may start in; None if the phrase is too short """
+        query = trigrams(phrase[:OVERLAP + 2])
+        if not query:
+            return None
+        blocks = None
+        for trigram in sorted(query, key=lambda t: len(self.postings.get(t, ()))):
+            found = self.postings.get(trigram)
+            if not found:
+                blocks = set()
+                break
+            blocks = set(found) if blocks is None else blocks.intersection(found)
+            if not blocks:
+                break
+        return sorted(blocks | self.dirty)
+
+    def window(self, number, length, phrase_length):
+        """ Returns (start, end) of text to search for matches starting in the block """
+        start = self.starts[number]
+        end = self.starts[number + 1] if number + 1 < len(self.starts) else length
+        return start, min(end + phrase_length - 1, length)
+
+    def windows(self, phrase, length):
+        """ Returns (start, end) windows of the text of given length all the phrase matches are in; None if unknown """
+        blocks = self.candidates(phrase)
+        if blocks is None:
+            return None
+        return [self.window(number, length, len(phrase)) for number in blocks]
+
+    def find_next(self, text, phrase, pos):
+        """ Same as find_next(text, phrase, pos), searching candidate blocks only """
+        blocks = self.candidates(phrase)
+        if blocks is None:
+            return find_next(text, phrase, pos)
+
+        first = bisect_left(blocks, self.block_at(pos))
+        for number in blocks[first:]:
+            start, end = self.window(number, len(text), len(phrase))
+            idx = text.find(phrase, max(start, pos), end)
+            if idx != -1:
+                return idx, idx + len(phrase)
+        # wrap around
+        for number in blocks[:first + 1]:
+            start, end = self.window(number, len(text), len(phrase))
+            idx = text.find(phrase, start, min(end, pos + len(phrase) - 1))
+            if idx != -1:
+                return idx, idx + len(phrase)
+        return None
+
+    def find_previous(self, text, phrase, pos):
+        """ Same as find_previous(text, phrase, pos), searching candidate blocks only """
+        blocks = self.candidates(phrase)
+        if blocks is None:
+            return find_previous(text, phrase, pos)
+
+        last = bisect_right(blocks, self.block_at(pos))
+        for number in reversed(blocks[:last]):
+            start, end = self.window(number, len(text), len(phrase))
+            idx = text.rfind(phrase, start, min(end, pos))
+            if idx != -1:
+                return idx, idx + len(phrase)
+        # wrap around
+        first = bisect_left(blocks, self.block_at(max(pos - len(phrase) + 1, 0)))
+        for number in reversed(blocks[first:]):
+            start, end = self.window(number, len(text), len(phrase))
+            idx = text.rfind(phrase, max(start, pos - len(phrase) + 1), end)
+            if idx != -1:
+                return idx, idx + len(phrase)
+        return None
+
+
+def index_dir():
+    return os.path.join(cache_dir(), "search-index")
+
+
+def write_index(index, length, file):
+    trigram_points = array("I")
+    counts = array("I")
+    blocks = array("I")
+    for trigram, numbers in index.postings.items():
+        trigram_points.extend(map(ord, trigram))
+        counts.append(len(numbers))
+        blocks.extend(numbers)
+    file.write(INDEX_HEADER.pack(INDEX_MAGIC, INDEX_VERSION, BLOCK_SIZE, OVERLAP, length, len(counts)))
+    for values in trigram_points, counts, blocks:
+        if sys.byteorder == "big":
+            values.byteswap()
+        values.tofile(file)
+
+
+def read_index(file, length):
+    """ Returns the SearchIndex read from the file, or None if made for another text length, or by another version """
+    header = file.read(INDEX_HEADER.size)
+    if len(header) != INDEX_HEADER.size:
+        return None
+    magic, version, block_size, overlap, indexed_length, count = INDEX_HEADER.unpack(header)
+    if (magic, version, block_size, overlap, indexed_length) != (INDEX_MAGIC, INDEX_VERSION, BLOCK_SIZE, OVERLAP,
+                                                                 length):
+        return None
+
+    trigram_points = array("I")
+    counts = array("I")
+    blocks = array("I")
+    trigram_points.fromfile(file, count * 3)
+    counts.fromfile(file, count)
+    for values in trigram_points, counts:
+        if sys.byteorder == "big":
+            values.byteswap()
+    blocks.fromfile(file, sum(counts))
+    if sys.byteorder == "big":
+        blocks.byteswap()
+    if file.read(1) or (blocks and max(blocks) >= len(range(0, max(length, 1), BLOCK_SIZE))):
+        # (trailing data, or blocks past the text)
+        raise ValueError("malformed index")
+
+    postings = {}
+    pos = 0
+    chars = list(map(chr, trigram_points))
+    for idx, count in enumerate(counts):
+        postings[tuple(chars[idx * 3:idx * 3 + 3])] = blocks[pos:pos + count]
+        pos += count
+    return SearchIndex(length, postings)
+
+
+def load_index(text):
+    """ Returns the SearchIndex of the text, from the cache if the same text was indexed before """
+    digest = hashlib.sha1(text.encode("utf-8", "surrogatepass")).hexdigest()
+    path = os.path.join(index_dir(), f"{digest}.idx")
+    if os.path.isfile(path):
+        try:
+            with open(path, "rb") as file:
+                index = read_index(file, len(text))
+            if index:
+                os.utime(path)
+                return index
+        except Exception as e:
+            eprint(f"Couldn't load search index {path}: {e}")
+
+    index = SearchIndex.build(text)
+    try:
+        os.makedirs(index_dir(), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=index_dir(), prefix=".idx-")
+        with os.fdopen(fd, "wb") as file:
+            write_index(index, len(text), file)
+        os.replace(tmp_path, path)
+        prune_index_dir()
+    except OSError as e:
+        eprint(f"Couldn't cache search index in {path}: {e}")
+    return index
+
+
+def prune_index_dir():
+    """ Removes least recently used indexes above MAX_CACHED """
+    paths = [os.path.join(index_dir(), name) for name in os.listdir(index_dir()) if name.endswith(".idx")]
+    paths.sort(key=os.path.getmtime, reverse=True)
+    for path in paths[MAX_CACHED:]:
+        os.remove(path)
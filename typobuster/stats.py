@@ -0,0 +1,86 @@
+"""
+Text statistics. Words are counted as str.split() finds them, but without building the list of words, so that counting
+a whole document takes little memory.
+
+Document statistics (the Statistics window) segment words the Unicode way instead: runs of letters and digits, with
+inner apostrophes and hyphens, while each Chinese or Japanese character counts as a word, these being written without
+spaces. Paragraphs are counted separately, and their results cached by paragraph hash, so that after an edit only the
+edited paragraphs are counted again.
+This module must not import Gtk.
+"""
+
+import re
+from collections import Counter
+
+# characters counted at a time
+CHUNK_SIZE = 1024 * 1024
+
+# CJK radicals, kana, CJK ideographs
+CJK = "\u2e80-\u2fdf\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff"
+
+WORD_RE = re.compile(rf"[{CJK}]|[^\W_{CJK}]+(?:['’\-][^\W_{CJK}]+)*")
+SENTENCE_END_RE = re.compile(r"[.!?…]+(?=[\s\"'”’»)\]]|$)|[。！？]+")
+PARAGRAPH_BREAK_RE = re.compile(r"\n[^\S\n]*\n\s*")
+
+# words per minute
+READING_SPEED = 230
+
+
+def count_words(text):
+    count = 0
+    for pos in range(0, len(text), CHUNK_SIZE):
+        count += len(text[pos:pos + CHUNK_SIZE].split())
+        # a word split between chunks was counted twice
+        if pos and not text[pos - 1].isspace() and not text[pos].isspace():
+            count -= 1
+    return count
+
+
+class ParagraphStats:
+    def __init__(self, paragraph):
+        words = WORD_RE.findall(paragraph)
+        self.characters = len(paragraph)
+        self.non_space_characters = len(paragraph) - sum(map(str.isspace, paragraph))
+        self.words = len(words)
+        self.frequencies = Counter(word.lower() for word in words)
+
+        # text after the last sentence end makes a sentence too, if it has words
+        ends = list(SENTENCE_END_RE.finditer(paragraph))
+        tail = paragraph[ends[-1].end():] if ends else paragraph
+        self.sentences = len(ends) + (1 if WORD_RE.search(tail) else 0)
+
+
+def document_stats(text, cache, top=20):
+    """
+    Returns statistics of the text as a dict. cache is a dict kept between calls: paragraph stats by paragraph hash;
+    paragraphs no longer in the text are dropped from it.
+    """
+    found = {}
+    totals = Counter()
+    frequencies = Counter()
+    paragraphs = 0
+    for paragraph in PARAGRAPH_BREAK_RE.split(text):
+        if not paragraph.strip():
+            continue
+        key = (hash(paragraph), len(paragraph))
+        stats = cache.get(key) or found.get(key) or ParagraphStats(paragraph)
+        found[key] = stats
+        paragraphs += 1
+        totals["non-space-characters"] += stats.non_space_characters
+        totals["words"] += stats.words
+        totals["sentences"] += stats.sentences
+        frequencies.update(stats.frequencies)
+    cache.clear()
+    cache.update(found)
+
+    return {
+        "characters": len(text),
+        "non-space-characters": totals["non-space-characters"],
+        "words": totals["words"],
+        "unique-words": len(frequencies),
+        "sentences": totals["sentences"],
+        "paragraphs": paragraphs,
+        "average-sentence-length": totals["words"] / totals["sentences"] if totals["sentences"] else 0,
+        "reading-time": totals["words"] / READING_SPEED,
+        "top-words": frequencies.most_common(top),
+    }
@@ -0,0 +1,212 @@
+"""
+Streaming (constant memory) versions of the Web cleanup and line transformations, for files larger than RAM.
+Text is read in chunks, and only the boundary state the rules need is carried across chunk edges: a pending
+separator segment for the sanitizer, an incomplete line for line transformations. The output is identical to the
+in-memory functions applied to the whole file content.
+This module must not import Gtk.
+"""
+
+import os
+import tempfile
+
+from typobuster.tools import *
+from typobuster.sanitizer import compile_plan, sanitization_flags, is_separator
+from typobuster.transliteration import transliterate
+
+# characters per read
+CHUNK_SIZE = 1024 * 1024
+
+# line transformations: each line (without the line break) processed on its own, results joined with "\n"
+PER_LINE = {
+    "sentence": as_in_sentence,
+    "title": as_in_title,
+    "camelcase": to_camel_case,
+    "snakecase": to_snake_case,
+    "kebabcase": to_kebab_case,
+    "first-to-end": move_first_word_to_end,
+    "last-to-beginning": move_last_word_to_beginning,
+}
+
+# transformations that keep line breaks intact: each line processed on its own, together with its line break
+LINE_BREAKS_INTACT = {
+    "lowercase": to_lower_case,
+    "uppercase": to_upper,
+    "remove-non-ascii": transliterate,
+}
+
+STREAMABLE_TRANSFORMATIONS = list(PER_LINE) + list(LINE_BREAKS_INTACT) + ["unordered", "ordered",
+                                                                          "remove-empty-rows", "merge-rows"]
+
+
+def read_chunks(path, chunk_size=CHUNK_SIZE):
+    # same decoding and newline translation as in load_text_file
+    with open(path, 'r') as file:
+        while True:
+            chunk = file.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+
+def read_ahead(path, slots, cancelled, chunk_size=CHUNK_SIZE):
+    """
+    Same as read_chunks, for a consumer on another thread: each chunk is read ahead only once one of the slots
+    (a Semaphore, released by the consumer when done with a chunk) is free, so that the chunks read and not consumed
+    yet never outnumber the slots. Stops once the cancelled Event is set, also while waiting for a slot.
+    """
+    for chunk in read_chunks(path, chunk_size):
+        while not slots.acquire(timeout=0.1):
+            if cancelled.is_set():
+                return
+        if cancelled.is_set():
+            return
+        yield chunk
+
+
+def is_line_break(char):
+    return char.splitlines() == [""]
+
+
+def iter_line_blocks(chunks):
+    """ Yields the joined chunks cut into blocks of complete lines, line breaks included """
+    pending = ""
+    for chunk in chunks:
+        pending += chunk
+        # a '\r' at the very end could be followed by '\n' in the next chunk
+        idx = len(pending) - 1 if pending.endswith("\r") else len(pending)
+        while idx > 0 and not is_line_break(pending[idx - 1]):
+            idx -= 1
+        if idx > 0:
+            yield pending[:idx]
+            pending = pending[idx:]
+    if pending:
+        yield pending
+
+
+def iter_lines(chunks):
+    """ Yields lines with their line breaks, as str.splitlines(keepends=True) would do on the joined chunks """
+    for block in iter_line_blocks(chunks):
+        yield from block.splitlines(keepends=True)
+
+
+def strip_line_break(line):
+    lines = line.splitlines()
+    return lines[0] if lines else ""
+
+
+def sanitize_stream(chunks, settings, counter=None):
+    """ Yields pieces of the sanitized text """
+    plan = compile_plan(*sanitization_flags(settings))
+    if not plan.enabled:
+        yield from chunks
+        return
+
+    # Text is processed up to (and including) the last character that can't belong to a separator segment, so that
+    # segments, and whatever follows them, are always complete. This character is then carried to the next piece, as
+    # an anchor that keeps its first segment from being taken for the beginning of the text; anchors come out intact.
+    pending = ""
+    anchored = False
+    for chunk in chunks:
+        pending += plan.map_chars(chunk, counter)
+        idx = len(pending) - 1
+        while idx >= 0 and is_separator(pending[idx]):
+            idx -= 1
+        if idx < (1 if anchored else 0):
+            # nothing but separators so far
+            continue
+        result = plan.sanitize_segments(pending[:idx + 1], counter)
+        yield result[1:] if anchored else result
+        pending = pending[idx:]
+        anchored = True
+
+    if pending:
+        result = plan.sanitize_segments(pending, counter)
+        yield result[1:] if anchored else result
+
+
+def transform_stream(chunks, transformation, language=""):
+    """ Yields pieces of the transformed text; language is the transliteration language, for remove-non-ascii """
+    if transformation == "remove-non-ascii":
+        for block in iter_line_blocks(chunks):
+            yield transliterate(block, language)
+        return
+    if transformation in LINE_BREAKS_INTACT:
+        function = LINE_BREAKS_INTACT[transformation]
+        for block in iter_line_blocks(chunks):
+            yield function(block)
+        return
+
+    first = True
+    number = 0
+    for line in iter_lines(chunks):
+        line = strip_line_break(line)
+        if transformation in PER_LINE:
+            line = PER_LINE[transformation](line)
+        elif transformation in ["unordered", "ordered", "remove-empty-rows"]:
+            # (list transformations remove empty lines first)
+            if not line.strip():
+                continue
+            if transformation == "unordered":
+                line = unordered_list(line)
+            elif transformation == "ordered":
+                number += 1
+                line = f"{number}. {line.strip()}"
+        elif transformation != "merge-rows":
+            raise ValueError(f"'{transformation}' can't be applied to a stream")
+
+        if not first:
+            yield " " if transformation == "merge-rows" else "\n"
+        yield line
+        first = False
+
+
+def process_file(path, output_path, transformation=None, settings=None, chunk_size=CHUNK_SIZE, jobs=1):
+    """
+    Sanitizes (if no transformation given) or transforms the file chunk by chunk, writes the result to output_path
+    (or in place, if None). With jobs other than 1, files above the parallel threshold are processed in a process pool.
+    Returns the number of sanitizer changes, or None for transformations.
+    """
+    # (imported here, as the parallel module is built upon this one)
+    from typobuster.parallel import SANITIZE, use_parallel, parallel_process, stream_line_blocks, \
+        stream_sanitizer_blocks
+
+    settings = settings or load_settings(log=eprint)
+    step = transformation or SANITIZE
+    parallel = jobs != 1 and use_parallel(step, os.path.getsize(path), settings, jobs)
+
+    if output_path:
+        out_dir = os.path.dirname(os.path.abspath(output_path))
+        os.makedirs(out_dir, exist_ok=True)
+    else:
+        out_dir = os.path.dirname(os.path.abspath(path))
+
+    counter = [0] if transformation is None else None
+    fd, tmp_path = tempfile.mkstemp(dir=out_dir, prefix=".typobuster-")
+    try:
+        with os.fdopen(fd, 'w') as file:
+            if parallel:
+                chunks = read_chunks(path, chunk_size)
+                blocks = stream_sanitizer_blocks(chunks) if step == SANITIZE else stream_line_blocks(chunks)
+                pieces = parallel_process(blocks, step, settings, jobs, counter)
+            elif transformation is None:
+                pieces = sanitize_stream(read_chunks(path, chunk_size), settings, counter)
+            else:
+                pieces = transform_stream(read_chunks(path, chunk_size), transformation,
+                                          settings["transliteration-language"])
+            for piece in pieces:
+                file.write(piece)
+
+        target = output_path if output_path else path
+        if not output_path and counter is not None and not counter[0]:
+            # nothing changed, leave the file intact
+            os.unlink(tmp_path)
+        else:
+            if os.path.isfile(target):
+                os.chmod(tmp_path, os.stat(target).st_mode)
+            os.replace(tmp_path, target)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+    return counter[0] if counter is not None else None
@@ -2,7 +2,9 @@ import json
 import os
 import re
 import sys
-import unicodedata
+from array import array
+from collections import Counter
+from itertools import accumulate, chain
 
 
 def config_dir():
@@ -12,6 +14,13 @@ def config_dir():
     return os.path.join(config_home, "typobuster")
 
 
+def cache_dir():
+    xdg_cache_home = os.getenv('XDG_CACHE_HOME')
+    cache_home = xdg_cache_home if xdg_cache_home else os.path.join(os.getenv("HOME"), ".cache")
+
+    return os.path.join(cache_home, "typobuster")
+
+
 def get_theme_names():
     theme_dirs = []
     for d in get_data_dirs():
@@ -81,11 +90,12 @@ def save_json(src_dict, path):
         return e
 
 
-def load_settings():
+def load_settings(log=print):
+    # log: what reports created and saved files; eprint in headless modes, so that it doesn't mix with their output
     # check if config dir exists, create if not
     if not os.path.isdir(config_dir()):
         os.makedirs(config_dir())
-        print(f"Created {config_dir()}")
+        log(f"Created {config_dir()}")
 
     config_path = os.path.join(config_dir(), "config")
 
@@ -97,22 +107,33 @@ def load_settings():
         "gtk-theme-name": "",
         "highlight-current-row": False,
         "highlight-matching-brackets": False,
+        "highlight-typos": False,
         "icon-set": "light",
         "icon-size": 24,
+        "large-file-threshold": 268435456,
+        "parallel-threshold": 8388608,
         "right-margin-position": 80,
         "right-margin-show": False,
+        "rows-ignore-case": False,
+        "rows-ignore-whitespace": False,
         "sanitize-add-spaces-after-punctuation": True,
         "sanitize-eol": True,
         "sanitize-hyphens": True,
         "sanitize-punctuation-marks": True,
         "sanitize-quotes": True,
+        "sanitize-rule-packs": [],
         "sanitize-spaces": True,
+        "search-case-sensitive": True,
+        "search-index-threshold": 16777216,
+        "search-regex": False,
+        "search-whole-words": False,
         "show-bar": True,
         "show-change": False,
         "show-stats": False,
         "syntax": "none",
         "tab-mode": "spaces",
         "tab-width": 4,
+        "transliteration-language": "",
         "view-line-numbers": False,
         "whitespaces": False,
         "window-height": 600,
@@ -125,7 +146,7 @@ def load_settings():
     if not settings:
         result = save_json(defaults, config_path)
         if result == "ok":
-            print(f"Saved default settings to {config_path}")
+            log(f"Saved default settings to {config_path}")
         else:
             eprint(f"Error saving default settings to {config_path}: {result}")
 
@@ -139,7 +160,7 @@ def load_settings():
     if changed:
         result = save_json(settings, config_path)
         if result == "ok":
-            print(f"Updated settings in {config_path}")
+            log(f"Updated settings in {config_path}")
         else:
             eprint(f"Error updating settings in {config_path}: {result}")
 
@@ -245,10 +266,6 @@ def selected_text(buffer):
     return buffer.get_text(start, end, True), start_iter.get_offset(), end_iter.get_offset()
 
 
-def replace_all(text, old, new):
-    return re.sub(re.escape(old), new, text)
-
-
 def sanitize_hyphens(text, start_idx, end_idx):
     selection = text[start_idx:end_idx]
     selection = selection.replace("–", "-")  # Replace en-dashes with hyphens
@@ -347,7 +364,7 @@ def to_camel_case(text):
     result = []
     for line in lines:
         line = ''.join(x for x in line.title() if not x.isspace())
-        line = line[0].lower() + line[1:]
+        line = line[:1].lower() + line[1:]
         result.append(line)
     return "\n".join(result)
 
@@ -365,7 +382,7 @@ def as_in_sentence(text):
     result = []
     for line in lines:
         line = line.lower()
-        line = line[0].upper() + line[1:]
+        line = line[:1].upper() + line[1:]
         result.append(line)
     return "\n".join(result)
 
@@ -432,33 +449,110 @@ def remove_empty_lines(text):
     return "\n".join(line for line in text.splitlines() if line.strip())
 
 
+def normalize_line(line, ignore_case=False, ignore_whitespace=False):
+    if ignore_whitespace:
+        line = " ".join(line.split())
+    if ignore_case:
+        line = line.lower()
+    return line
+
+
+# characters per block of lines the duplicate row tools split at a time
+LINE_BLOCK_SIZE = 1024 * 1024
+
+
+def line_blocks(text, size=LINE_BLOCK_SIZE):
+    """ Yields (offset, block) of complete lines of the text, about size characters each """
+    start = 0
+    while start < len(text):
+        # right after '\n' is always a line boundary, also for str.splitlines()
+        idx = text.find("\n", start + size)
+        end = len(text) if idx == -1 else idx + 1
+        yield start, text[start:end]
+        start = end
+
+
+def iter_lines(text):
+    """ Yields lines, as str.splitlines() returns them, with only a block of them split at a time """
+    for _, block in line_blocks(text):
+        yield from block.splitlines()
+
+
+def line_groups(text, ignore_case=False, ignore_whitespace=False):
+    """
+    Returns (groups, starts, lengths) arrays: for each line, the index of its first occurrence (after normalization),
+    and its offset and length. Lines are split a block at a time, and only their hashes kept, with the index of the
+    line they came from (a list of indexes, in the rare case of a hash collision): no list of all lines is built.
+    """
+    first = {}
+    groups = array("Q")
+    starts = array("Q")
+    lengths = array("Q")
+    idx = 0
+    for offset, block in line_blocks(text):
+        lines = block.splitlines()
+        # line offsets: the block offset, plus lengths of lines so far (the end of the block is one too many)
+        starts.extend(accumulate(chain([offset], map(len, block.splitlines(keepends=True)))))
+        starts.pop()
+        lengths.extend(map(len, lines))
+        keys = (normalize_line(line, ignore_case, ignore_whitespace) for line in lines) \
+            if ignore_case or ignore_whitespace else lines
+        for idx, key in enumerate(keys, idx):
+            h = hash(key)
+            candidates = first.setdefault(h, idx)
+            if candidates == idx:
+                groups.append(idx)
+                continue
+            if isinstance(candidates, int):
+                candidates = [candidates]
+            for candidate in candidates:
+                line = text[starts[candidate]:starts[candidate] + lengths[candidate]]
+                if normalize_line(line, ignore_case, ignore_whitespace) == key:
+                    groups.append(candidate)
+                    break
+            else:
+                first[h] = candidates + [idx]
+                groups.append(idx)
+        idx = len(groups)
+    return groups, starts, lengths
+
+
+def remove_duplicate_lines(text, ignore_case=False, ignore_whitespace=False):
+    # keep first occurrences, in order
+    groups, _, _ = line_groups(text, ignore_case, ignore_whitespace)
+    return "\n".join(line for idx, line in enumerate(iter_lines(text)) if groups[idx] == idx)
+
+
+def unique_lines(text, ignore_case=False, ignore_whitespace=False):
+    # keep lines that occur once only, in order
+    groups, _, _ = line_groups(text, ignore_case, ignore_whitespace)
+    counts = Counter(groups)
+    return "\n".join(line for idx, line in enumerate(iter_lines(text)) if counts[groups[idx]] == 1)
+
+
+def count_lines(text, ignore_case=False, ignore_whitespace=False):
+    # "count line" rows, most frequent first (in order of first occurrence if equal), as in `sort | uniq -c | sort -rn`
+    groups, starts, lengths = line_groups(text, ignore_case, ignore_whitespace)
+    rows = sorted(Counter(groups).items(), key=lambda item: item[1], reverse=True)
+    return "\n".join(f"{count} {text[starts[idx]:starts[idx] + lengths[idx]]}" for idx, count in rows)
+
+
 def move_first_word_to_end(text):
     result = []
     lines = text.splitlines()
     for line in lines:
         words = line.split(maxsplit=1)  # Split into first word and the rest
-        line = f"{words[1]} {words[0]}" if len(words) > 1 else text
+        line = f"{words[1]} {words[0]}" if len(words) > 1 else line
         result.append(line)
     return "\n".join(result)
 
 
-def remove_non_ascii(text):
-    # Normalize text to decompose accents
-    normalized = unicodedata.normalize('NFKD', text)
-
-    # Manually replace ł with l and Ł with L
-    fixed = normalized.replace('ł', 'l').replace('Ł', 'L')
-
-    # Remove remaining non-ASCII characters
-    return ''.join(c for c in fixed if c.encode('ascii', 'ignore'))
-
-
 def move_last_word_to_beginning(text):
     result = []
     lines = text.splitlines()
     for line in lines:
         words = line.rsplit(maxsplit=1)  # Split into first word and the rest
-        line = f"{words[1]} {words[0]}" if len(words) > 1 else text
+        line = f"{words[1]} {words[0]}" if len(words) > 1 else line
         result.append(line)
     return "\n".join(result)
 
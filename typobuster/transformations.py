@@ -0,0 +1,158 @@
+"""
+Transformation registry, and pipelines: named chains of transformations run on the text in memory, so that the buffer
+is only written once. Pipelines are saved in the `pipelines` file in the config dir, as {"name": ["step", ...]}.
+This module must not import Gtk.
+"""
+
+import os
+
+from typobuster.tools import *
+from typobuster.sanitizer import sanitize
+from typobuster.rules import load_rule_packs, apply_rule_packs
+from typobuster.streaming import CHUNK_SIZE, STREAMABLE_TRANSFORMATIONS, sanitize_stream, transform_stream
+from typobuster.transliteration import transliterate
+
+# name: (vocabulary key, function)
+TRANSFORMATIONS = {
+    "sentence": ("as-in-sentence", as_in_sentence),
+    "title": ("as-in-title", as_in_title),
+    "uppercase": ("uppercase", to_upper),
+    "lowercase": ("lowercase", to_lower_case),
+    "camelcase": ("camel-case", to_camel_case),
+    "snakecase": ("snake-case", to_snake_case),
+    "kebabcase": ("kebab-case", to_kebab_case),
+    "unordered": ("unordered-list", unordered_list),
+    "ordered": ("ordered-list", ordered_list),
+    "first-to-end": ("first-to-end", move_first_word_to_end),
+    "last-to-beginning": ("last-to-beginning", move_last_word_to_beginning),
+    "merge-rows": ("merge-rows", merge_lines),
+    "sort-asc": ("ascending", sort_lines),
+    "sort-desc": ("descending", lambda text: sort_lines(text, order="desc")),
+    "remove-empty-rows": ("remove-empty-rows", remove_empty_lines),
+    "remove-non-ascii": ("remove-non-ascii", transliterate),
+}
+
+# name: (vocabulary key, function), functions taking the case and whitespace normalization switches from settings
+DUPLICATE_ROWS_TRANSFORMATIONS = {
+    "remove-duplicate-rows": ("remove-duplicate-rows", remove_duplicate_lines),
+    "unique-rows": ("unique-rows", unique_lines),
+    "count-rows": ("count-rows", count_lines),
+}
+
+# pipeline step name for the Web cleanup, with rules and rule packs enabled in settings
+SANITIZE = "sanitize"
+
+# texts longer than this (in characters) are transformed on a worker thread
+BACKGROUND_THRESHOLD = 1024 * 1024
+
+
+class Cancelled(Exception):
+    pass
+
+
+def pipeline_steps():
+    """ Returns (step name, vocabulary key) tuples of all steps available in pipelines """
+    return [(name, TRANSFORMATIONS[name][0]) for name in TRANSFORMATIONS] + \
+        [(name, DUPLICATE_ROWS_TRANSFORMATIONS[name][0]) for name in DUPLICATE_ROWS_TRANSFORMATIONS] + \
+        [(SANITIZE, "web-cleanup")]
+
+
+def transform(text, transformation, settings):
+    if transformation == "remove-non-ascii":
+        return transliterate(text, settings["transliteration-language"])
+    if transformation in DUPLICATE_ROWS_TRANSFORMATIONS:
+        return DUPLICATE_ROWS_TRANSFORMATIONS[transformation][1](text, settings["rows-ignore-case"],
+                                                                 settings["rows-ignore-whitespace"])
+    return TRANSFORMATIONS[transformation][1](text)
+
+
+def apply_enabled_rule_packs(text, settings, rule_stats=None):
+    """ Applies rule packs enabled in settings; their (pack, rule, matches, seconds) stats go to rule_stats, if given """
+    packs = [p for p in load_rule_packs() if p.id in settings["sanitize-rule-packs"]]
+    if packs:
+        text, stats = apply_rule_packs(text, packs)
+        if rule_stats is not None:
+            rule_stats.extend(stats)
+    return text
+
+
+def run_pipeline(text, steps, settings, rule_stats=None):
+    for step in steps:
+        if step == SANITIZE:
+            text = apply_enabled_rule_packs(sanitize(text, settings), settings, rule_stats)
+        else:
+            text = transform(text, step, settings)
+    return text
+
+
+def run_pipeline_in_chunks(text, steps, settings, progress=None, cancelled=None, rule_stats=None):
+    """
+    Same as run_pipeline, but streamable steps process the text chunk by chunk (in a process pool, if the text is
+    large enough), so that progress(fraction) may be reported, and cancelled() checked, in between. Raises Cancelled.
+    """
+    # (imported here, as the parallel module is built upon this one)
+    from typobuster.parallel import use_parallel, parallel_apply
+
+    def chunks(text, step_idx):
+        for pos in range(0, len(text), CHUNK_SIZE):
+            if cancelled and cancelled():
+                raise Cancelled
+            if progress:
+                progress((step_idx + pos / len(text)) / len(steps))
+            yield text[pos:pos + CHUNK_SIZE]
+
+    for idx, step in enumerate(steps):
+        if use_parallel(step, len(text), settings):
+            text = parallel_apply(text, step, settings,
+                                  progress=(lambda f, idx=idx: progress((idx + f) / len(steps))) if progress else None,
+                                  cancelled=cancelled)
+            if cancelled and cancelled():
+                raise Cancelled
+            if step == SANITIZE:
+                text = apply_enabled_rule_packs(text, settings, rule_stats)
+        elif step == SANITIZE:
+            text = "".join(sanitize_stream(chunks(text, idx), settings))
+            text = apply_enabled_rule_packs(text, settings, rule_stats)
+        elif step in STREAMABLE_TRANSFORMATIONS:
+            text = "".join(transform_stream(chunks(text, idx), step, settings["transliteration-language"]))
+        else:
+            if cancelled and cancelled():
+                raise Cancelled
+            text = transform(text, step, settings)
+    if progress:
+        progress(1.0)
+    return text
+
+
+def pipelines_path():
+    return os.path.join(config_dir(), "pipelines")
+
+
+def load_pipelines():
+    """ Returns saved pipelines as {name: [step, ...]}; pipelines with unknown steps are skipped """
+    pipelines = {}
+    if not os.path.isfile(pipelines_path()):
+        return pipelines
+
+    data = load_json(pipelines_path())
+    if not isinstance(data, dict):
+        eprint(f"{pipelines_path()}: invalid pipelines file")
+        return pipelines
+
+    for name, steps in data.items():
+        if not isinstance(steps, list):
+            eprint(f"Pipeline '{name}': not a list of steps, skipping")
+            continue
+        known = [s for s, key in pipeline_steps()]
+        unknown = [s for s in steps if s not in known]
+        if unknown:
+            eprint(f"Pipeline '{name}': unknown step(s) {', '.join(str(s) for s in unknown)}, skipping")
+        else:
+            pipelines[name] = steps
+    return pipelines
+
+
+def save_pipelines(pipelines):
+    result = save_json(pipelines, pipelines_path())
+    if result != "ok":
+        eprint(f"Failed saving pipelines: {result}")
@@ -0,0 +1,144 @@
+"""
+Table-driven transliteration to ASCII, for the "Remove non-ASCII characters" tool.
+
+The table maps code points to their ASCII transliteration: what remains of the NFKD decomposition after dropping
+non-ASCII characters (é -> e, ﬁ -> fi, ① -> 1), and letters that don't decompose (ß -> ss, ø -> o, đ -> d, ł -> l).
+Building it takes a while, so it's cached on disk, per Unicode version. Per-language overrides (e.g. German ä -> ae)
+come from LANGUAGE_OVERRIDES, and from `transliteration/<language>.json` files in the config dir, as {"ä": "ae"}.
+Characters with no transliteration are removed. Runs of ASCII characters are returned untouched: only non-ASCII runs
+are translated, unless they're dense enough (as in e.g. Polish or Chinese text) for a single pass over the whole text to
+be faster.
+This module must not import Gtk.
+"""
+
+import json
+import os
+import re
+import unicodedata
+
+from typobuster.tools import config_dir, cache_dir, eprint, load_json
+
+# bump to invalidate tables cached on disk
+TABLE_VERSION = 1
+
+# letters and symbols NFKD doesn't decompose to ASCII
+EXTRA = {
+    "ß": "ss", "ẞ": "SS", "ø": "o", "Ø": "O", "đ": "d", "Đ": "D", "ł": "l", "Ł": "L", "ð": "d", "Ð": "D",
+    "þ": "th", "Þ": "Th", "æ": "ae", "Æ": "AE", "œ": "oe", "Œ": "OE", "ħ": "h", "Ħ": "H", "ı": "i", "ŧ": "t",
+    "Ŧ": "T", "ĸ": "k", "ŋ": "ng", "Ŋ": "NG", "ƒ": "f", "ɐ": "a", "ə": "e", "Ə": "E",
+    "‘": "'", "’": "'", "‚": "'", "‛": "'", "“": '"', "”": '"', "„": '"', "‟": '"', "«": '"', "»": '"',
+    "‹": "'", "›": "'", "–": "-", "—": "-", "‐": "-", "‑": "-", "−": "-", "•": "*", "×": "x", "÷": "/",
+    "€": "EUR", "£": "GBP", "©": "(C)", "®": "(R)",
+}
+
+LANGUAGE_OVERRIDES = {
+    "de": {"ä": "ae", "Ä": "Ae", "ö": "oe", "Ö": "Oe", "ü": "ue", "Ü": "Ue"},
+    "da": {"å": "aa", "Å": "Aa", "ø": "oe", "Ø": "Oe"},
+    "nb": {"å": "aa", "Å": "Aa", "ø": "oe", "Ø": "Oe"},
+}
+
+NON_ASCII_RE = re.compile(r"[^\x00-\x7f]+")
+
+# characters sampled to tell if non-ASCII runs are dense, and characters a run costs about as much as translating: text
+# with a run per fewer characters, or mostly non-ASCII, is translated in a single pass
+SAMPLE_SIZE = 65536
+RUN_COST = 16
+
+# language: table for str.translate
+_tables = {}
+
+
+def cache_path():
+    return os.path.join(cache_dir(), "transliteration-{}-{}.json".format(unicodedata.unidata_version, TABLE_VERSION))
+
+
+def build_table():
+    """ Returns {code point: ASCII string} for all non-ASCII code points having a transliteration """
+    table = {}
+    for code_point in range(0x80, 0x110000):
+        decomposed = unicodedata.normalize("NFKD", chr(code_point))
+        ascii_part = decomposed.encode("ascii", "ignore").decode("ascii")
+        if ascii_part:
+            table[code_point] = ascii_part
+    for char, replacement in EXTRA.items():
+        table[ord(char)] = replacement
+    return table
+
+
+def base_table():
+    if "" in _tables:
+        return _tables[""]
+
+    path = cache_path()
+    table = None
+    if os.path.isfile(path):
+        data = load_json(path)
+        if data:
+            table = {int(k): v for k, v in data.items()}
+    if table is None:
+        table = build_table()
+        try:
+            os.makedirs(cache_dir(), exist_ok=True)
+            with open(path, 'w') as f:
+                json.dump(table, f)
+        except OSError as e:
+            eprint(f"Couldn't cache the transliteration table in {path}: {e}")
+
+    _tables[""] = table
+    return table
+
+
+def languages():
+    """ Returns sorted codes of languages having overrides, built-in or in the config dir """
+    codes = set(LANGUAGE_OVERRIDES)
+    user_dir = os.path.join(config_dir(), "transliteration")
+    if os.path.isdir(user_dir):
+        codes.update(os.path.splitext(name)[0] for name in os.listdir(user_dir) if name.endswith(".json"))
+    return sorted(codes)
+
+
+def language_table(language):
+    if language in _tables:
+        return _tables[language]
+
+    table = dict(base_table())
+    overrides = dict(LANGUAGE_OVERRIDES.get(language, {}))
+    user_path = os.path.join(config_dir(), "transliteration", f"{language}.json")
+    if os.path.isfile(user_path):
+        overrides.update(load_json(user_path))
+    for char, replacement in overrides.items():
+        if len(char) == 1 and NON_ASCII_RE.match(char):
+            table[ord(char)] = replacement
+        else:
+            eprint(f"Transliteration override '{char}' skipped: single non-ASCII characters only")
+
+    _tables[language] = table
+    return table
+
+
+def transliterate(text, language=""):
+    """ Returns text transliterated to ASCII, with per-language overrides if language given, e.g. 'de' """
+    # (str.isascii() needs Python 3.7)
+    try:
+        text.encode("ascii")
+        return text
+    except UnicodeEncodeError:
+        pass
+    table = language_table(language) if language else base_table()
+    runs = NON_ASCII_RE.findall(text, 0, SAMPLE_SIZE)
+    if len(runs) * RUN_COST + sum(map(len, runs)) * 2 > min(len(text), SAMPLE_SIZE):
+        return to_ascii(text.translate(table))
+
+    pieces = []
+    pos = 0
+    for match in NON_ASCII_RE.finditer(text):
+        pieces.append(text[pos:match.start()])
+        pieces.append(to_ascii(match.group().translate(table)))
+        pos = match.end()
+    pieces.append(text[pos:])
+    return "".join(pieces)
+
+
+def to_ascii(text):
+    # characters left untranslated are removed
+    return text.encode("ascii", "ignore").decode("ascii")
@@ -1,11 +1,22 @@
 import os.path
+import queue
+import threading
 
 import gi
 
 gi.require_version("Gtk", "3.0")
-from gi.repository import Gtk, Gdk, GdkPixbuf
+gi.require_version("GtkSource", "4")
+from gi.repository import Gtk, Gdk, GdkPixbuf, GLib, GtkSource, Pango
 
 from typobuster.tools import *
+from typobuster.sanitizer import find_typos
+from typobuster.rules import load_rule_packs
+from typobuster.findinfiles import search_files, replace_in_files
+from typobuster.largefile import MappedFile, Cancelled
+from typobuster.stats import count_words, document_stats
+from typobuster.search import find_next, find_previous, count_matches, match_number, load_index
+from typobuster.transformations import SANITIZE, pipeline_steps, load_pipelines, save_pipelines
+from typobuster.transliteration import languages
 from typobuster.__about__ import __version__
 
 
@@ -101,6 +112,11 @@ class MenuBar(Gtk.MenuBar):
         edit_menu.append(delete_menu_item)
         delete_menu_item.connect("activate", parent_window.delete_text)
 
+        # Edit/Find in files
+        find_in_files_menu_item = CustomMenuItem(parent_window.voc["find-in-files"], "Ctrl+Shift+F")
+        edit_menu.append(find_in_files_menu_item)
+        find_in_files_menu_item.connect("activate", parent_window.find_in_files)
+
         # Transform menu item
         transform_menu_item = Gtk.MenuItem(label=parent_window.voc["transform"])
         edit_menu.append(transform_menu_item)
@@ -203,6 +219,17 @@ class MenuBar(Gtk.MenuBar):
         self.highlight_matching_brackets_menu_item.set_active(self.settings["highlight-matching-brackets"])
         self.highlight_matching_brackets_menu_item.connect("toggled", parent_window.toggle_highlight_matching_brackets)
 
+        # Highlight typos
+        self.highlight_typos_menu_item = Gtk.CheckMenuItem(parent_window.voc["highlight-typos"])
+        view_menu.append(self.highlight_typos_menu_item)
+        self.highlight_typos_menu_item.set_active(self.settings["highlight-typos"])
+        self.highlight_typos_menu_item.connect("toggled", parent_window.toggle_highlight_typos)
+
+        # Statistics
+        statistics_menu_item = Gtk.MenuItem(label=parent_window.voc["statistics"])
+        view_menu.append(statistics_menu_item)
+        statistics_menu_item.connect("activate", parent_window.show_statistics)
+
         # Wrap menu item
         self.wrap_menu_item = Gtk.CheckMenuItem(parent_window.voc["wrap-lines"])
         view_menu.append(self.wrap_menu_item)
@@ -238,15 +265,45 @@ class MenuBar(Gtk.MenuBar):
         sort_desc_menu_item = Gtk.MenuItem(label=parent_window.voc["descending"])
         sort_menu.append(sort_desc_menu_item)
         sort_desc_menu_item.connect("activate", parent_window.transform_text, "sort-desc")
+        sort_menu.append(Gtk.SeparatorMenuItem())
+        sort_file_asc_menu_item = Gtk.MenuItem(label=parent_window.voc["sort-file-ascending"])
+        sort_menu.append(sort_file_asc_menu_item)
+        sort_file_asc_menu_item.connect("activate", parent_window.sort_file, "asc")
+        sort_file_desc_menu_item = Gtk.MenuItem(label=parent_window.voc["sort-file-descending"])
+        sort_menu.append(sort_file_desc_menu_item)
+        sort_file_desc_menu_item.connect("activate", parent_window.sort_file, "desc")
         sort_menu_item.set_submenu(sort_menu)
 
         remove_empty_rows_item = Gtk.MenuItem(label=parent_window.voc["remove-empty-rows"])
         tools_menu.append(remove_empty_rows_item)
         remove_empty_rows_item.connect("activate", parent_window.transform_text, "remove-empty-rows")
 
-        remove_non_ascii_item = Gtk.MenuItem(label=parent_window.voc["remove-non-ascii"])
-        tools_menu.append(remove_non_ascii_item)
-        remove_non_ascii_item.connect("activate", parent_window.transform_text, "remove-non-ascii")
+        # Duplicate rows menu item
+        duplicate_rows_menu_item = Gtk.MenuItem(label=parent_window.voc["duplicate-rows"])
+        tools_menu.append(duplicate_rows_menu_item)
+
+        duplicate_rows_menu = Gtk.Menu()
+        for name in ["remove-duplicate-rows", "unique-rows", "count-rows"]:
+            item = Gtk.MenuItem(label=parent_window.voc[name])
+            duplicate_rows_menu.append(item)
+            item.connect("activate", parent_window.transform_text, name)
+        duplicate_rows_menu.append(Gtk.SeparatorMenuItem())
+        for key in ["rows-ignore-case", "rows-ignore-whitespace"]:
+            item = Gtk.CheckMenuItem(label=parent_window.voc[key])
+            item.set_active(self.settings[key])
+            item.connect("toggled", parent_window.toggle_settings_key, key)
+            duplicate_rows_menu.append(item)
+        duplicate_rows_menu_item.set_submenu(duplicate_rows_menu)
+
+        # Remove non-ASCII characters menu item, with the transliteration language
+        remove_non_ascii_menu_item = Gtk.MenuItem(label=parent_window.voc["remove-non-ascii"])
+        tools_menu.append(remove_non_ascii_menu_item)
+        tools_menu.connect("show", add_transliteration_menu, remove_non_ascii_menu_item, self.parent_window)
+
+        # Pipelines menu item
+        pipelines_menu_item = Gtk.MenuItem(label=parent_window.voc["pipelines"])
+        tools_menu.append(pipelines_menu_item)
+        tools_menu.connect("show", add_pipelines_menu, pipelines_menu_item, self.parent_window)
 
         # Help menu
         help_menu = Gtk.Menu()
@@ -302,6 +359,43 @@ def add_recent_menu(widget, parent_item, parent_window):
     parent_item.set_submenu(menu)
 
 
+def add_pipelines_menu(widget, parent_item, parent_window):
+    menu = Gtk.Menu()
+    for name in load_pipelines():
+        item = Gtk.MenuItem(label=name)
+        item.connect("activate", parent_window.apply_pipeline, name)
+        menu.append(item)
+    if menu.get_children():
+        menu.append(Gtk.SeparatorMenuItem())
+    item = Gtk.MenuItem(label=parent_window.voc["edit-pipelines"])
+    item.connect("activate", parent_window.edit_pipelines)
+    menu.append(item)
+    menu.show_all()
+    parent_item.set_submenu(menu)
+
+
+def add_transliteration_menu(widget, parent_item, parent_window):
+    menu = Gtk.Menu()
+    item = Gtk.MenuItem(label=parent_window.voc["remove-non-ascii"])
+    item.connect("activate", parent_window.transform_text, "remove-non-ascii")
+    menu.append(item)
+    menu.append(Gtk.SeparatorMenuItem())
+
+    current = parent_window.settings["transliteration-language"]
+    codes = languages()
+    if current and current not in codes:
+        codes.append(current)
+    group = None
+    for code in [""] + codes:
+        item = Gtk.RadioMenuItem.new_with_label_from_widget(group, code or parent_window.voc["any-language"])
+        group = group or item
+        item.set_active(code == current)
+        item.connect("toggled", parent_window.on_transliteration_language_selected, code)
+        menu.append(item)
+    menu.show_all()
+    parent_item.set_submenu(menu)
+
+
 def add_syntax_menu(widget, parent_item, parent_window):
     menu = Gtk.Menu()
     item = Gtk.MenuItem(label=parent_window.voc["plain-text"])
@@ -457,6 +551,16 @@ class ButtonBar(Gtk.Box):
         self.pack_start(btn_remove_non_ascii, False, False, 0)
         btn_remove_non_ascii.connect("clicked", parent_window.transform_text, "remove-non-ascii")
 
+        pipelines = load_pipelines()
+        if pipelines:
+            self.pack_start(self.create_separator(), False, False, 0)
+        for name, steps in pipelines.items():
+            btn_pipeline = Gtk.Button(label=name)
+            btn_pipeline.set_property("name", "bar-button")
+            btn_pipeline.set_tooltip_text(" → ".join(pipeline_step_label(step, parent_window.voc) for step in steps))
+            self.pack_start(btn_pipeline, False, False, 0)
+            btn_pipeline.connect("clicked", parent_window.apply_pipeline, name)
+
         self.show_all()
 
     def create_button(self, icon_name):
@@ -522,6 +626,16 @@ class SanitizationDialog(Gtk.Window):
         self.sanitize_eol.connect("toggled", self.switch_settings_key, "sanitize-eol")
         vbox.pack_start(self.sanitize_eol, False, False, 0)
 
+        # User-defined rule packs
+        self.rule_packs = load_rule_packs()
+        if self.rule_packs:
+            vbox.pack_start(Gtk.Separator(orientation=Gtk.Orientation.HORIZONTAL), False, False, 6)
+        for pack in self.rule_packs:
+            cb = Gtk.CheckButton(label=pack.name)
+            cb.set_active(pack.id in self.settings["sanitize-rule-packs"])
+            cb.connect("toggled", self.switch_rule_pack, pack.id)
+            vbox.pack_start(cb, False, False, 0)
+
         hbox = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=6)
         hbox.set_property("margin-top", 12)
         vbox.pack_start(hbox, False, False, 0)
@@ -544,32 +658,19 @@ class SanitizationDialog(Gtk.Window):
         if key in self.settings:
             self.settings[key] = chekbox.get_active()
             save_settings(self.settings)
+            self.parent_window.typo_highlighter.refresh()
         else:
             print(f"Key '{key}' not found in settings")
 
-    def sanitize_text(self, widget, buffer):
-        text, start_idx, end_idx = selected_text(buffer)
-
-        if self.settings["sanitize-hyphens"]:
-            text = sanitize_hyphens(text, start_idx, end_idx)
+    def switch_rule_pack(self, chekbox, pack_id):
+        enabled = [p for p in self.settings["sanitize-rule-packs"] if p != pack_id]
+        if chekbox.get_active():
+            enabled.append(pack_id)
+        self.settings["sanitize-rule-packs"] = enabled
+        save_settings(self.settings)
 
-        if self.settings["sanitize-quotes"]:
-            text = sanitize_quotes(text, start_idx, end_idx)
-
-        if self.settings["sanitize-punctuation-marks"]:
-            text = sanitize_punctuation_marks(text, start_idx, end_idx)
-
-        if self.settings["sanitize-add-spaces-after-punctuation"]:
-            text = add_spaces_after_punctuation_marks(text, start_idx, end_idx)
-
-        if self.settings["sanitize-spaces"]:
-            text = sanitize_spaces(text, start_idx, end_idx, self.settings["tab-mode"] == "spaces",
-                                   self.settings["tab-width"])
-
-        if self.settings["sanitize-eol"]:
-            text = sanitize_eol(text, start_idx, end_idx)
-
-        self.parent_window.update_text(text)
+    def sanitize_text(self, widget, buffer):
+        self.parent_window.transform_range([SANITIZE])
         self.destroy()
 
 
@@ -725,14 +826,45 @@ class SearchBar(Gtk.Box):
         Gtk.Box.__init__(self, orientation=Gtk.Orientation.HORIZONTAL, spacing=3)
         self.set_property("margin", 3)
         self.parent_window = parent_window
-        self.matches = None
-        self.match_idx = -1
+        self.buffer = parent_window.buffer
+
+        # buffer text, copied on the first search after a change
+        self.snapshot = None
+        # total number of matches, counted in the background; None if not known yet
+        self.total = None
+        # start offset of the match selected last
+        self.current = None
+        # (start offset, number) of the match numbered last, to count on from
+        self.numbered = None
+        # bumped with every change of the phrase or text, so that outdated counts are dropped
+        self.generation = 0
+        self.timeout_id = None
+        self.buffer.connect("changed", self.on_buffer_changed)
+
+        # trigram index of large texts, built on a worker thread; edits made in the meantime are queued
+        self.index = None
+        self.indexing = False
+        self.index_edits = []
+        self.buffer.connect("insert-text", self.on_insert_text)
+        self.buffer.connect("delete-range", self.on_delete_range)
+
+        # GtkSourceView search: highlights matches in view, and finds them if any option is on (regex, ignore case,
+        # whole words); plain literal search goes through the snapshot and index
+        self.search_settings = GtkSource.SearchSettings()
+        self.search_settings.set_wrap_around(True)
+        self.search_settings.set_regex_enabled(parent_window.settings["search-regex"])
+        self.search_settings.set_case_sensitive(parent_window.settings["search-case-sensitive"])
+        self.search_settings.set_at_word_boundaries(parent_window.settings["search-whole-words"])
+        self.search_context = GtkSource.SearchContext.new(self.buffer, self.search_settings)
+        self.search_context.set_highlight(True)
+        self.search_context.connect("notify::occurrences-count", self.on_occurrences_count)
+        self.search_context.connect("notify::regex-error", self.on_regex_error)
 
         self.search_entry = Gtk.SearchEntry()
         self.pack_start(self.search_entry, False, False, 1)
         self.search_entry.set_property("name", "searchentry")
         self.search_entry.set_tooltip_text(parent_window.voc["search"])
-        self.search_entry.connect("search-changed", self.on_search_changed, parent_window.buffer)
+        self.search_entry.connect("search-changed", self.on_search_changed)
         self.search_entry.connect("key-release-event", self.handle_keyboard_release)
 
         btn = Gtk.Button.new_from_icon_name("go-up-symbolic", Gtk.IconSize.MENU)
@@ -743,12 +875,29 @@ class SearchBar(Gtk.Box):
         self.pack_start(btn, False, False, 0)
         btn.connect("clicked", self.highlight_match, "down")
 
+        for label, key, tooltip in [(".*", "search-regex", "regex"),
+                                    ("Aa", "search-case-sensitive", "match-case"),
+                                    ("W", "search-whole-words", "whole-words")]:
+            btn = Gtk.ToggleButton.new_with_label(label)
+            btn.set_tooltip_text(parent_window.voc[tooltip])
+            btn.set_active(parent_window.settings[key])
+            btn.connect("toggled", self.on_option_toggled, key)
+            self.pack_start(btn, False, False, 0)
+
+        self.count_lbl = Gtk.Label.new("")
+        self.pack_start(self.count_lbl, False, False, 3)
+
         self.replace_entry = Gtk.Entry()
         self.replace_entry.set_icon_from_icon_name(Gtk.EntryIconPosition.SECONDARY, "edit-find-replace-symbolic")
         self.replace_entry.set_tooltip_text(parent_window.voc["replace-with"])
         self.replace_entry.connect("icon-press", lambda x, y, z: self.replace_entry.set_text(""))
         self.pack_start(self.replace_entry, False, False, 0)
 
+        self.in_selection_btn = Gtk.ToggleButton()
+        self.in_selection_btn.set_image(Gtk.Image.new_from_icon_name("edit-select-all-symbolic", Gtk.IconSize.MENU))
+        self.in_selection_btn.set_tooltip_text(parent_window.voc["replace-in-selection"])
+        self.pack_start(self.in_selection_btn, False, False, 0)
+
         btn = Gtk.Button.new_from_icon_name("emblem-ok-symbolic", Gtk.IconSize.MENU)
         self.pack_start(btn, False, False, 0)
         btn.connect("clicked", self.replace)
@@ -769,63 +918,1150 @@ class SearchBar(Gtk.Box):
         self.change_lbl = Gtk.Label.new("")
         self.pack_end(self.change_lbl, False, False, 0)
 
+        # Rule packs applied by the last Web cleanup: matches and time in total, per rule in the tooltip
+        self.rules_lbl = Gtk.Label.new("")
+        self.pack_end(self.rules_lbl, False, False, 3)
+
+        # Background transformation progress
+        self.cancel_btn = Gtk.Button.new_from_icon_name("process-stop-symbolic", Gtk.IconSize.MENU)
+        self.cancel_btn.set_tooltip_text(parent_window.voc["cancel"])
+        self.cancel_btn.connect("clicked", parent_window.cancel_job)
+        self.cancel_btn.set_no_show_all(True)
+        self.pack_end(self.cancel_btn, False, False, 0)
+
+        self.progress_bar = Gtk.ProgressBar()
+        self.progress_bar.set_valign(Gtk.Align.CENTER)
+        self.progress_bar.set_no_show_all(True)
+        self.pack_end(self.progress_bar, False, False, 3)
+
         self.show_all()
 
     def handle_keyboard_release(self, widget, event):
         if event.keyval == Gdk.KEY_Return:
             self.highlight_match(widget, "down")
 
-    def on_search_changed(self, widget, buffer):
-        self.match_idx = -1
+    def text(self):
+        if self.snapshot is None:
+            self.snapshot = self.buffer.get_text(self.buffer.get_start_iter(), self.buffer.get_end_iter(), True)
+            self.update_index()
+        return self.snapshot
+
+    def update_index(self):
+        if self.index and self.index.stale():
+            self.index = None
+        threshold = self.parent_window.settings["search-index-threshold"]
+        if not self.index and not self.indexing and 0 < threshold <= len(self.snapshot):
+            self.indexing = True
+            self.index_edits = []
+            threading.Thread(target=self.build_index, args=(self.snapshot,), daemon=True).start()
+
+    def build_index(self, text):
+        # worker thread
+        GLib.idle_add(self.set_index, load_index(text))
+
+    def set_index(self, index):
+        for edit in self.index_edits:
+            index.replace(*edit)
+        self.index_edits = []
+        self.index = index
+        self.indexing = False
+        return False
+
+    def on_insert_text(self, buffer, location, text, length):
+        self.index_edit(location.get_offset(), 0, len(text))
+
+    def on_delete_range(self, buffer, start, end):
+        self.index_edit(start.get_offset(), end.get_offset() - start.get_offset(), 0)
+
+    def index_edit(self, offset, removed, inserted):
+        if self.index:
+            self.index.replace(offset, removed, inserted)
+        if self.indexing:
+            self.index_edits.append((offset, removed, inserted))
+
+    def on_buffer_changed(self, buffer):
+        self.snapshot = None
+        self.total = None
+        self.current = None
+        self.numbered = None
+        self.generation += 1
+        self.count_lbl.set_text("")
+
+    def native(self):
+        # searching with GtkSourceView, not in the snapshot
+        s = self.search_settings
+        return s.get_regex_enabled() or not s.get_case_sensitive() or s.get_at_word_boundaries()
+
+    def on_option_toggled(self, button, key):
+        self.parent_window.settings[key] = button.get_active()
+        save_settings(self.parent_window.settings)
+        self.search_settings.set_regex_enabled(self.parent_window.settings["search-regex"])
+        self.search_settings.set_case_sensitive(self.parent_window.settings["search-case-sensitive"])
+        self.search_settings.set_at_word_boundaries(self.parent_window.settings["search-whole-words"])
+        self.on_search_changed(self.search_entry)
+
+    def on_search_changed(self, widget):
+        self.total = None
+        self.current = None
+        self.numbered = None
+        self.generation += 1
+        self.count_lbl.set_text("")
+        self.search_entry.set_property("name", "searchentry")
+        self.search_entry.set_tooltip_text(self.parent_window.voc["search"])
+
+        # wait for a pause in typing
+        if self.timeout_id:
+            GLib.source_remove(self.timeout_id)
+        if self.search_entry.get_text():
+            self.timeout_id = GLib.timeout_add(200, self.start_count)
+        else:
+            self.timeout_id = None
+            self.search_settings.set_search_text(None)
+
+    def on_occurrences_count(self, context, param):
+        if self.native():
+            count = context.get_occurrences_count()
+            # -1 while the buffer is being scanned
+            self.total = count if count >= 0 else None
+            if self.total is not None and self.search_settings.get_search_text():
+                self.search_entry.set_property("name", "searchentry" if self.total else "searchentry-error")
+            self.show_count()
+
+    def on_regex_error(self, context, param):
+        error = context.get_regex_error()
+        if error:
+            self.search_entry.set_property("name", "searchentry-error")
+            self.search_entry.set_tooltip_text(error.message)
+
+    def start_count(self):
+        self.timeout_id = None
         phrase = self.search_entry.get_text()
+        # (highlighting is updated in any mode)
+        self.search_settings.set_search_text(phrase)
+        if self.native():
+            return False
         if phrase:
-            start = buffer.get_start_iter()
-            end = buffer.get_end_iter()
-            text = buffer.get_text(start, end, True)
-
-            if phrase in text:
-                self.search_entry.set_property("name", "searchentry")
+            text = self.text()
+            windows = self.index.windows(phrase, len(text)) if self.index else None
+            threading.Thread(target=self.count, args=(text, phrase, windows, self.generation), daemon=True).start()
+        return False
+
+    def count(self, text, phrase, windows, generation):
+        # worker thread: the text is a snapshot, the buffer is not touched
+        total = count_matches(text, phrase, windows)
+        GLib.idle_add(self.set_count, total, generation)
+
+    def set_count(self, total, generation):
+        if generation == self.generation:
+            self.total = total
+            self.search_entry.set_property("name", "searchentry" if total else "searchentry-error")
+            self.show_count()
+        return False
+
+    def show_count(self):
+        if self.total is None:
+            self.count_lbl.set_text("")
+        elif self.current is None:
+            self.count_lbl.set_text(str(self.total))
+        else:
+            if self.native():
+                number = self.current
             else:
-                self.search_entry.set_property("name", "searchentry-error")
-
-            self.matches = list(re.finditer(re.escape(phrase), text))
+                number = match_number(self.text(), self.search_entry.get_text(), self.current, self.numbered,
+                                      self.total)
+                self.numbered = (self.current, number)
+                number = min(number, self.total)
+            self.count_lbl.set_text(self.parent_window.voc["n-of-m"].format(number, self.total))
 
     def highlight_match(self, widget, direction):
-        if self.search_entry.get_text():
+        phrase = self.search_entry.get_text()
+        if not phrase:
+            return
+
+        bounds = self.buffer.get_selection_bounds()
+        if not bounds:
+            cursor = self.buffer.get_iter_at_mark(self.buffer.get_insert())
+            bounds = (cursor, cursor.copy())
+
+        if self.native():
+            if self.timeout_id:
+                # (Return pressed before the typing pause)
+                GLib.source_remove(self.timeout_id)
+                self.start_count()
             if direction == "down":
-                if self.match_idx == -1:
-                    self.match_idx = 0
+                self.search_context.forward_async(bounds[1], None, self.on_native_match, direction)
+            else:
+                self.search_context.backward_async(bounds[0], None, self.on_native_match, direction)
+            return
 
-                start, end = self.matches[self.match_idx].span()
-                self.parent_window.select_range(start, end)
-                iter_start = self.parent_window.buffer.get_iter_at_offset(start)
-                self.parent_window.source_view.scroll_to_iter(iter_start, 0.2, False, 0.5, 0.5)
+        sel_start, sel_end = bounds[0].get_offset(), bounds[1].get_offset()
+        text = self.text()
+        if direction == "down":
+            match = self.index.find_next(text, phrase, sel_end) if self.index else find_next(text, phrase, sel_end)
+        else:
+            match = self.index.find_previous(text, phrase, sel_start) if self.index else \
+                find_previous(text, phrase, sel_start)
 
-                if self.match_idx < len(self.matches) - 1:
-                    self.match_idx += 1
-                else:
-                    self.match_idx = 0
+        if match is None:
+            self.search_entry.set_property("name", "searchentry-error")
+            return
+        self.search_entry.set_property("name", "searchentry")
 
-            elif direction == "up":
-                if self.match_idx == -1:
-                    self.match_idx = len(self.matches) - 1
+        start, end = match
+        self.parent_window.select_range(start, end)
+        iter_start = self.buffer.get_iter_at_offset(start)
+        self.parent_window.source_view.scroll_to_iter(iter_start, 0.2, False, 0.5, 0.5)
 
-                start, end = self.matches[self.match_idx].span()
-                self.parent_window.select_range(start, end)
-                iter_start = self.parent_window.buffer.get_iter_at_offset(start)
-                self.parent_window.source_view.scroll_to_iter(iter_start, 0.2, False, 0.5, 0.5)
+        if self.total is None and self.timeout_id is None:
+            # the text changed since the last count
+            self.start_count()
+        self.current = start
+        self.show_count()
 
-                if self.match_idx > 0:
-                    self.match_idx -= 1
-                else:
-                    self.match_idx = len(self.matches) - 1
+    def on_native_match(self, context, result, direction):
+        if direction == "down":
+            found, match_start, match_end, wrapped = context.forward_finish(result)
+        else:
+            found, match_start, match_end, wrapped = context.backward_finish(result)
+        if not found:
+            self.search_entry.set_property("name", "searchentry-error")
+            return
+
+        self.buffer.select_range(match_start, match_end)
+        self.parent_window.source_view.scroll_to_iter(match_start, 0.2, False, 0.5, 0.5)
+        position = context.get_occurrence_position(match_start, match_end)
+        # (0 or -1 until the buffer is scanned)
+        self.current = position if position > 0 else None
+        self.show_count()
 
     def replace(self, widget):
         old = self.search_entry.get_text()
         new = self.replace_entry.get_text()
-        if old:
-            self.parent_window.replace(old, new)
+        in_selection = self.in_selection_btn.get_active()
+        if not old or self.parent_window.job:
+            return
+
+        if self.native():
+            self.search_settings.set_search_text(old)
+            try:
+                # (in regex mode, \1 etc. refer to groups)
+                if in_selection:
+                    count = self.replace_native_in_selection(new)
+                else:
+                    count = self.search_context.replace_all(new, -1)
+            except GLib.Error as e:
+                eprint(f"Replace failed: {e.message}")
+                return
+        else:
+            count = self.parent_window.replace(old, new, in_selection)
+        self.count_lbl.set_text(self.parent_window.voc["n-replaced"].format(count))
+
+    def replace_native_in_selection(self, new):
+        bounds = self.buffer.get_selection_bounds()
+        if not bounds:
+            return 0
+        sel_start, sel_end = bounds[0].get_offset(), bounds[1].get_offset()
+
+        matches = []
+        found, match_start, match_end, wrapped = self.search_context.forward(bounds[0])
+        while found and not wrapped and match_start.get_offset() >= sel_start and match_end.get_offset() <= sel_end:
+            matches.append((match_start.get_offset(), match_end.get_offset()))
+            if match_end.equal(match_start) and not match_end.forward_char():
+                # (an empty match at the end of the text)
+                break
+            found, match_start, match_end, wrapped = self.search_context.forward(match_end)
+
+        # from the end, so that offsets of matches yet to replace stay valid
+        self.buffer.begin_user_action()
+        for start, end in reversed(matches):
+            self.search_context.replace(self.buffer.get_iter_at_offset(start), self.buffer.get_iter_at_offset(end),
+                                        new, -1)
+        self.buffer.end_user_action()
+        return len(matches)
 
     def clear(self):
         self.search_entry.set_text("")
         self.replace_entry.set_text("")
+
+    def show_progress(self):
+        self.progress_bar.set_fraction(0)
+        self.progress_bar.show()
+        self.cancel_btn.show()
+
+    def set_progress(self, fraction):
+        self.progress_bar.set_fraction(fraction)
+        return False
+
+    def hide_progress(self):
+        self.progress_bar.hide()
+        self.cancel_btn.hide()
+
+    def show_rule_stats(self, stats):
+        """ Shows (pack, rule, matches, seconds) stats, as returned by rules.apply_rule_packs """
+        voc = self.parent_window.voc
+        if not stats:
+            self.rules_lbl.set_text("")
+            self.rules_lbl.set_tooltip_text(None)
+            return
+        self.rules_lbl.set_text(voc["rule-packs-summary"].format(sum(s[2] for s in stats),
+                                                                 round(sum(s[3] for s in stats) * 1000)))
+        self.rules_lbl.set_tooltip_text("\n".join(
+            voc["rule-stats"].format(pack_name, rule_name, count, f"{elapsed * 1000:.2f}")
+            for pack_name, rule_name, count, elapsed in sorted(stats, key=lambda s: s[3], reverse=True)))
+
+
+class TextCounters:
+    """
+    Word count of the whole text, kept up to date on edits: only words around the edit site are counted again.
+    Characters and rows are counted by the buffer itself.
+    """
+
+    def __init__(self, buffer):
+        self.buffer = buffer
+        self.words = count_words(buffer.get_text(buffer.get_start_iter(), buffer.get_end_iter(), True))
+
+        # before the default handlers, to see the text as it was
+        buffer.connect("insert-text", self.on_insert_text)
+        buffer.connect("delete-range", self.on_delete_range)
+
+    @property
+    def characters(self):
+        return self.buffer.get_char_count()
+
+    @property
+    def rows(self):
+        return self.buffer.get_line_count()
+
+    @staticmethod
+    def word_start(location):
+        start = location.copy()
+        previous = start.copy()
+        while previous.backward_char() and not previous.get_char().isspace():
+            start = previous.copy()
+        return start
+
+    @staticmethod
+    def word_end(location):
+        end = location.copy()
+        while not end.is_end() and not end.get_char().isspace():
+            end.forward_char()
+        return end
+
+    def on_insert_text(self, buffer, location, text, length):
+        start = self.word_start(location)
+        end = self.word_end(location)
+        before = buffer.get_text(start, location, True)
+        after = buffer.get_text(location, end, True)
+        # (the text around contains no whitespace: one word at most)
+        self.words += count_words(before + text + after) - (1 if before or after else 0)
+
+    def on_delete_range(self, buffer, start, end):
+        word_start = self.word_start(start)
+        word_end = self.word_end(end)
+        old = count_words(buffer.get_text(word_start, word_end, True))
+        new = count_words(buffer.get_text(word_start, start, True) + buffer.get_text(end, word_end, True))
+        self.words += new - old
+
+
+class TypoHighlighter:
+    """
+    Non-destructive lint: underlines what the Web cleanup would change. Edits only mark the paragraphs they touch as
+    dirty; dirty paragraphs are matched on a worker thread, and tags applied back on the main thread.
+    """
+
+    # lines a dirty range is extended by, at most, in search of the paragraph bounds: text with no blank lines (code,
+    # logs) would otherwise be linted in full on each edit
+    CONTEXT_LINES = 50
+
+    def __init__(self, buffer, settings):
+        self.buffer = buffer
+        self.settings = settings
+        self.enabled = False
+        self.tag = buffer.create_tag("typo", underline=Pango.Underline.ERROR,
+                                     underline_rgba=Gdk.RGBA(1.0, 0.55, 0.0, 1.0))
+
+        # dirty ranges, as pairs of marks
+        self.dirty = []
+        self.timeout_id = None
+
+        self.jobs = queue.Queue()
+        threading.Thread(target=self.worker, daemon=True).start()
+
+        buffer.connect_after("insert-text", self.on_insert_text)
+        buffer.connect_after("delete-range", self.on_delete_range)
+
+    def set_enabled(self, enabled):
+        self.enabled = enabled
+        start, end = self.buffer.get_bounds()
+        if enabled:
+            self.mark_dirty(start, end)
+        else:
+            self.buffer.remove_tag(self.tag, start, end)
+
+    def refresh(self):
+        # rules changed: lint the whole text again
+        if self.enabled:
+            self.mark_dirty(*self.buffer.get_bounds())
+
+    def on_insert_text(self, buffer, location, text, length):
+        if self.enabled:
+            start = location.copy()
+            start.backward_chars(len(text))
+            self.mark_dirty(start, location)
+
+    def on_delete_range(self, buffer, start, end):
+        if self.enabled:
+            self.mark_dirty(start, end)
+
+    def mark_dirty(self, start, end):
+        self.dirty.append((self.buffer.create_mark(None, start, True), self.buffer.create_mark(None, end, False)))
+
+        # wait for a pause in typing
+        if self.timeout_id:
+            GLib.source_remove(self.timeout_id)
+        self.timeout_id = GLib.timeout_add(150, self.submit)
+
+    def submit(self):
+        self.timeout_id = None
+
+        ranges = []
+        for start_mark, end_mark in self.dirty:
+            start = self.buffer.get_iter_at_mark(start_mark)
+            end = self.buffer.get_iter_at_mark(end_mark)
+            self.buffer.delete_mark(start_mark)
+            self.buffer.delete_mark(end_mark)
+
+            # extend the range to whole paragraphs, or to CONTEXT_LINES lines around it
+            start.set_line_offset(0)
+            for _ in range(self.CONTEXT_LINES):
+                if start.get_line() == 0 or start.get_chars_in_line() <= 1:
+                    break
+                start.backward_line()
+            if not end.ends_line():
+                end.forward_to_line_end()
+            for _ in range(self.CONTEXT_LINES):
+                if end.is_end() or end.get_chars_in_line() <= 1:
+                    break
+                end.forward_line()
+            ranges.append((start, end))
+        self.dirty = []
+
+        if not self.enabled:
+            return False
+
+        # merge overlapping paragraphs
+        ranges.sort(key=lambda r: r[0].get_offset())
+        merged = []
+        for start, end in ranges:
+            if merged and start.compare(merged[-1][1]) <= 0:
+                if end.compare(merged[-1][1]) > 0:
+                    merged[-1] = (merged[-1][0], end)
+            else:
+                merged.append((start, end))
+
+        for start, end in merged:
+            text = self.buffer.get_text(start, end, True)
+            marks = (self.buffer.create_mark(None, start, True), self.buffer.create_mark(None, end, False))
+            self.jobs.put((text, marks, dict(self.settings)))
+        return False
+
+    def worker(self):
+        while True:
+            text, marks, settings = self.jobs.get()
+            matches = find_typos(text, settings)
+            GLib.idle_add(self.apply, text, matches, marks)
+
+    def apply(self, text, matches, marks):
+        start = self.buffer.get_iter_at_mark(marks[0])
+        end = self.buffer.get_iter_at_mark(marks[1])
+        self.buffer.delete_mark(marks[0])
+        self.buffer.delete_mark(marks[1])
+
+        # the range may have been edited meanwhile; such an edit marked it dirty again
+        if not self.enabled or self.buffer.get_text(start, end, True) != text:
+            return False
+
+        self.buffer.remove_tag(self.tag, start, end)
+        offset = start.get_offset()
+        for match_start, match_end in matches:
+            self.buffer.apply_tag(self.tag, self.buffer.get_iter_at_offset(offset + match_start),
+                                  self.buffer.get_iter_at_offset(offset + match_end))
+        return False
+
+
+def pipeline_step_label(step, voc):
+    return voc[dict(pipeline_steps())[step]]
+
+
+class PipelinesDialog(Gtk.Window):
+    def __init__(self, parent_window):
+        super().__init__(title=parent_window.voc["pipelines"])
+        self.set_transient_for(parent_window)
+        self.set_modal(True)
+        self.parent_window = parent_window
+        self.voc = parent_window.voc
+        self.pipelines = load_pipelines()
+        self.steps = []
+
+        self.connect("key-release-event", self.handle_keyboard_release)
+
+        grid = Gtk.Grid()
+        grid.set_column_spacing(6)
+        grid.set_row_spacing(6)
+        grid.set_property("margin", 12)
+        self.add(grid)
+
+        # Existing pipelines, to edit
+        self.pipeline_combo = Gtk.ComboBoxText.new_with_entry()
+        for name in self.pipelines:
+            self.pipeline_combo.append(name, name)
+        self.pipeline_combo.connect("changed", self.on_pipeline_changed)
+        grid.attach(self.pipeline_combo, 0, 0, 2, 1)
+
+        # Steps available
+        self.step_combo = Gtk.ComboBoxText()
+        for step, key in pipeline_steps():
+            self.step_combo.append(step, self.voc[key])
+        self.step_combo.set_active(0)
+        grid.attach(self.step_combo, 0, 1, 1, 1)
+
+        button = Gtk.Button(label="+")
+        button.connect("clicked", self.add_step)
+        grid.attach(button, 1, 1, 1, 1)
+
+        self.steps_label = Gtk.Label()
+        self.steps_label.set_line_wrap(True)
+        self.steps_label.set_max_width_chars(40)
+        self.steps_label.set_property("xalign", 0)
+        grid.attach(self.steps_label, 0, 2, 2, 1)
+
+        hbox = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=6)
+        hbox.set_property("margin-top", 12)
+        grid.attach(hbox, 0, 3, 2, 1)
+
+        button = Gtk.Button(label=self.voc["save"])
+        hbox.pack_end(button, False, False, 0)
+        button.connect("clicked", self.save)
+
+        button = Gtk.Button(label=self.voc["delete"])
+        hbox.pack_end(button, False, False, 0)
+        button.connect("clicked", self.delete)
+
+        button = Gtk.Button(label=self.voc["clear"])
+        hbox.pack_end(button, False, False, 0)
+        button.connect("clicked", self.clear_steps)
+
+        button = Gtk.Button(label=self.voc["close"])
+        hbox.pack_start(button, False, False, 0)
+        button.connect("clicked", lambda x: self.destroy())
+
+        self.update_steps_label()
+        self.show_all()
+
+    def handle_keyboard_release(self, widget, event):
+        if event.keyval == Gdk.KEY_Escape:
+            self.destroy()
+
+    def on_pipeline_changed(self, combo):
+        name = combo.get_active_id()
+        if name in self.pipelines:
+            self.steps = list(self.pipelines[name])
+            self.update_steps_label()
+
+    def add_step(self, widget):
+        self.steps.append(self.step_combo.get_active_id())
+        self.update_steps_label()
+
+    def clear_steps(self, widget):
+        self.steps = []
+        self.update_steps_label()
+
+    def update_steps_label(self):
+        self.steps_label.set_text(" → ".join(pipeline_step_label(step, self.voc) for step in self.steps))
+
+    def save(self, widget):
+        name = self.pipeline_combo.get_child().get_text().strip()
+        if name and self.steps:
+            self.pipelines[name] = self.steps
+            self.store()
+
+    def delete(self, widget):
+        name = self.pipeline_combo.get_child().get_text().strip()
+        if name in self.pipelines:
+            del self.pipelines[name]
+            self.store()
+
+    def store(self):
+        save_pipelines(self.pipelines)
+        self.parent_window.create_button_bar()
+        self.destroy()
+
+
+class FindInFilesWindow(Gtk.Window):
+    """ Searches files of a directory tree on worker threads; results are listed as they come """
+
+    def __init__(self, parent_window):
+        super().__init__(title=parent_window.voc["find-in-files"])
+        self.set_transient_for(parent_window)
+        self.set_default_size(800, 500)
+        self.parent_window = parent_window
+        self.voc = parent_window.voc
+
+        # bumped with every search, so that results of an older one are dropped
+        self.generation = 0
+        self.searching = False
+        self.phrase = ""
+        self.paths = []
+        self.match_count = 0
+
+        self.connect("key-release-event", self.handle_keyboard_release)
+        self.connect("destroy", self.stop)
+
+        grid = Gtk.Grid()
+        grid.set_column_spacing(6)
+        grid.set_row_spacing(6)
+        grid.set_property("margin", 12)
+        self.add(grid)
+
+        self.folder_button = Gtk.FileChooserButton.new(self.voc["folder"], Gtk.FileChooserAction.SELECT_FOLDER)
+        self.folder_button.set_current_folder(parent_window.last_dir_path or os.getcwd())
+        grid.attach(self.folder_button, 0, 0, 1, 1)
+
+        self.search_entry = Gtk.SearchEntry()
+        self.search_entry.set_hexpand(True)
+        self.search_entry.set_placeholder_text(self.voc["search"])
+        self.search_entry.connect("activate", self.find)
+        grid.attach(self.search_entry, 1, 0, 1, 1)
+
+        self.find_button = Gtk.Button(label=self.voc["find"])
+        self.find_button.connect("clicked", self.find)
+        grid.attach(self.find_button, 2, 0, 1, 1)
+
+        self.replace_entry = Gtk.Entry()
+        self.replace_entry.set_placeholder_text(self.voc["replace-with"])
+        grid.attach(self.replace_entry, 1, 1, 1, 1)
+
+        self.replace_button = Gtk.Button(label=self.voc["replace-in-files"])
+        self.replace_button.set_sensitive(False)
+        self.replace_button.connect("clicked", self.replace)
+        grid.attach(self.replace_button, 2, 1, 1, 1)
+
+        # path, row, column, row text, path relative to the folder
+        self.store = Gtk.ListStore(str, int, int, str, str)
+        tree_view = Gtk.TreeView(model=self.store)
+        tree_view.connect("row-activated", self.on_row_activated)
+        for title, idx in [(self.voc["file"], 4), (self.voc["row"], 1), (self.voc["search"], 3)]:
+            column = Gtk.TreeViewColumn(title, Gtk.CellRendererText(), text=idx)
+            column.set_resizable(True)
+            tree_view.append_column(column)
+
+        scrolled_window = Gtk.ScrolledWindow()
+        scrolled_window.set_vexpand(True)
+        scrolled_window.add(tree_view)
+        grid.attach(scrolled_window, 0, 2, 3, 1)
+
+        hbox = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=6)
+        grid.attach(hbox, 0, 3, 3, 1)
+
+        self.status_lbl = Gtk.Label()
+        hbox.pack_start(self.status_lbl, False, False, 0)
+
+        self.spinner = Gtk.Spinner()
+        hbox.pack_start(self.spinner, False, False, 0)
+
+        button = Gtk.Button(label=self.voc["close"])
+        hbox.pack_end(button, False, False, 0)
+        button.connect("clicked", lambda x: self.destroy())
+
+        self.stop_button = Gtk.Button(label=self.voc["cancel"])
+        self.stop_button.set_sensitive(False)
+        self.stop_button.connect("clicked", self.stop)
+        hbox.pack_end(self.stop_button, False, False, 0)
+
+        self.show_all()
+
+    def handle_keyboard_release(self, widget, event):
+        if event.keyval == Gdk.KEY_Escape:
+            self.destroy()
+
+    def find(self, widget):
+        root = self.folder_button.get_filename()
+        phrase = self.search_entry.get_text()
+        if not root or not phrase:
+            return
+
+        self.generation += 1
+        self.store.clear()
+        self.phrase = phrase
+        self.paths = []
+        self.match_count = 0
+        self.set_searching(True)
+        self.update_status()
+        threading.Thread(target=self.search, args=(root, phrase, self.generation), daemon=True).start()
+
+    def search(self, root, phrase, generation):
+        # worker thread
+        cancelled = lambda: generation != self.generation or not self.searching
+        for path, matches in search_files(root, phrase, cancelled=cancelled):
+            GLib.idle_add(self.add_results, root, path, matches, generation)
+        GLib.idle_add(self.search_finished, generation)
+
+    def add_results(self, root, path, matches, generation):
+        if generation == self.generation:
+            relative_path = os.path.relpath(path, root)
+            for row, column, text in matches:
+                self.store.append([path, row, column, text.strip(), relative_path])
+            self.paths.append(path)
+            self.match_count += len(matches)
+            self.update_status()
+        return False
+
+    def search_finished(self, generation):
+        if generation == self.generation:
+            self.set_searching(False)
+        return False
+
+    def set_searching(self, searching):
+        self.searching = searching
+        self.stop_button.set_sensitive(searching)
+        self.find_button.set_sensitive(not searching)
+        self.replace_button.set_sensitive(not searching and bool(self.paths))
+        if searching:
+            self.spinner.start()
+        else:
+            self.spinner.stop()
+
+    def stop(self, widget):
+        self.searching = False
+
+    def update_status(self):
+        self.status_lbl.set_text(self.voc["n-matches-in-files"].format(self.match_count, len(self.paths)))
+
+    def on_row_activated(self, tree_view, tree_path, column):
+        path, row, column = self.store[tree_path][0:3]
+        # (selected once loaded: large files load asynchronously, or open in the read-only view)
+        self.parent_window.load_file(None, path, (row - 1, column - 1, len(self.phrase)))
+        self.parent_window.present()
+
+    def replace(self, widget):
+        new = self.replace_entry.get_text()
+        dialog = Gtk.MessageDialog(
+            transient_for=self,
+            flags=0,
+            message_type=Gtk.MessageType.QUESTION,
+            buttons=Gtk.ButtonsType.YES_NO,
+            text=self.voc["replace-in-files-question"].format(len(self.paths)),
+        )
+        response = dialog.run()
+        dialog.destroy()
+        if response != Gtk.ResponseType.YES:
+            return
+
+        self.replace_button.set_sensitive(False)
+        self.find_button.set_sensitive(False)
+        self.spinner.start()
+        threading.Thread(target=self.replace_files, args=(list(self.paths), self.phrase, new), daemon=True).start()
+
+    def replace_files(self, paths, old, new):
+        # worker thread
+        counts = replace_in_files(paths, old, new)
+        GLib.idle_add(self.replace_finished, counts)
+
+    def replace_finished(self, counts):
+        self.spinner.stop()
+        self.find_button.set_sensitive(True)
+        self.store.clear()
+        self.paths = []
+        self.status_lbl.set_text(self.voc["n-replaced-in-files"].format(sum(counts.values()),
+                                                                        len([c for c in counts.values() if c])))
+        return False
+
+
+class StatisticsWindow(Gtk.Window):
+    """ Document statistics, counted on a worker thread after a pause in editing; unchanged paragraphs are cached """
+
+    ITEMS = ["characters", "non-space-characters", "words", "unique-words", "sentences", "paragraphs",
+             "average-sentence-length", "reading-time"]
+
+    def __init__(self, parent_window):
+        super().__init__(title=parent_window.voc["statistics"])
+        self.set_transient_for(parent_window)
+        self.set_default_size(360, 520)
+        self.buffer = parent_window.buffer
+        self.voc = parent_window.voc
+
+        # paragraph stats by paragraph hash; only used by the worker thread
+        self.cache = {}
+        self.running = False
+        self.pending = False
+        self.closed = False
+        self.timeout_id = None
+        self.handler = self.buffer.connect("changed", self.on_buffer_changed)
+
+        self.connect("key-release-event", self.handle_keyboard_release)
+        self.connect("destroy", self.on_destroy)
+
+        grid = Gtk.Grid()
+        grid.set_column_spacing(12)
+        grid.set_row_spacing(6)
+        grid.set_property("margin", 12)
+        self.add(grid)
+
+        self.value_labels = {}
+        for row, item in enumerate(self.ITEMS):
+            label = Gtk.Label.new(self.voc[f"stats-{item}"])
+            label.set_property("xalign", 0)
+            grid.attach(label, 0, row, 1, 1)
+            self.value_labels[item] = Gtk.Label.new("…")
+            self.value_labels[item].set_property("xalign", 1)
+            self.value_labels[item].set_hexpand(True)
+            grid.attach(self.value_labels[item], 1, row, 1, 1)
+
+        label = Gtk.Label.new(self.voc["stats-top-words"])
+        label.set_property("xalign", 0)
+        label.set_property("margin-top", 6)
+        grid.attach(label, 0, len(self.ITEMS), 2, 1)
+
+        self.store = Gtk.ListStore(str, int)
+        tree_view = Gtk.TreeView(model=self.store)
+        tree_view.set_headers_visible(False)
+        tree_view.append_column(Gtk.TreeViewColumn("", Gtk.CellRendererText(), text=0))
+        tree_view.append_column(Gtk.TreeViewColumn("", Gtk.CellRendererText(), text=1))
+        scrolled_window = Gtk.ScrolledWindow()
+        scrolled_window.set_vexpand(True)
+        scrolled_window.add(tree_view)
+        grid.attach(scrolled_window, 0, len(self.ITEMS) + 1, 2, 1)
+
+        button = Gtk.Button(label=self.voc["close"])
+        button.set_halign(Gtk.Align.END)
+        button.connect("clicked", lambda x: self.destroy())
+        grid.attach(button, 0, len(self.ITEMS) + 2, 2, 1)
+
+        self.show_all()
+        self.refresh()
+
+    def handle_keyboard_release(self, widget, event):
+        if event.keyval == Gdk.KEY_Escape:
+            self.destroy()
+
+    def on_destroy(self, widget):
+        self.closed = True
+        self.buffer.disconnect(self.handler)
+        if self.timeout_id:
+            GLib.source_remove(self.timeout_id)
+            self.timeout_id = None
+
+    def on_buffer_changed(self, buffer):
+        # wait for a pause in editing
+        if self.timeout_id:
+            GLib.source_remove(self.timeout_id)
+        self.timeout_id = GLib.timeout_add(500, self.refresh)
+
+    def refresh(self):
+        self.timeout_id = None
+        if self.running:
+            # one count at a time; the latest text is counted when this one is done
+            self.pending = True
+        else:
+            self.running = True
+            text = self.buffer.get_text(self.buffer.get_start_iter(), self.buffer.get_end_iter(), True)
+            threading.Thread(target=self.count, args=(text,), daemon=True).start()
+        return False
+
+    def count(self, text):
+        # worker thread
+        GLib.idle_add(self.show_stats, document_stats(text, self.cache))
+
+    def show_stats(self, stats):
+        self.running = False
+        if self.closed:
+            return False
+        if self.pending:
+            self.pending = False
+            self.refresh()
+
+        for item in self.ITEMS:
+            value = stats[item]
+            if item == "average-sentence-length":
+                value = f"{value:.1f}"
+            elif item == "reading-time":
+                value = self.voc["n-minutes"].format(max(round(value), 1) if stats["words"] else 0)
+            self.value_labels[item].set_text(str(value))
+
+        self.store.clear()
+        for word, count in stats["top-words"]:
+            self.store.append([word, count])
+        return False
+
+
+class LargeFileView(Gtk.Box):
+    """
+    Read-only view of a memory-mapped file too large to edit. Only the rows in view are decoded into the (small) buffer;
+    the external scrollbar spans all rows of the file, as counted by the index built on a worker thread.
+    """
+
+    # rows decoded beyond the visible ones
+    MARGIN = 20
+
+    def __init__(self, parent_window, path):
+        Gtk.Box.__init__(self, orientation=Gtk.Orientation.VERTICAL, spacing=0)
+        self.voc = parent_window.voc
+        self.mapped = MappedFile(path)
+        # first row in the buffer, rows fitting in view, and byte offset of the match selected last
+        self.top = 0
+        self.page_rows = 1
+        self.match = None
+        self.closed = False
+        # bumped with every search started, or cancelled, so that outdated searches stop
+        self.search_generation = 0
+
+        bar = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=3)
+        bar.set_property("margin", 3)
+        self.pack_start(bar, False, False, 0)
+
+        self.search_entry = Gtk.SearchEntry()
+        self.search_entry.set_tooltip_text(self.voc["search"])
+        self.search_entry.connect("activate", self.highlight_match, "down")
+        self.search_entry.connect("search-changed", self.cancel_search)
+        self.search_entry.connect("stop-search", self.cancel_search)
+        bar.pack_start(self.search_entry, False, False, 1)
+
+        btn = Gtk.Button.new_from_icon_name("go-up-symbolic", Gtk.IconSize.MENU)
+        bar.pack_start(btn, False, False, 0)
+        btn.connect("clicked", self.highlight_match, "up")
+
+        btn = Gtk.Button.new_from_icon_name("go-down-symbolic", Gtk.IconSize.MENU)
+        bar.pack_start(btn, False, False, 0)
+        btn.connect("clicked", self.highlight_match, "down")
+
+        self.spinner = Gtk.Spinner()
+        self.spinner.set_no_show_all(True)
+        bar.pack_start(self.spinner, False, False, 3)
+
+        btn = Gtk.Button.new_from_icon_name("window-close-symbolic", Gtk.IconSize.MENU)
+        btn.set_tooltip_text(self.voc["close"])
+        btn.connect("clicked", lambda x: parent_window.new_file())
+        bar.pack_end(btn, False, False, 0)
+
+        self.rows_lbl = Gtk.Label.new("")
+        bar.pack_end(self.rows_lbl, False, False, 3)
+
+        self.progress_bar = Gtk.ProgressBar()
+        self.progress_bar.set_valign(Gtk.Align.CENTER)
+        self.progress_bar.set_no_show_all(True)
+        bar.pack_end(self.progress_bar, False, False, 3)
+
+        lbl = Gtk.Label.new(self.voc["read-only"])
+        lbl.set_sensitive(False)
+        bar.pack_end(lbl, False, False, 3)
+
+        hbox = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=0)
+        self.pack_start(hbox, True, True, 0)
+
+        self.buffer = GtkSource.Buffer()
+        self.view = GtkSource.View.new_with_buffer(self.buffer)
+        self.view.get_style_context().add_class("sourceview")
+        self.view.set_editable(False)
+        self.view.set_wrap_mode(Gtk.WrapMode.NONE)
+        self.view.connect("scroll-event", self.on_scroll)
+        self.view.connect("key-press-event", self.on_key_press)
+
+        # the view scrolls horizontally only; rows are scrolled with the external scrollbar
+        scrolled_window = Gtk.ScrolledWindow()
+        scrolled_window.set_policy(Gtk.PolicyType.AUTOMATIC, Gtk.PolicyType.EXTERNAL)
+        scrolled_window.set_hexpand(True)
+        scrolled_window.set_vexpand(True)
+        scrolled_window.add(self.view)
+        scrolled_window.connect("size-allocate", self.on_size_allocate)
+        hbox.pack_start(scrolled_window, True, True, 0)
+
+        self.adjustment = Gtk.Adjustment(value=0, lower=0, upper=1, step_increment=1, page_increment=1, page_size=1)
+        self.adjustment.connect("value-changed", self.on_value_changed)
+        hbox.pack_start(Gtk.Scrollbar(orientation=Gtk.Orientation.VERTICAL, adjustment=self.adjustment),
+                        False, False, 0)
+
+        self.progress_bar.show()
+        threading.Thread(target=self.build_index, daemon=True).start()
+        self.show_all()
+        self.load_rows()
+
+    def close(self):
+        # the index thread stops on the next block; the file is unmapped once it has
+        self.closed = True
+        if self.mapped.indexed:
+            self.mapped.close()
+        self.destroy()
+
+    def build_index(self):
+        # worker thread
+        percent = [-1]
+
+        def progress(fraction):
+            # (the view updated once per percent, not per block)
+            if int(fraction * 100) != percent[0]:
+                percent[0] = int(fraction * 100)
+                GLib.idle_add(self.on_index_progress, fraction)
+
+        try:
+            self.mapped.build_index(progress, lambda: self.closed)
+        except Cancelled:
+            pass
+        GLib.idle_add(self.on_indexed)
+
+    def on_index_progress(self, fraction):
+        if not self.closed:
+            self.progress_bar.set_fraction(fraction)
+            self.set_rows()
+        return False
+
+    def on_indexed(self):
+        if self.closed:
+            self.mapped.close()
+        else:
+            self.progress_bar.hide()
+            self.set_rows()
+        return False
+
+    def set_rows(self):
+        self.adjustment.set_upper(self.mapped.rows)
+        self.update_rows_label()
+
+    def update_rows_label(self):
+        last = min(self.top + self.page_rows, self.mapped.rows)
+        total = f"{self.mapped.rows}" if self.mapped.indexed else f"{self.mapped.rows}+"
+        self.rows_lbl.set_text(self.voc["rows-of"].format(self.top + 1, last, total))
+
+    def on_size_allocate(self, widget, allocation):
+        row_height = max(self.view.create_pango_layout("X").get_pixel_size()[1], 1)
+        rows = max(allocation.height // row_height, 1)
+        if rows != self.page_rows:
+            self.page_rows = rows
+            self.adjustment.set_page_size(rows)
+            self.adjustment.set_page_increment(max(rows - 1, 1))
+            GLib.idle_add(self.load_rows)
+
+    def on_value_changed(self, adjustment):
+        if int(adjustment.get_value()) != self.top:
+            self.load_rows()
+
+    def load_rows(self):
+        self.top = int(self.adjustment.get_value())
+        text = self.mapped.read_rows(self.top, self.page_rows + self.MARGIN)
+        self.buffer.set_text(text[:-1] if text.endswith("\n") else text)
+        self.buffer.place_cursor(self.buffer.get_start_iter())
+        self.update_rows_label()
+        return False
+
+    def scroll_by(self, rows):
+        # (the adjustment keeps the value within bounds)
+        self.adjustment.set_value(self.adjustment.get_value() + rows)
+
+    def on_scroll(self, widget, event):
+        if event.direction == Gdk.ScrollDirection.UP:
+            self.scroll_by(-3)
+        elif event.direction == Gdk.ScrollDirection.DOWN:
+            self.scroll_by(3)
+        elif event.direction == Gdk.ScrollDirection.SMOOTH:
+            ok, dx, dy = event.get_scroll_deltas()
+            if not dy:
+                # horizontal scrolling is left to the view
+                return False
+            self.scroll_by(round(dy * 3) or (1 if dy > 0 else -1))
+        else:
+            return False
+        return True
+
+    def on_key_press(self, widget, event):
+        ctrl = event.state & Gdk.ModifierType.CONTROL_MASK
+        if event.keyval == Gdk.KEY_Page_Up:
+            self.scroll_by(-self.adjustment.get_page_increment())
+        elif event.keyval == Gdk.KEY_Page_Down:
+            self.scroll_by(self.adjustment.get_page_increment())
+        elif event.keyval == Gdk.KEY_Up:
+            self.scroll_by(-1)
+        elif event.keyval == Gdk.KEY_Down:
+            self.scroll_by(1)
+        elif event.keyval == Gdk.KEY_Home and ctrl:
+            self.adjustment.set_value(0)
+        elif event.keyval == Gdk.KEY_End and ctrl:
+            self.scroll_by(self.adjustment.get_upper())
+        else:
+            return False
+        return True
+
+    def cancel_search(self, *args):
+        self.match = None
+        self.search_generation += 1
+        self.spinner.stop()
+        self.spinner.hide()
+
+    def highlight_match(self, widget, direction):
+        phrase = self.search_entry.get_text()
+        if not phrase:
+            return
+        self.search_generation += 1
+        self.spinner.show()
+        self.spinner.start()
+        threading.Thread(target=self.search, args=(phrase, direction, self.match, self.search_generation),
+                         daemon=True).start()
+
+    def search(self, phrase, direction, match, generation):
+        # worker thread: stops if the view is closed, or another search started
+        def cancelled():
+            return self.closed or generation != self.search_generation
+
+        try:
+            if direction == "down":
+                pos = self.mapped.find(phrase, 0 if match is None else match + len(phrase.encode("utf-8")), cancelled)
+            else:
+                pos = self.mapped.rfind(phrase, self.mapped.size if match is None else match, cancelled)
+            row = column = None
+            if pos != -1:
+                # rows are counted here, not on the main thread: the match may be far past the indexed part (finding
+                # the top row offset leaves it as the hint load_rows starts from)
+                row, column = self.mapped.row_at(pos)
+                self.mapped.row_offset(max(row - 3, 0))
+        except (Cancelled, ValueError):
+            # (ValueError: the file unmapped meanwhile)
+            return
+        GLib.idle_add(self.show_match, pos, row, column, len(phrase), generation)
+
+    def go_to(self, row, column, length):
+        """ Selects length characters from the row and column (counted from 0), e.g. a match found in files """
+        self.search_generation += 1
+        self.spinner.show()
+        self.spinner.start()
+        threading.Thread(target=self.find_row, args=(row, column, length, self.search_generation),
+                         daemon=True).start()
+
+    def find_row(self, row, column, length, generation):
+        # worker thread: the row may be far past the indexed part, as in search
+        try:
+            start = self.mapped.row_offset(row)
+            text = self.mapped.data[start:self.mapped.skip_rows(start, 1)].decode("utf-8", "replace")
+            pos = start + len(text[:column].encode("utf-8"))
+            self.mapped.row_offset(max(row - 3, 0))
+        except ValueError:
+            return
+        GLib.idle_add(self.show_match, pos, row, column, length, generation)
+
+    def show_match(self, pos, row, column, length, generation):
+        if self.closed or generation != self.search_generation:
+            return False
+        self.spinner.stop()
+        self.spinner.hide()
+        if pos == -1:
+            self.match = None
+            return False
+        self.match = pos
+
+        # (the match may be past the rows indexed so far)
+        self.adjustment.set_upper(max(self.adjustment.get_upper(), row + 1))
+        # the matching row a few rows below the top, unless near the end of file
+        self.adjustment.set_value(max(row - 3, 0))
+        start = self.buffer.get_iter_at_line_offset(row - self.top, column)
+        end = start.copy()
+        end.forward_chars(length)
+        self.buffer.select_range(start, end)
+        self.view.scroll_to_iter(start, 0, False, 0, 0)
+        return False
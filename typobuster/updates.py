@@ -0,0 +1,31 @@
+"""
+Coalesced UI updates: items marked for refreshing (any number of times, e.g. once per buffer signal of a paste) are
+refreshed together, in a single callback run later by the main loop.
+This module must not import Gtk.
+"""
+
+
+class UpdateScheduler:
+    def __init__(self, schedule, refresh):
+        """
+        schedule(callback) makes the main loop call callback() later, once (callbacks return False, as GLib.idle_add
+        ones do); refresh(items) is given the set of items marked since the last refresh
+        """
+        self.schedule = schedule
+        self.refresh = refresh
+        self.dirty = set()
+        self.pending = False
+
+    def mark(self, *items):
+        self.dirty.update(items)
+        if not self.pending:
+            self.pending = True
+            self.schedule(self.run)
+
+    def run(self):
+        self.pending = False
+        # (items marked while refreshing get a new run)
+        items, self.dirty = self.dirty, set()
+        if items:
+            self.refresh(items)
+        return False